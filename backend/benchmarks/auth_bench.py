@@ -0,0 +1,48 @@
+"""
+GET /products/{id} throughput with and without the authentication caches.
+
+Start the API against a local mongod twice, once with the caches disabled
+and once with the defaults, seed at least one product, and run this
+against each:
+
+    USER_CACHE_TTL=0 TOKEN_CACHE_TTL=0 uvicorn backend.main:app --workers 1
+    uvicorn backend.main:app --workers 1
+
+    python -m backend.benchmarks.auth_bench --requests 5000 --concurrency 64
+
+The cache hit ratios reported by /diagnostics/auth-cache are printed after
+the run. Requires `httpx`.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from backend.benchmarks.load_test import BASE_URL, get_token, run_scenario
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        token = await get_token(client)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        products = (await client.get("/products/", params={"limit": 1})).json()
+        if not products:
+            print("No products found; seed the database first.")
+            return
+        path = f"/products/{products[0]['id']}"
+
+        await run_scenario(client, "GET /products/{id}", lambda c: c.get(path), args.requests, args.concurrency)
+
+        stats = (await client.get("/diagnostics/auth-cache")).json()
+        for name, cache in stats.items():
+            print(f"{name:<7} cache: hit ratio {cache['hit_ratio']}, {cache['hits']} hits, {cache['misses']} misses, ttl {cache['ttl']} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
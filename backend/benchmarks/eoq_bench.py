@@ -0,0 +1,72 @@
+"""
+EOQ compute time: the previous per-product loop vs the vectorized engine.
+
+Runs on synthetic product arrays (no database needed), so it measures the
+computation and status ordering only:
+
+    python -m backend.benchmarks.eoq_bench --products 1000000
+
+The per-product loop is timed on --sample products and extrapolated.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.services import analytics
+
+
+def per_product_loop(products):
+    """
+    The previous get_eoq_data body, minus the database read.
+    """
+    results = []
+    for p in products:
+        eoq = analytics.calculate_eoq(p.get("annual_demand", 1000), 50.0, p["price"] * 0.2)
+        status = "Good"
+        if p["stock_level"] < eoq * 0.5:
+            status = "Understocked"
+        elif p["stock_level"] > eoq * 2:
+            status = "Overstocked"
+        results.append({"id": p["id"], "name": p["name"], "current_stock": p["stock_level"], "eoq": round(eoq, 0), "status": status})
+    results.sort(key=lambda x: 0 if x["status"] == "Understocked" else (1 if x["status"] == "Overstocked" else 2))
+    return results
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    n = args.products
+    columns = {
+        "id": np.arange(1, n + 1),
+        "category": np.array([f"Category {i % 50}" for i in range(n)], dtype=object),
+        "price": rng.uniform(1, 500, n),
+        "stock_level": rng.integers(0, 1000, n).astype(float),
+    }
+    for field in analytics.COST_DEFAULTS:
+        columns[field] = np.where(rng.random(n) < 0.1, rng.uniform(1, 100, n), np.nan)
+    category_costs = {f"Category {i}": {"ordering_cost": 20.0 + i, "lead_time_days": 3.0 + i % 10} for i in range(0, 50, 2)}
+
+    sample = [
+        {"id": int(columns["id"][i]), "name": f"Product {i}", "price": float(columns["price"][i]), "stock_level": int(columns["stock_level"][i])}
+        for i in range(args.sample)
+    ]
+    started = time.perf_counter()
+    per_product_loop(sample)
+    loop = (time.perf_counter() - started) / args.sample * n
+
+    started = time.perf_counter()
+    resolved = analytics.resolve_costs(columns, category_costs)
+    result = analytics.compute_eoq(*(resolved[f] for f in ("price", "stock_level", *analytics.COST_DEFAULTS)))
+    np.argsort(result["status"], kind="stable")
+    vectorized = time.perf_counter() - started
+
+    print(f"{n} products")
+    print(f"per-product loop : {loop:8.2f} s  (extrapolated from {args.sample})")
+    print(f"vectorized       : {vectorized:8.3f} s  ({loop / vectorized:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--sample", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""
+Fan-out of GET /events to many subscribers.
+
+Start the API against a local mongod (e.g. `uvicorn backend.main:app
+--workers 1`), seed at least one product and supplier, then run:
+
+    python -m backend.benchmarks.events_bench --subscribers 500 --orders 50
+
+Opens --subscribers SSE connections, generates --orders simulated orders
+one by one, and reports how long each order took to reach every
+subscriber as an order-created event (from the POST returning), plus any
+subscriber dropped as a slow consumer. The server's feed counters from
+/diagnostics/events are printed at the end. Requires `httpx`.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from backend.benchmarks.load_test import BASE_URL, get_token, percentile
+
+
+async def subscriber(client, token, sent, latencies, counts, ready):
+    async with client.stream("GET", "/events", params={"access_token": token}) as resp:
+        ready.release()
+        event = None
+        async for line in resp.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "order-created":
+                received = time.perf_counter()
+                for order in json.loads(line[len("data: "):])["orders"]:
+                    if order["id"] in sent:
+                        latencies.append(received - sent[order["id"]])
+            elif line.startswith("data: ") and event == "dropped":
+                counts["dropped"] += 1
+                return
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.subscribers + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=None) as client:
+        token = await get_token(client)
+        sent, latencies, counts = {}, [], {"dropped": 0}
+        ready = asyncio.Semaphore(0)
+        tasks = [asyncio.create_task(subscriber(client, token, sent, latencies, counts, ready)) for _ in range(args.subscribers)]
+        for _ in range(args.subscribers):
+            await ready.acquire()
+
+        for _ in range(args.orders):
+            resp = await client.post("/simulate/generate-order")
+            if "order_id" in resp.json():
+                sent[resp.json()["order_id"]] = time.perf_counter()
+            await asyncio.sleep(args.interval)
+        await asyncio.sleep(args.drain)
+        for task in tasks:
+            task.cancel()
+
+        expected = len(sent) * args.subscribers
+        print(f"deliveries  {len(latencies)}/{expected}  dropped subscribers {counts['dropped']}")
+        print(f"latency     p50 {percentile(latencies, 50) * 1000:>7.1f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:>7.1f} ms  "
+              f"max {max(latencies, default=0) * 1000:>7.1f} ms")
+        client.headers["Authorization"] = f"Bearer {token}"
+        print((await client.get("/diagnostics/events")).json())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--drain", type=float, default=3.0, help="seconds to wait for the last events")
+    asyncio.run(main(parser.parse_args()))
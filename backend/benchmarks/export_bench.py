@@ -0,0 +1,105 @@
+"""
+Time-to-first-byte, total time and peak memory of the export renderers.
+
+Feeds synthetic order rows (no database needed) through the buffered
+pandas/openpyxl writer and the streaming xlsx/CSV writers:
+
+    python -m backend.benchmarks.export_bench --rows 1000000
+
+Each renderer runs in a fresh subprocess so peak RSS is not shared.
+Pass --skip-buffered to leave out the buffered writer on large runs.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+RENDERERS = ["buffered-xlsx", "stream-xlsx", "stream-csv", "stream-csv-gzip"]
+COLUMNS = ["Order ID", "Product", "Quantity", "Date", "Status", "Supplier"]
+
+
+def synthetic_rows(count):
+    start = datetime(2024, 1, 1)
+    statuses = ["Pending", "Shipped", "Delivered"]
+    for i in range(count):
+        yield {
+            "Order ID": i + 1,
+            "Product": f"Product {i % 5000}",
+            "Quantity": (i * 7) % 20 + 1,
+            "Date": (start + timedelta(minutes=i)).strftime("%Y-%m-%d"),
+            "Status": statuses[i % 3],
+            "Supplier": f"Supplier {i % 200}",
+        }
+
+
+def buffered_excel(data):
+    """
+    The previous renderer: the whole report built in a DataFrame and
+    written to an in-memory workbook before the first byte goes out.
+    """
+    import pandas as pd
+
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(data).to_excel(writer, index=False, sheet_name='Sheet1')
+    output.seek(0)
+    return output
+
+
+def run_one(renderer, rows):
+    from backend.services import reporting
+
+    started = time.perf_counter()
+    first_byte = None
+    total_bytes = 0
+
+    if renderer == "buffered-xlsx":
+        stream = buffered_excel(list(synthetic_rows(rows)))
+        chunks = iter(lambda: stream.read(64 * 1024), b"")
+    elif renderer == "stream-xlsx":
+        chunks = reporting.stream_xlsx(COLUMNS, synthetic_rows(rows))
+    else:
+        chunks = reporting.stream_csv(COLUMNS, synthetic_rows(rows), compress=renderer.endswith("gzip"))
+
+    for chunk in chunks:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - started
+        total_bytes += len(chunk)
+
+    return {
+        "renderer": renderer,
+        "ttfb_s": first_byte or 0.0,
+        "total_s": time.perf_counter() - started,
+        "bytes": total_bytes,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(args):
+    print(f"{args.rows} rows")
+    print(f"{'renderer':<16} {'TTFB s':>8} {'total s':>8} {'MB out':>8} {'peak RSS MB':>12}")
+    for renderer in RENDERERS:
+        if args.skip_buffered and renderer == "buffered-xlsx":
+            continue
+        out = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.export_bench", "--child", renderer, "--rows", str(args.rows)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['renderer']:<16} {r['ttfb_s']:>8.2f} {r['total_s']:>8.2f} {r['bytes'] / 1e6:>8.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--skip-buffered", action="store_true")
+    parser.add_argument("--child", choices=RENDERERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_one(args.child, args.rows)))
+    else:
+        main(args)
@@ -0,0 +1,127 @@
+"""
+Time and peak memory of /analytics/analyze-file by upload size.
+
+Writes synthetic order CSVs of the given sizes to a temporary directory
+and analyzes each one with the previous whole-file analyzer (read_csv +
+describe) and the chunked one:
+
+    python -m backend.benchmarks.file_analysis_bench --sizes-mb 10,100,500
+
+Each run happens in a fresh subprocess so peak RSS is not shared. The
+previous analyzer also held the raw upload in memory (await file.read()),
+so it reads the file into a BytesIO first, as the endpoint did.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ANALYZERS = ["whole-file", "chunked"]
+BAR_WIDTH = 40
+WRITE_ROWS = 200000
+
+
+def write_csv(path, size_mb):
+    """
+    Append batches of synthetic order rows until the file reaches size_mb.
+    """
+    rng = np.random.default_rng(0)
+    next_id = 1
+    with open(path, "w") as f:
+        header = True
+        while f.tell() < size_mb * 1e6:
+            ids = np.arange(next_id, next_id + WRITE_ROWS)
+            pd.DataFrame({
+                "id": ids,
+                "product_id": rng.integers(1, 5000, WRITE_ROWS),
+                "supplier_id": rng.integers(1, 200, WRITE_ROWS),
+                "quantity": rng.integers(1, 100, WRITE_ROWS),
+                "unit_price": rng.uniform(1, 500, WRITE_ROWS).round(2),
+                "status": rng.choice(["Pending", "Shipped", "Delivered", "Cancelled"], WRITE_ROWS),
+                "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, WRITE_ROWS), unit="s"),
+            }).to_csv(f, index=False, header=header)
+            header = False
+            next_id += WRITE_ROWS
+
+
+def whole_file(path):
+    """
+    The previous analyze_file body for a CSV upload.
+    """
+    with open(path, "rb") as f:
+        df = pd.read_csv(io.BytesIO(f.read()))
+    return {"summary": df.describe().to_dict(), "row_count": len(df)}
+
+
+def run_one(analyzer, path):
+    from backend.services import file_analysis
+
+    started = time.perf_counter()
+    if analyzer == "whole-file":
+        result = whole_file(path)
+    else:
+        with open(path, "rb") as f:
+            result = file_analysis.analyze_file(f, path)
+
+    return {
+        "analyzer": analyzer,
+        "size_mb": os.path.getsize(path) / 1e6,
+        "rows": result["row_count"],
+        "total_s": time.perf_counter() - started,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bar(value, largest):
+    return "#" * max(1, round(BAR_WIDTH * value / largest)) if largest else ""
+
+
+def chart(results, metric, label):
+    largest = max(r[metric] for r in results)
+    print(f"\n{label}")
+    for r in results:
+        print(f"{r['analyzer']:<11} {r['size_mb']:>7.0f} MB {r[metric]:>9.2f} {bar(r[metric], largest)}")
+
+
+def main(args):
+    results = []
+    print(f"{'analyzer':<11} {'MB':>7} {'rows':>10} {'total s':>9} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in [int(n) for n in args.sizes_mb.split(",")]:
+            path = os.path.join(tmp, f"orders_{size_mb}mb.csv")
+            write_csv(path, size_mb)
+            for analyzer in ANALYZERS:
+                if analyzer == "whole-file" and size_mb > args.whole_file_max_mb:
+                    continue
+                out = subprocess.run(
+                    [sys.executable, "-m", "backend.benchmarks.file_analysis_bench", "--child", analyzer, "--path", path],
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                results.append(r)
+                print(f"{r['analyzer']:<11} {r['size_mb']:>7.0f} {r['rows']:>10} {r['total_s']:>9.2f} {r['peak_rss_mb']:>12.1f}")
+            os.remove(path)
+
+    chart(results, "total_s", "analysis time (s)")
+    chart(results, "peak_rss_mb", "peak RSS (MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="10,100,500")
+    parser.add_argument("--whole-file-max-mb", type=int, default=1000)
+    parser.add_argument("--child", choices=ANALYZERS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_one(args.child, args.path)))
+    else:
+        main(args)
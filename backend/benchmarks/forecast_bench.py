@@ -0,0 +1,132 @@
+"""
+Forecasting the whole catalog: one request per product vs the batch engine.
+
+Seeds synthetic order history into a scratch database (default `scm_bench`,
+dropped afterwards) on MONGO_URL and times
+
+  * the previous per-product path (find + DataFrame + sklearn fit) on a
+    sample of products, extrapolated to the catalog, and
+  * forecasting.run_forecasts for every product, once per --models entry:
+
+    python -m backend.benchmarks.forecast_bench --products 10000
+
+--fit-only skips the database and times just the fitting step on a
+synthetic demand matrix, in-process and across FORECAST_WORKERS
+processes (set FORECAST_CHUNK_SIZE below --products to exercise the pool).
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+from sklearn.linear_model import LinearRegression
+
+from backend import database
+from backend.services import forecasting
+
+
+def seed(db, products, days, orders_per_day):
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 1, 1)
+    next_id = 1
+    batch = []
+    for product_id in range(1, products + 1):
+        base = rng.uniform(1, 20)
+        for day in range(days):
+            for _ in range(rng.poisson(orders_per_day)):
+                batch.append({
+                    "id": next_id,
+                    "product_id": product_id,
+                    "quantity": int(base + rng.integers(0, 10)),
+                    "order_date": start + timedelta(days=day, minutes=int(rng.integers(0, 1440))),
+                    "status": "Delivered",
+                })
+                next_id += 1
+        if len(batch) >= 50000:
+            db.orders.insert_many(batch)
+            batch = []
+    if batch:
+        db.orders.insert_many(batch)
+    db.orders.create_index([("product_id", 1), ("order_date", 1)])
+    db[forecasting.FORECASTS_COLLECTION].create_index("product_id", unique=True)
+    return next_id - 1
+
+
+def per_product_forecast(db, product_id, periods=3):
+    """
+    The previous path: fetch one product's orders and fit sklearn on them.
+    """
+    orders = list(db.orders.find({"product_id": product_id}).sort("order_date", 1))
+    if len(orders) < 2:
+        return None
+    df = pd.DataFrame([(o["order_date"], o["quantity"]) for o in orders], columns=['date', 'quantity'])
+    df['date_ordinal'] = pd.to_datetime(df['date']).map(pd.Timestamp.toordinal)
+    model = LinearRegression()
+    model.fit(df[['date_ordinal']], df['quantity'])
+    last_date = df['date'].max()
+    future = np.array([(last_date + pd.Timedelta(days=i)).toordinal() for i in range(1, periods + 1)]).reshape(-1, 1)
+    return model.predict(future)
+
+
+def fit_only(args):
+    rng = np.random.default_rng(0)
+    weekly = np.where(np.arange(args.days) % 7 >= 5, 10.0, 0.0)
+    history = rng.poisson(5 + weekly, size=(args.products, args.days)).astype(float)
+    start = rng.integers(0, args.days // 2, size=args.products)
+
+    started = time.perf_counter()
+    x = np.arange(args.days).reshape(-1, 1)
+    for p in range(args.sample):
+        LinearRegression().fit(x[start[p]:], history[p, start[p]:])
+    per_product = (time.perf_counter() - started) / args.sample * args.products
+
+    print(f"{args.products} products x {args.days} days (fit only)")
+    print(f"{'sklearn linear, per product':<30} {per_product:8.2f} s  (extrapolated from {args.sample})")
+    for model in args.models.split(","):
+        for workers in (1, forecasting.FORECAST_WORKERS):
+            forecasting.FORECAST_WORKERS = workers
+            forecasting.fit_all(history, start, 3, model)
+            started = time.perf_counter()
+            forecasting.fit_all(history, start, 3, model)
+            elapsed = time.perf_counter() - started
+            print(f"{model + f', {workers} worker(s)':<30} {elapsed:8.2f} s")
+    forecasting.shutdown()
+
+
+def main(args):
+    if args.fit_only:
+        return fit_only(args)
+
+    client = MongoClient(database.MONGO_URL)
+    db = client[args.database]
+    client.drop_database(args.database)
+    try:
+        orders = seed(db, args.products, args.days, args.orders_per_day)
+
+        started = time.perf_counter()
+        for product_id in range(1, args.sample + 1):
+            per_product_forecast(db, product_id)
+        per_product = (time.perf_counter() - started) / args.sample * args.products
+
+        print(f"{args.products} products, {orders} orders")
+        print(f"{'per-product requests':<24} {per_product:8.2f} s  (extrapolated from {args.sample})")
+        for model in args.models.split(","):
+            summary = forecasting.run_forecasts(db, model=model)
+            print(f"{'batch ' + model:<24} {summary['elapsed_s']:8.2f} s  {summary['models']}")
+    finally:
+        forecasting.shutdown()
+        client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--orders-per-day", type=float, default=0.5)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--models", default="linear,auto")
+    parser.add_argument("--fit-only", action="store_true")
+    parser.add_argument("--database", default="scm_bench")
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""
+Bulk order import: one create-order round-trip sequence per row vs
+POST /import/orders.
+
+Seeds suppliers and products into a scratch database (default
+`scm_bench`, dropped afterwards) on MONGO_URL, writes an orders CSV and
+imports it:
+
+    python -m backend.benchmarks.import_bench --orders 1000000
+
+The per-row path (product lookup, supplier lookup, id, insert, stats and
+supplier metric updates, as create_order does) is timed on --sample
+orders and extrapolated.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from backend import database
+from backend.services import bulk_import, ids, indexes, order_details
+
+
+def seed(db, products, suppliers):
+    db.suppliers.insert_many([{"id": i, "name": f"Supplier {i}"} for i in range(1, suppliers + 1)])
+    db.products.insert_many([
+        {"id": i, "name": f"Product {i}", "category": f"Category {i % 50}", "price": float(i % 500) + 0.99,
+         "stock_level": i % 300, "reorder_point": 50, "supplier_id": i % suppliers + 1}
+        for i in range(1, products + 1)
+    ])
+
+
+def write_orders(path, orders, products, suppliers):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "product_id": rng.integers(1, products + 1, orders),
+        "supplier_id": rng.integers(1, suppliers + 1, orders),
+        "quantity": rng.integers(1, 100, orders),
+        "status": rng.choice(["Pending", "Shipped", "Delivered"], orders),
+        "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, orders), unit="s"),
+    }).to_csv(path, index=False)
+
+
+def per_row(db, path, sample):
+    """
+    The round-trips create_order makes for each order.
+    """
+    rows = pd.read_csv(path, nrows=sample).to_dict(orient="records")
+    started = time.perf_counter()
+    for row in rows:
+        order = {k: row[k] for k in ("product_id", "supplier_id", "quantity", "status")}
+        order["order_date"] = datetime.utcnow()
+        product = db.products.find_one({"id": order["product_id"]})
+        supplier = db.suppliers.find_one({"id": order["supplier_id"]})
+        order_details.apply_storage(order, product, supplier)
+        order["id"] = ids.next_id(db, "orders")
+        db.orders.insert_one(order)
+        db.stats.update_one({"_id": "dashboard"}, {"$inc": {"total_revenue": order["quantity"] * product["price"]}}, upsert=True)
+        db.supplier_metrics_daily.update_one({"supplier_id": order["supplier_id"], "day": datetime(2024, 1, 1)}, {"$inc": {"orders": 1}}, upsert=True)
+    return time.perf_counter() - started
+
+
+def main(args):
+    client = MongoClient(database.MONGO_URL)
+    db = client[args.database]
+    client.drop_database(args.database)
+    try:
+        indexes.ensure_indexes(db)
+        seed(db, args.products, args.suppliers)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            write_orders(path, args.orders, args.products, args.suppliers)
+
+            row_time = per_row(db, path, args.sample) / args.sample * args.orders
+            db.orders.delete_many({})
+
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                report = bulk_import.import_file(db, "orders", f, path)
+            bulk = time.perf_counter() - started
+
+        print(f"{report['inserted']} orders imported, {report['failed']} failed")
+        print(f"per-row round-trips : {row_time:8.1f} s  (extrapolated from {args.sample})")
+        print(f"bulk import         : {bulk:8.1f} s  ({row_time / bulk:.0f}x, {report['inserted'] / bulk:,.0f} rows/s)")
+    finally:
+        client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--suppliers", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--database", default="scm_bench")
+    main(parser.parse_args())
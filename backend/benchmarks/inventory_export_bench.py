@@ -0,0 +1,93 @@
+"""
+Inventory export row assembly: per-product supplier lookups vs the report
+dataset builder.
+
+Seeds a synthetic catalog into a scratch database (default `scm_bench`,
+dropped afterwards) on MONGO_URL and times assembling every report row:
+
+    python -m backend.benchmarks.inventory_export_bench --products 100000
+
+Products are stored without an embedded supplier, which is the case the
+old export resolved with one find_one per product.
+"""
+import argparse
+import time
+
+from pymongo import MongoClient
+
+from backend import database
+from backend.services import report_datasets
+
+
+def seed(db, products, suppliers):
+    db.suppliers.insert_many([{"id": i, "name": f"Supplier {i}"} for i in range(1, suppliers + 1)])
+    batch = []
+    for i in range(1, products + 1):
+        batch.append({
+            "id": i,
+            "name": f"Product {i}",
+            "category": f"Category {i % 50}",
+            "price": float(i % 500) + 0.99,
+            "stock_level": i % 300,
+            "reorder_point": 50,
+            "supplier_id": i % suppliers + 1,
+        })
+        if len(batch) == 10000:
+            db.products.insert_many(batch)
+            batch = []
+    if batch:
+        db.products.insert_many(batch)
+    db.suppliers.create_index("id", unique=True)
+    db.products.create_index("id", unique=True)
+
+
+def per_product_lookup_rows(db):
+    """
+    The previous assembly: one supplier round-trip per product.
+    """
+    for p in db.products.find():
+        supplier_name = "N/A"
+        if "supplier" in p and p["supplier"]:
+            supplier_name = p["supplier"]["name"]
+        elif "supplier_id" in p:
+            s = db.suppliers.find_one({"id": p["supplier_id"]})
+            if s:
+                supplier_name = s["name"]
+        yield {
+            "ID": p["id"],
+            "Name": p["name"],
+            "Category": p["category"],
+            "Price": p["price"],
+            "Stock": p["stock_level"],
+            "Reorder Point": p["reorder_point"],
+            "Supplier": supplier_name,
+        }
+
+
+def timed(rows):
+    started = time.perf_counter()
+    count = sum(1 for _ in rows)
+    return count, time.perf_counter() - started
+
+
+def main(args):
+    client = MongoClient(database.MONGO_URL)
+    db = client[args.database]
+    client.drop_database(args.database)
+    try:
+        seed(db, args.products, args.suppliers)
+        count, before = timed(per_product_lookup_rows(db))
+        _, after = timed(report_datasets.inventory_rows(db))
+        print(f"{count} products, {args.suppliers} suppliers")
+        print(f"per-product lookups : {before:8.2f} s")
+        print(f"dataset builder     : {after:8.2f} s  ({before / after:.1f}x)")
+    finally:
+        client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--suppliers", type=int, default=500)
+    parser.add_argument("--database", default="scm_bench")
+    main(parser.parse_args())
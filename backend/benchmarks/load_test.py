@@ -0,0 +1,89 @@
+"""
+Load benchmark for GET /products/ and POST /orders/.
+
+Start the API against a local mongod (e.g. `uvicorn backend.main:app
+--workers 1`), make sure at least one product and supplier exist, then run:
+
+    python -m backend.benchmarks.load_test --requests 2000 --concurrency 64
+
+Run it once on the commit before the async data layer and once after to
+compare req/s and latency percentiles. Requires `httpx`.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def get_token(client):
+    username = "bench_user"
+    password = "bench_password"
+    await client.post("/auth/signup", json={"username": username, "email": "bench@example.com", "password": password})
+    resp = await client.post("/auth/token", data={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def run_scenario(client, name, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            resp = await make_request(client)
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{name:<16} {total / elapsed:>9.1f} req/s  "
+          f"p50 {percentile(latencies, 50) * 1000:>7.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:>7.1f} ms  "
+          f"mean {statistics.mean(latencies) * 1000:>7.1f} ms  "
+          f"errors {errors}")
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        token = await get_token(client)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        products = (await client.get("/products/", params={"limit": 1})).json()
+        if not products:
+            print("No products found; seed the database first.")
+            return
+        product = products[0]
+        order = {"product_id": product["id"], "supplier_id": product["supplier_id"], "quantity": 1}
+
+        await run_scenario(client, "GET /products/", lambda c: c.get("/products/"), args.requests, args.concurrency)
+        await run_scenario(client, "POST /orders/", lambda c: c.post("/orders/", json=order), args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""
+Login throughput, and the latency of a cheap endpoint during a login burst.
+
+Start the API against a local mongod (e.g. `uvicorn backend.main:app
+--workers 1`), then run:
+
+    python -m backend.benchmarks.login_bench --logins 500 --concurrency 32
+
+While --concurrency clients log in as fast as they can, one client polls
+GET / and reports its latency percentiles, which shows whether hashing
+starves the event loop. Logins turned away with 429 (hashing pool
+saturated) are counted separately. Run it on the commit before the hashing
+pool and after, or with different PBKDF2_ROUNDS / HASH_WORKERS /
+HASH_MAX_PENDING settings on the server. Requires `httpx`.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from backend.benchmarks.load_test import BASE_URL, get_token, percentile
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        await get_token(client)
+        credentials = {"username": "bench_user", "password": "bench_password"}
+
+        remaining = args.logins
+        counts = {"ok": 0, "busy": 0, "error": 0}
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                resp = await client.post("/auth/token", data=credentials)
+                if resp.status_code == 200:
+                    counts["ok"] += 1
+                elif resp.status_code == 429:
+                    counts["busy"] += 1
+                else:
+                    counts["error"] += 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(args.probe_interval)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+        print(f"logins      {counts['ok'] / elapsed:>9.1f} /s  ok {counts['ok']}  429 {counts['busy']}  errors {counts['error']}  ({elapsed:.1f} s)")
+        print(f"GET / probe p50 {percentile(probe_latencies, 50) * 1000:>7.1f} ms  "
+              f"p99 {percentile(probe_latencies, 99) * 1000:>7.1f} ms  "
+              f"max {max(probe_latencies) * 1000:>7.1f} ms  ({len(probe_latencies)} samples)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
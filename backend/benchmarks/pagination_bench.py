@@ -0,0 +1,87 @@
+"""
+Page 1 vs deep-page latency for the list endpoints, offset vs cursor.
+
+Seed enough data for the requested page (page 10,000 at limit 100 needs
+1,000,000 documents per collection), start the API, then run:
+
+    python -m backend.benchmarks.pagination_bench --page 10000 --limit 100
+
+For every endpoint it times `?skip=` paging and `?cursor=` paging at page 1
+and at the deep page, with and without a `fields=` projection.
+Requires `httpx`.
+"""
+import argparse
+import statistics
+import time
+
+import httpx
+
+from backend.services.pagination import encode_cursor
+
+BASE_URL = "http://localhost:8000"
+ENDPOINTS = {
+    "/products/": "name,stock_level",
+    "/suppliers/": "name",
+    "/orders/": "quantity,status,order_date",
+}
+
+
+def get_token(client):
+    username = "bench_user"
+    password = "bench_password"
+    client.post("/auth/signup", json={"username": username, "email": "bench@example.com", "password": password})
+    resp = client.post("/auth/token", data={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+def timed(client, path, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        resp = client.get(path, params=params)
+        samples.append(time.perf_counter() - start)
+        resp.raise_for_status()
+    return statistics.median(samples) * 1000
+
+
+def cursor_for_page(client, path, page, limit):
+    """
+    Cursor pointing just before the first document of `page` (1-based).
+    """
+    if page <= 1:
+        return None
+    resp = client.get(path, params={"skip": (page - 1) * limit - 1, "limit": 1, "fields": "id"})
+    resp.raise_for_status()
+    rows = resp.json()
+    return encode_cursor(rows[0]["id"]) if rows else None
+
+
+def main(args):
+    with httpx.Client(base_url=args.base_url, timeout=300) as client:
+        client.headers["Authorization"] = f"Bearer {get_token(client)}"
+
+        print(f"{'endpoint':<13} {'mode':<8} {'fields':<7} {'page 1 ms':>10} {f'page {args.page} ms':>14}")
+        for path, fields in ENDPOINTS.items():
+            deep_cursor = cursor_for_page(client, path, args.page, args.limit)
+            if deep_cursor is None and args.page > 1:
+                print(f"{path:<13} not enough documents for page {args.page}")
+                continue
+            for projected in (False, True):
+                extra = {"fields": fields} if projected else {}
+                base = {"limit": args.limit, **extra}
+                offset_first = timed(client, path, base, args.repeat)
+                offset_deep = timed(client, path, {**base, "skip": (args.page - 1) * args.limit}, args.repeat)
+                cursor_deep = timed(client, path, {**base, "cursor": deep_cursor}, args.repeat)
+                label = "yes" if projected else "no"
+                print(f"{path:<13} {'skip':<8} {label:<7} {offset_first:>10.1f} {offset_deep:>14.1f}")
+                print(f"{path:<13} {'cursor':<8} {label:<7} {offset_first:>10.1f} {cursor_deep:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--page", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+"""
+Render time and peak memory of the PDF report renderer by row count.
+
+Feeds synthetic order rows (no database needed) through the previous
+single-Table renderer and the paginated one, and charts the results:
+
+    python -m backend.benchmarks.pdf_bench --rows 1000,5000,10000,50000
+
+Each run happens in a fresh subprocess so peak RSS is not shared. The
+single-Table renderer grows much faster than linearly, so it is skipped
+above --single-table-max rows (default 10000).
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+from backend.benchmarks.export_bench import COLUMNS, synthetic_rows
+
+RENDERERS = ["single-table", "paginated"]
+BAR_WIDTH = 40
+
+
+def single_table_pdf(data, title):
+    """
+    The previous renderer: every row in one auto-sized Table.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet
+    from backend.services import reporting
+
+    output = BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    headers = list(data[0].keys())
+    t = Table([headers] + [[str(row[col]) for col in headers] for row in data])
+    t.setStyle(reporting.PDF_TABLE_STYLE)
+    doc.build([Paragraph(title, getSampleStyleSheet()['Title']), t])
+    return output
+
+
+def run_one(renderer, rows):
+    from backend.services import reporting
+
+    started = time.perf_counter()
+    if renderer == "single-table":
+        output = single_table_pdf(list(synthetic_rows(rows)), "Orders Report")
+    else:
+        output = reporting.render_pdf(COLUMNS, synthetic_rows(rows), "Orders Report")
+
+    return {
+        "renderer": renderer,
+        "rows": rows,
+        "total_s": time.perf_counter() - started,
+        "bytes": len(output.getvalue()),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bar(value, largest):
+    return "#" * max(1, round(BAR_WIDTH * value / largest)) if largest else ""
+
+
+def chart(results, metric, label):
+    largest = max(r[metric] for r in results)
+    print(f"\n{label}")
+    for r in results:
+        print(f"{r['renderer']:<13} {r['rows']:>8} {r[metric]:>9.2f} {bar(r[metric], largest)}")
+
+
+def main(args):
+    results = []
+    print(f"{'renderer':<13} {'rows':>8} {'total s':>9} {'MB out':>8} {'peak RSS MB':>12}")
+    for rows in [int(n) for n in args.rows.split(",")]:
+        for renderer in RENDERERS:
+            if renderer == "single-table" and rows > args.single_table_max:
+                continue
+            out = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.pdf_bench", "--child", renderer, "--rows", str(rows)],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(r)
+            print(f"{r['renderer']:<13} {r['rows']:>8} {r['total_s']:>9.2f} {r['bytes'] / 1e6:>8.1f} {r['peak_rss_mb']:>12.1f}")
+
+    chart(results, "total_s", "render time (s)")
+    chart(results, "peak_rss_mb", "peak RSS (MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,5000,10000,50000")
+    parser.add_argument("--single-table-max", type=int, default=10000)
+    parser.add_argument("--child", choices=RENDERERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_one(args.child, int(args.rows))))
+    else:
+        main(args)
@@ -0,0 +1,80 @@
+"""
+Replenishment plan for a large catalog.
+
+Seeds suppliers and products (and stored forecasts for --forecasts of
+them) into a scratch database (default `scm_bench`, dropped afterwards) on
+MONGO_URL, then times the plan:
+
+    python -m backend.benchmarks.replenishment_bench --products 100000
+
+Reports the time spent loading the inputs, computing every product's
+order, and the whole GET /analytics/replenishment-plan service call for
+the first page of suppliers; with --create, also placing every suggested
+order.
+"""
+import argparse
+import time
+
+import numpy as np
+from pymongo import MongoClient
+
+from backend import database
+from backend.services import analytics, forecasting, indexes, order_simulation
+
+
+def seed_forecasts(db, count: int, products: int):
+    rng = np.random.default_rng(0)
+    product_ids = rng.choice(np.arange(1, products + 1), min(count, products), replace=False)
+    for start in range(0, len(product_ids), 10000):
+        db[forecasting.FORECASTS_COLLECTION].insert_many([
+            {"product_id": int(product_id), "forecast": rng.gamma(2, 2, forecasting.FORECAST_PERIODS).round(2).tolist()}
+            for product_id in product_ids[start:start + 10000]
+        ], ordered=False)
+
+
+def main(args):
+    client = MongoClient(database.MONGO_URL)
+    db = client[args.database]
+    client.drop_database(args.database)
+    try:
+        indexes.ensure_indexes(db)
+        order_simulation.seed_catalog(db, args.suppliers, args.products, seed=0)
+        seed_forecasts(db, args.forecasts, args.products)
+
+        started = time.perf_counter()
+        columns, _ = analytics.load_replenishment_inputs(db)
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        result = analytics.compute_replenishment(*(columns[f] for f in (
+            "price", "stock_level", "on_order", "reorder_point", "daily_demand", "lead_time_days", "reliability", "demand_cv",
+            "ordering_cost", "holding_cost_rate", "min_order_quantity",
+        )))
+        computed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        plan, total = analytics.replenishment_plan(db, limit=args.limit)
+        planned = time.perf_counter() - started
+
+        print(f"{plan['products']} products, {plan['lines']} lines to order from {total} suppliers "
+              f"({int((result['quantity'] > 0).sum())} computed)")
+        print(f"load inputs : {loaded:8.2f} s")
+        print(f"compute     : {computed:8.3f} s")
+        print(f"plan        : {planned:8.2f} s  (first {args.limit} suppliers)")
+        if args.create:
+            started = time.perf_counter()
+            created = analytics.create_replenishment_orders(db)
+            elapsed = time.perf_counter() - started
+            print(f"create      : {elapsed:8.2f} s  ({created['orders']} orders)")
+    finally:
+        client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--suppliers", type=int, default=500)
+    parser.add_argument("--forecasts", type=int, default=50000, help="products with a stored forecast")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--create", action="store_true")
+    parser.add_argument("--database", default="scm_bench")
+    main(parser.parse_args())
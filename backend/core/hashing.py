@@ -0,0 +1,132 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+# Hashes with any other round count are upgraded on the next login.
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify calls queued or running at once; beyond that requests are
+# turned away rather than queued behind a login burst.
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__max_rounds=PBKDF2_ROUNDS,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0, "pool_restarts": 0}
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class HashingUnavailable(Exception):
+    pass
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, hashed: str):
+    """
+    (valid, new hash or None): a new hash is returned when the stored one
+    was made with other parameters.
+    """
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def _get_executor():
+    # Spawned like the report workers: the API process holds Mongo clients
+    # and threads that must not be forked.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard(executor):
+    """
+    Drop a pool broken by a dead worker (e.g. OOM-killed) so the next call
+    starts a new one; a broken pool fails every call submitted to it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+        _stats["pool_restarts"] += 1
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _run(fn, *args):
+    """
+    Run `fn` in the hashing pool, off the event loop and the API's GIL.
+    Raises HashingBusy when HASH_MAX_PENDING calls are already in flight.
+    A call that finds the pool broken is retried once on a new pool, then
+    raises HashingUnavailable.
+    """
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise HashingBusy()
+    _pending += 1
+    try:
+        for attempt in range(2):
+            executor = _get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool as e:
+                _discard(executor)
+                if attempt:
+                    raise HashingUnavailable() from e
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    hashed = await _run(hash_password, password)
+    _stats["hashed"] += 1
+    return hashed
+
+
+async def verify_password_async(password: str, hashed: str):
+    valid, new_hash = await _run(verify_and_update, password, hashed)
+    _stats["verified"] += 1
+    if new_hash is not None:
+        _stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def stats() -> dict:
+    return {
+        "rounds": PBKDF2_ROUNDS,
+        "workers": HASH_WORKERS,
+        "max_pending": HASH_MAX_PENDING,
+        "pending": _pending,
+        **_stats,
+    }
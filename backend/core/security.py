@@ -1,12 +1,13 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import os
+import time
 from dotenv import load_dotenv
 from .. import database
+from . import auth_cache, hashing
 
 load_dotenv()
 
@@ -14,9 +15,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_keep_it_secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+pwd_context = hashing.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
+# Synchronous helpers; the auth routes hash in the pool (see hashing).
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -33,22 +36,40 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(database.get_async_db)):
+    """
+    The user a bearer token belongs to. Decoded tokens and users are
+    cached in-process (see auth_cache), so repeat requests with the same
+    token neither decode it nor read the users collection.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    username = auth_cache.tokens.get(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.users.find_one({"username": username})
-    
+        auth_cache.tokens.put(token, username, ttl=payload["exp"] - time.time() if "exp" in payload else None)
+
+    user = auth_cache.users.get(username)
     if user is None:
-        raise credentials_exception
-    return user
+        user = await db.users.find_one({"username": username}, {"hashed_password": 0})
+        if user is None:
+            raise credentials_exception
+        auth_cache.users.put(username, user)
+    return dict(user)
+
+async def get_current_user_for_stream(token: Optional[str] = Depends(optional_oauth2_scheme), access_token: Optional[str] = None, db = Depends(database.get_async_db)):
+    """
+    get_current_user for event streams: the token may also be passed as
+    an `access_token` query parameter, as browsers' EventSource cannot set
+    headers.
+    """
+    return await get_current_user(token or access_token or "", db)
@@ -1,16 +1,37 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 import os
 from dotenv import load_dotenv
 
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
 MONGO_URL = os.getenv("MONGO_URL")
-client = MongoClient(MONGO_URL)
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "scm_db")
+
+client_options = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+}
+
+# Synchronous client, kept for the pandas/sklearn services and the report
+# renderers, which run in worker threads rather than on the event loop.
+client = MongoClient(MONGO_URL, **client_options)
+
+# Asynchronous client used by the request handlers.
+async_client = AsyncMongoClient(MONGO_URL, **client_options)
 
 try:
-    db = client.get_database("scm_db")
+    db = client.get_database(MONGO_DB_NAME)
+    async_db = async_client.get_database(MONGO_DB_NAME)
 except Exception:
     db = client.get_default_database()
+    async_db = async_client.get_default_database()
 
 def get_db():
     return db
+
+def get_async_db():
+    return async_db
@@ -1,7 +1,11 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from . import database
-from .routers import products, suppliers, orders, analytics, simulation, auth, reports
+from .core import hashing
+from .routers import products, suppliers, orders, analytics, simulation, auth, reports, diagnostics, imports, alerts, events
+from .services import analytics as scms_analysis, indexes, dashboard_stats, report_jobs, forecasting, stock_ledger, low_stock_alerts, events as event_feed
 
 app = FastAPI(title="SCM System")
 
@@ -17,9 +21,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
+@app.on_event("startup")
+async def bootstrap_indexes():
+    await run_in_threadpool(indexes.ensure_indexes, database.db)
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    app.state.background_tasks = [
+        asyncio.create_task(dashboard_stats.reconcile_periodically(database.db)),
+        asyncio.create_task(stock_ledger.snapshot_periodically(database.db)),
+        asyncio.create_task(scms_analysis.refresh_abc_periodically(database.db)),
+        asyncio.create_task(low_stock_alerts.monitor.run(database.async_db)),
+        asyncio.create_task(event_feed.feed.run(database.async_db)),
+    ]
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for task in app.state.background_tasks:
+        task.cancel()
+    report_jobs.shutdown()
+    forecasting.shutdown()
+    hashing.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_database_clients():
+    await database.async_client.close()
+    database.client.close()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the SCM System API"}
@@ -31,3 +67,7 @@ app.include_router(analytics.router)
 app.include_router(simulation.router)
 app.include_router(auth.router)
 app.include_router(reports.router)
+app.include_router(diagnostics.router)
+app.include_router(imports.router)
+app.include_router(alerts.router)
+app.include_router(events.router)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from .. import schemas
+from ..core import security
+from ..services import broadcast, low_stock_alerts
+
+router = APIRouter(
+    prefix="/alerts",
+    tags=["alerts"],
+)
+
+# Like /events, the stream also accepts the token as ?access_token=, since
+# an EventSource cannot send an Authorization header.
+
+@router.get("/low-stock")
+async def get_low_stock(current_user: schemas.User = Depends(security.get_current_user)):
+    monitor = low_stock_alerts.monitor
+    return {"mode": monitor.mode, "updated_at": monitor.updated_at, "products": monitor.low_stock()}
+
+@router.get("/low-stock/stream")
+async def stream_low_stock(current_user: schemas.User = Depends(security.get_current_user_for_stream)):
+    """
+    Server-Sent Events: a "snapshot" of the current low-stock products,
+    then "low_stock" and "cleared" events as stock changes.
+    """
+    monitor = low_stock_alerts.monitor
+    subscription = monitor.broadcaster.subscribe()
+    body = broadcast.stream(monitor.broadcaster, subscription, [("snapshot", monitor.low_stock())])
+    return StreamingResponse(body, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
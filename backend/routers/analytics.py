@@ -1,78 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from .. import database
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from .. import database, schemas
+from ..core import security
 from ..services import analytics as scms_analysis
+from ..services import dashboard_stats, file_analysis, forecasting, pagination, supplier_metrics
 
 router = APIRouter(
     prefix="/analytics",
     tags=["analytics"],
 )
 
+@router.get("/forecast")
+async def list_forecasts(limit: int = 100, cursor: Optional[str] = None, db = Depends(database.get_async_db)):
+    try:
+        docs, next_cursor = await pagination.fetch_page(
+            db[forecasting.FORECASTS_COLLECTION], {}, limit, cursor=cursor,
+            projection={"_id": 0}, key="product_id",
+        )
+    except pagination.InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return pagination.partial_response(docs, next_cursor)
+
+@router.post("/forecast")
+async def run_forecasts(periods: int = forecasting.FORECAST_PERIODS, model: str = forecasting.FORECAST_MODEL, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    try:
+        return await run_in_threadpool(forecasting.run_forecasts, db, periods, model)
+    except forecasting.InvalidForecastRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/forecast/{product_id}")
-def get_forecast(product_id: int, db = Depends(database.get_db)):
-    result = scms_analysis.get_demand_forecast(db, product_id)
+async def get_forecast(product_id: int, model: Optional[str] = None, db = Depends(database.get_db)):
+    try:
+        result = await run_in_threadpool(forecasting.get_forecast, db, product_id, model)
+    except forecasting.InvalidForecastRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
 
 @router.get("/abc")
-def get_abc_classification(db = Depends(database.get_db)):
-    result = scms_analysis.abc_analysis(db)
+async def get_abc_classification(response: Response, basis: str = "stock", category: Optional[str] = None, skip: int = 0, limit: int = 100, db = Depends(database.get_db)):
+    if basis not in scms_analysis.ABC_BASES:
+        raise HTTPException(status_code=400, detail=f"Invalid basis. Use one of: {', '.join(scms_analysis.ABC_BASES)}.")
+    result, total = await run_in_threadpool(scms_analysis.abc_analysis, db, basis, category, skip, limit)
+    response.headers[pagination.TOTAL_COUNT_HEADER] = str(total)
     return result
 
+@router.post("/abc/refresh")
+async def refresh_abc_classification(basis: str = "stock", db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    if basis not in scms_analysis.ABC_BASES:
+        raise HTTPException(status_code=400, detail=f"Invalid basis. Use one of: {', '.join(scms_analysis.ABC_BASES)}.")
+    state = await run_in_threadpool(scms_analysis.refresh_abc, db, basis, True)
+    state.pop("_id", None)
+    return state
+
 @router.get("/supplier-classification")
-def get_supplier_classification(db = Depends(database.get_db)):
-    result = scms_analysis.classify_suppliers(db)
+async def get_supplier_classification(db = Depends(database.get_db)):
+    result = await run_in_threadpool(supplier_metrics.get_classifications, db)
     return result
 
+@router.post("/supplier-classification/refresh")
+async def refresh_supplier_classification(db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    state = await run_in_threadpool(supplier_metrics.refresh, db, True)
+    state.pop("_id", None)
+    return state
+
 @router.get("/eoq")
-def get_eoq_analysis(db = Depends(database.get_db)):
-    result = scms_analysis.get_eoq_data(db)
+async def get_eoq_analysis(response: Response, category: Optional[str] = None, status: Optional[str] = None, skip: int = 0, limit: int = 100, db = Depends(database.get_db)):
+    if status is not None and status not in scms_analysis.EOQ_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Use one of: {', '.join(scms_analysis.EOQ_STATUSES)}.")
+    result, total = await run_in_threadpool(scms_analysis.get_eoq_data, db, category, status, skip, limit)
+    response.headers[pagination.TOTAL_COUNT_HEADER] = str(total)
+    return result
+
+@router.get("/replenishment-plan")
+async def get_replenishment_plan(response: Response, category: Optional[str] = None, supplier_id: Optional[int] = None, skip: int = 0, limit: int = 100, db = Depends(database.get_db)):
+    result, total = await run_in_threadpool(scms_analysis.replenishment_plan, db, category, supplier_id, skip, limit)
+    response.headers[pagination.TOTAL_COUNT_HEADER] = str(total)
     return result
 
+@router.post("/replenishment-plan/orders")
+async def create_replenishment_orders(category: Optional[str] = None, supplier_id: Optional[int] = None, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    try:
+        return await run_in_threadpool(scms_analysis.create_replenishment_orders, db, category, supplier_id)
+    except scms_analysis.ReplenishmentInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/category-costs", response_model=List[schemas.CategoryCosts])
+async def list_category_costs(db = Depends(database.get_async_db)):
+    return await db[scms_analysis.CATEGORY_COSTS_COLLECTION].find({}, {"_id": 0}).to_list(length=None)
+
+@router.put("/category-costs/{category}", response_model=schemas.CategoryCosts)
+async def set_category_costs(category: str, costs: schemas.CategoryCostsBase, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    doc = {"category": category, **costs.dict()}
+    await db[scms_analysis.CATEGORY_COSTS_COLLECTION].replace_one({"category": category}, doc, upsert=True)
+    return doc
+
 @router.get("/dashboard-stats")
-def get_dashboard_stats(db = Depends(database.get_db)):
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "products",
-                "localField": "product_id",
-                "foreignField": "id",
-                "as": "product_info"
-            }
-        },
-        {
-            "$unwind": "$product_info"
-        },
-        {
-            "$group": {
-                "_id": None,
-                "totalRevenue": {
-                    "$sum": { "$multiply": ["$quantity", "$product_info.price"] }
-                }
-            }
-        }
-    ]
-    
-    revenue_result = list(db.orders.aggregate(pipeline))
-    total_revenue = revenue_result[0]["totalRevenue"] if revenue_result else 0
-    
-    total_products = db.products.count_documents({})
-    low_stock_alerts = db.products.count_documents({"$expr": {"$lte": ["$stock_level", "$reorder_point"]}})
-    active_suppliers = db.suppliers.count_documents({})
-    
-    return {
-        "total_revenue": int(total_revenue),
-        "total_products": total_products,
-        "low_stock_alerts": low_stock_alerts,
-        "active_suppliers": active_suppliers
-    }
-
-import io
+async def get_dashboard_stats(db = Depends(database.get_async_db), sync_db = Depends(database.get_db)):
+    stats = await dashboard_stats.get_stats(db, sync_db)
+    stats["total_revenue"] = int(stats["total_revenue"])
+    return stats
+
+@router.post("/dashboard-stats/reconcile")
+async def reconcile_dashboard_stats(db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    return await run_in_threadpool(dashboard_stats.reconcile, db)
 
 @router.post("/analyze-file")
 async def analyze_file_endpoint(file: UploadFile = File(...)):
-    contents = await file.read()
-    result = scms_analysis.analyze_file(io.BytesIO(contents), file.filename)
-    
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
-        
-    return result
+    # Starlette has already spooled the upload to a temporary file, which
+    # the analyzer reads in chunks on a worker thread.
+    try:
+        return await run_in_threadpool(file_analysis.analyze_file, file.file, file.filename)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
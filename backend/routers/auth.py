@@ -1,29 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
+from pymongo.errors import DuplicateKeyError
 from .. import schemas, database
-from ..core import security
+from ..core import security, auth_cache, hashing
+from ..services import ids
 
 router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
 )
 
+def _busy():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many concurrent sign-ins, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+def _unavailable():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Password hashing is restarting, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def _already_registered(db, user: schemas.UserCreate):
+    if await db.users.find_one({"username": user.username}):
+        return "Username already registered"
+    if user.email is not None and await db.users.find_one({"email": user.email}):
+        return "Email already registered"
+    return None
+
 @router.post("/signup", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db = Depends(database.get_db)):
-    db_user = db.users.find_one({"username": user.username})
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    db_email = db.users.find_one({"email": user.email})
-    if db_email:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = security.get_password_hash(user.password)
-    last_user = list(db.users.find().sort("id", -1).limit(1))
-    new_id = 1
-    if last_user:
-        new_id = last_user[0]["id"] + 1
+async def create_user(user: schemas.UserCreate, db = Depends(database.get_async_db)):
+    detail = await _already_registered(db, user)
+    if detail:
+        raise HTTPException(status_code=400, detail=detail)
+
+    try:
+        hashed_password = await hashing.hash_password_async(user.password)
+    except hashing.HashingBusy:
+        raise _busy()
+    except hashing.HashingUnavailable:
+        raise _unavailable()
+    new_id = await ids.next_id_async(db, "users")
 
     new_user = {
         "id": new_id,
@@ -32,12 +53,18 @@ def create_user(user: schemas.UserCreate, db = Depends(database.get_db)):
         "hashed_password": hashed_password,
         "is_active": True
     }
-    db.users.insert_one(new_user)
+    try:
+        await db.users.insert_one(new_user)
+    except DuplicateKeyError:
+        # Another signup with the same username or email won the race
+        # after the check above; the unique indexes turned it away.
+        raise HTTPException(status_code=400, detail=await _already_registered(db, user) or "User already registered")
+    auth_cache.invalidate_user(user.username)
     return new_user
 
 @router.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(database.get_db)):
-    user = db.users.find_one({"username": form_data.username})
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(database.get_async_db)):
+    user = await db.users.find_one({"username": form_data.username})
     
     if not user:
         raise HTTPException(
@@ -46,12 +73,22 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not security.verify_password(form_data.password, user["hashed_password"]):
+    try:
+        valid, new_hash = await hashing.verify_password_async(form_data.password, user["hashed_password"])
+    except hashing.HashingBusy:
+        raise _busy()
+    except hashing.HashingUnavailable:
+        raise _unavailable()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash is not None:
+        # Stored with other hashing parameters (e.g. PBKDF2_ROUNDS changed).
+        await db.users.update_one({"id": user["id"], "hashed_password": user["hashed_password"]}, {"$set": {"hashed_password": new_hash}})
+        auth_cache.invalidate_user(user["username"])
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
         data={"sub": user["username"]}, expires_delta=access_token_expires
@@ -59,5 +96,5 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=schemas.User)
-def read_users_me(current_user: dict = Depends(security.get_current_user)):
+async def read_users_me(current_user: dict = Depends(security.get_current_user)):
     return current_user
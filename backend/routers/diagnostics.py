@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from .. import database, schemas
+from ..core import security, auth_cache, hashing
+from ..services import indexes, forecast_cache, low_stock_alerts, events
+
+router = APIRouter(
+    prefix="/diagnostics",
+    tags=["diagnostics"],
+)
+
+@router.get("/query-plans")
+async def get_query_plans(db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    report = await run_in_threadpool(indexes.verify_query_plans, db)
+    ok = not any(entry["collscan"] for entry in report)
+    return JSONResponse(status_code=200 if ok else 500, content={"ok": ok, "queries": report})
+
+@router.get("/forecast-cache")
+async def get_forecast_cache_stats(current_user: schemas.User = Depends(security.get_current_user)):
+    return forecast_cache.cache.stats()
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats(current_user: schemas.User = Depends(security.get_current_user)):
+    return auth_cache.stats()
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats(current_user: schemas.User = Depends(security.get_current_user)):
+    return hashing.stats()
+
+@router.get("/low-stock-alerts")
+async def get_low_stock_alert_stats(current_user: schemas.User = Depends(security.get_current_user)):
+    return low_stock_alerts.monitor.stats()
+
+@router.get("/events")
+async def get_event_feed_stats(current_user: schemas.User = Depends(security.get_current_user)):
+    return events.feed.stats()
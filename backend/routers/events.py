@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from .. import schemas, database
+from ..core import security
+from ..services import broadcast, events
+
+router = APIRouter(
+    tags=["events"],
+)
+
+@router.get("/events")
+async def stream_events(db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user_for_stream)):
+    """
+    Server-Sent Events: the current dashboard figures, then
+    "order-created", "stock-changed" and "stats-updated" events. All
+    subscribers share the process's single change feed; one that cannot
+    keep up is sent "dropped" and disconnected.
+    """
+    feed = events.feed
+    initial = [("stats-updated", await feed.current_stats(db))]
+    subscription = feed.broadcaster.subscribe()
+    body = broadcast.stream(feed.broadcaster, subscription, initial)
+    return StreamingResponse(body, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from starlette.concurrency import run_in_threadpool
+from .. import database, schemas
+from ..core import security
+from ..services import bulk_import
+
+router = APIRouter(
+    prefix="/import",
+    tags=["import"],
+)
+
+@router.post("/{entity}")
+async def import_entity(entity: str, file: UploadFile = File(...), db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    try:
+        return await run_in_threadpool(bulk_import.import_file, db, entity, file.file, file.filename)
+    except bulk_import.InvalidImport as e:
+        raise HTTPException(status_code=400, detail=str(e))
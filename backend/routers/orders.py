@@ -1,39 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pymongo import ReturnDocument
+from typing import List, Optional
 from datetime import datetime
 from .. import schemas, database
 from ..core import security
+from ..services import ids, dashboard_stats, order_details, pagination, forecast_cache, supplier_metrics, change_log, stock_ledger
 
 router = APIRouter(
     prefix="/orders",
     tags=["orders"],
 )
 
-@router.post("/", response_model=schemas.Order)
-def create_order(order: schemas.OrderCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    last_order = list(db.orders.find().sort("id", -1).limit(1))
-    new_id = 1
-    if last_order:
-        new_id = last_order[0]["id"] + 1
+ORDER_FIELDS = pagination.model_fields(schemas.OrderWithDetails)
+
+async def _book_receipt(db, order) -> int:
+    """
+    Book a shipped or received order into stock, through the ledger.
+    Returns the change in low-stock alerts.
+    """
+    product = await db.products.find_one({"id": order["product_id"]}, {"_id": 0, "stock_level": 1, "reorder_point": 1})
+    await stock_ledger.apply_movements_async(db, [stock_ledger.movement(order["product_id"], "receipt", order["quantity"], order_id=order["id"])])
+    if product is None:
+        return 0
+    after = {**product, "stock_level": product["stock_level"] + order["quantity"]}
+    return int(dashboard_stats.is_low_stock(after)) - int(dashboard_stats.is_low_stock(product))
 
+@router.post("/", response_model=schemas.Order)
+async def create_order(order: schemas.OrderCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    if order.status not in supplier_metrics.ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Use one of: {', '.join(supplier_metrics.ORDER_STATUSES)}.")
     new_order_data = order.dict()
-    new_order_data["id"] = new_id
     new_order_data["order_date"] = datetime.utcnow()
+    new_order_data["status_history"] = [{"status": order.status, "at": new_order_data["order_date"]}]
     
-    product = db.products.find_one({"id": order.product_id})
+    product = await db.products.find_one({"id": order.product_id})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    new_order_data["product"] = product
     
-    supplier = db.suppliers.find_one({"id": order.supplier_id})
+    supplier = await db.suppliers.find_one({"id": order.supplier_id})
     if not supplier:
          raise HTTPException(status_code=404, detail="Supplier not found")
-    new_order_data["supplier"] = supplier
+    order_details.apply_storage(new_order_data, product, supplier)
 
-    db.orders.insert_one(new_order_data)
+    new_order_data["id"] = await ids.next_id_async(db, "orders")
+    await db.orders.insert_one(new_order_data)
+    stocked = order.status in supplier_metrics.STOCKED_STATUSES
+    low_stock_delta = await _book_receipt(db, new_order_data) if stocked else 0
+    await dashboard_stats.record_order(db, order.quantity, product["price"], low_stock_delta, stock_changed=stocked)
+    await supplier_metrics.record_order_created(db, new_order_data)
+    await forecast_cache.record_order(db, order.product_id)
+    await change_log.record_orders_async(db, [new_order_data])
     return new_order_data
 
+@router.patch("/{order_id}/status", response_model=schemas.Order)
+async def update_order_status(order_id: int, update: schemas.OrderStatusUpdate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    if update.status not in supplier_metrics.ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Use one of: {', '.join(supplier_metrics.ORDER_STATUSES)}.")
+    order = await db.orders.find_one({"id": order_id}, order_details.ORDER_PROJECTION)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order["status"] == update.status:
+        return order
+    if order["status"] in supplier_metrics.TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Order is already {order['status']}")
+
+    # Conditional on the status we read, so concurrent transitions of the
+    # same order are only counted once.
+    changed_at = datetime.utcnow()
+    updated = await db.orders.find_one_and_update(
+        {"id": order_id, "status": order["status"]},
+        {"$set": {"status": update.status}, "$push": {"status_history": {"status": update.status, "at": changed_at}}},
+        projection=order_details.ORDER_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        raise HTTPException(status_code=409, detail="Order status changed concurrently, retry")
+
+    # Counted as on order by the replenishment plan until now. Only the
+    # request whose conditional update won gets here, so it is booked once.
+    stocked = update.status in supplier_metrics.STOCKED_STATUSES and order["status"] not in supplier_metrics.STOCKED_STATUSES
+    low_stock_delta = await _book_receipt(db, updated) if stocked else 0
+
+    supplier = await db.suppliers.find_one({"id": updated["supplier_id"]}, {"_id": 0, "lead_time_days": 1})
+    await supplier_metrics.record_status_change(db, updated, update.status, changed_at, supplier_metrics.promised_lead_time(supplier))
+    await dashboard_stats.record_order_status_changed(db, low_stock_delta, stock_changed=stocked)
+    return updated
+
 @router.get("/", response_model=List[schemas.OrderWithDetails])
-def read_orders(skip: int = 0, limit: int = 100, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    orders = list(db.orders.find().skip(skip).limit(limit))
+async def read_orders(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None, status: Optional[str] = None, product_id: Optional[int] = None, supplier_id: Optional[int] = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    query = {}
+    if status is not None:
+        query["status"] = status
+    if product_id is not None:
+        query["product_id"] = product_id
+    if supplier_id is not None:
+        query["supplier_id"] = supplier_id
+    if start_date is not None or end_date is not None:
+        query["order_date"] = {}
+        if start_date is not None:
+            query["order_date"]["$gte"] = start_date
+        if end_date is not None:
+            query["order_date"]["$lte"] = end_date
+
+    try:
+        projection = pagination.parse_fields(fields, ORDER_FIELDS)
+    except pagination.InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # `product` and `supplier` are resolved from their own collections, so
+    # they are never read from the order document itself.
+    wants_product = projection is None or "product" in projection
+    wants_supplier = projection is None or "supplier" in projection
+    if projection is None:
+        projection = dict(order_details.ORDER_PROJECTION)
+    else:
+        projection.pop("product", None)
+        projection.pop("supplier", None)
+        if wants_product:
+            projection["product_id"] = 1
+        if wants_supplier:
+            projection["supplier_id"] = 1
+
+    try:
+        orders, next_cursor = await pagination.fetch_page(db.orders, query, limit, cursor, skip, projection)
+    except pagination.InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if wants_product or wants_supplier:
+        await order_details.resolve_details_async(db, orders)
+        for o in orders:
+            if not wants_product:
+                o.pop("product", None)
+            if not wants_supplier:
+                o.pop("supplier", None)
+
+    if fields:
+        return pagination.partial_response(orders, next_cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return orders
@@ -1,62 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 from .. import schemas, database
 from ..core import security
+from ..services import ids, dashboard_stats, pagination, stock_ledger
 
 router = APIRouter(
     prefix="/products",
     tags=["Product"],
 )
 
+PRODUCT_FIELDS = pagination.model_fields(schemas.Product)
+
+def _naive_utc(value: Optional[datetime]):
+    # Stored dates are naive UTC.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 @router.post("/", response_model=schemas.Product)
-def create_product(product: schemas.ProductCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    last_product = list(db.products.find().sort("id", -1).limit(1))
-    new_id = 1
-    if last_product:
-        new_id = last_product[0]["id"] + 1
+async def create_product(product: schemas.ProductCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    new_id = await ids.next_id_async(db, "products")
 
     new_product_data = product.dict()
     new_product_data["id"] = new_id
     
-    supplier = db.suppliers.find_one({"id": product.supplier_id})
+    supplier = await db.suppliers.find_one({"id": product.supplier_id})
     if supplier:
         new_product_data["supplier"] = supplier
     
-    db.products.insert_one(new_product_data)
+    await db.products.insert_one(new_product_data)
+    if product.stock_level:
+        await stock_ledger.record_movements_async(db, [stock_ledger.movement(new_id, "adjustment", product.stock_level, reason="initial")])
+    await dashboard_stats.record_product_created(db, new_product_data)
     return new_product_data
 
 @router.get("/", response_model=List[schemas.Product])
-def read_products(skip: int = 0, limit: int = 100, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    products = list(db.products.find().skip(skip).limit(limit))
+async def read_products(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None, category: Optional[str] = None, supplier_id: Optional[int] = None, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    query = {}
+    if category is not None:
+        query["category"] = category
+    if supplier_id is not None:
+        query["supplier_id"] = supplier_id
+
+    try:
+        projection = pagination.parse_fields(fields, PRODUCT_FIELDS)
+        products, next_cursor = await pagination.fetch_page(db.products, query, limit, cursor, skip, projection)
+    except pagination.InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if projection is not None:
+        return pagination.partial_response(products, next_cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return products
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    product = db.products.find_one({"id": product_id})
+async def read_product(product_id: int, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    product = await db.products.find_one({"id": product_id})
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @router.put("/{product_id}", response_model=schemas.Product)
-def update_product(product_id: int, product: schemas.ProductCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    db_product = db.products.find_one({"id": product_id})
+async def update_product(product_id: int, product: schemas.ProductCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    db_product = await db.products.find_one({"id": product_id})
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
     update_data = product.dict(exclude_unset=True)
     
     if "supplier_id" in update_data:
-         supplier = db.suppliers.find_one({"id": update_data["supplier_id"]})
+         supplier = await db.suppliers.find_one({"id": update_data["supplier_id"]})
          if supplier:
              update_data["supplier"] = supplier
 
-    db.products.update_one({"id": product_id}, {"$set": update_data})
-    return db.products.find_one({"id": product_id})
+    # Conditional on the stock we read, so the ledger adjustment matches
+    # what was overwritten.
+    result = await db.products.update_one({"id": product_id, "stock_level": db_product["stock_level"]}, {"$set": update_data})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Product stock changed concurrently, retry")
+    delta = update_data.get("stock_level", db_product["stock_level"]) - db_product["stock_level"]
+    if delta:
+        await stock_ledger.record_movements_async(db, [stock_ledger.movement(product_id, "adjustment", delta, reason="update")])
+    updated_product = await db.products.find_one({"id": product_id})
+    await dashboard_stats.record_product_updated(db, db_product, updated_product)
+    return updated_product
 
 @router.delete("/{product_id}")
-def delete_product(product_id: int, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    result = db.products.delete_one({"id": product_id})
-    if result.deleted_count == 0:
+async def delete_product(product_id: int, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    deleted_product = await db.products.find_one_and_delete({"id": product_id})
+    if deleted_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    await dashboard_stats.record_product_deleted(db, deleted_product)
     
     return {"message": "Product deleted successfully"}
+
+@router.post("/{product_id}/stock-movements", response_model=schemas.Product)
+async def record_stock_movement(product_id: int, entry: schemas.StockMovementCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    if entry.type != "adjustment" and entry.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Receipts and sales need a positive quantity")
+    quantity = -entry.quantity if entry.type == "sale" else entry.quantity
+    try:
+        movement = stock_ledger.movement(product_id, entry.type, quantity, reason=entry.reason)
+    except stock_ledger.InvalidMovement as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    db_product = await stock_ledger.apply_guarded_movement(db, movement)
+    if db_product is None:
+        if await db.products.find_one({"id": product_id}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    updated_product = {**db_product, "stock_level": db_product["stock_level"] + quantity}
+    await dashboard_stats.record_product_updated(db, db_product, updated_product)
+    return updated_product
+
+@router.get("/{product_id}/stock-history", response_model=schemas.StockHistory)
+async def read_stock_history(product_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, limit: int = stock_ledger.HISTORY_LIMIT, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    end_date = _naive_utc(end_date) or datetime.utcnow()
+    start_date = _naive_utc(start_date) or end_date - timedelta(days=30)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    if not 0 < limit <= stock_ledger.HISTORY_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {stock_ledger.HISTORY_LIMIT}")
+    history = await stock_ledger.stock_history(db, product_id, start_date, end_date, limit)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return history
@@ -1,8 +1,10 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from .. import database, schemas
 from ..core import security
-from ..services import reporting
+from ..services import reporting, report_datasets, report_jobs
 from typing import List
 
 router = APIRouter(
@@ -10,72 +12,60 @@ router = APIRouter(
     tags=["Reports"]
 )
 
-@router.get("/orders/export/{format}")
-def export_orders(format: str, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    orders = list(db.orders.find())
-    data = []
-    for o in orders:
-        product_name = "N/A"
-        if "product" in o and o["product"]:
-             product_name = o["product"]["name"]
-        
-        supplier_name = "N/A"
-        if "supplier" in o and o["supplier"]:
-             supplier_name = o["supplier"]["name"]
+EXCEL_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-        data.append({
-            "Order ID": o["id"],
-            "Product": product_name,
-            "Quantity": o["quantity"],
-            "Date": o["order_date"].strftime("%Y-%m-%d"),
-            "Status": o["status"],
-            "Supplier": supplier_name
-        })
-    
+def export_response(format: str, compress: bool, dataset: report_datasets.ReportDataset):
+    """
+    Excel and CSV stream rows straight from the cursor; PDF is rendered a
+    page at a time into memory.
+    """
     if format == "excel":
-        file_stream = reporting.generate_excel(data, "orders.xlsx")
-        headers = {'Content-Disposition': 'attachment; filename="orders.xlsx"'}
-        return StreamingResponse(file_stream, headers=headers, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    
+        headers = {'Content-Disposition': f'attachment; filename="{dataset.name}.xlsx"'}
+        return StreamingResponse(reporting.stream_xlsx(dataset.columns, dataset.rows()), headers=headers, media_type=EXCEL_MEDIA_TYPE)
+
+    elif format == "csv":
+        filename = f"{dataset.name}.csv.gz" if compress else f"{dataset.name}.csv"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        media_type = 'application/gzip' if compress else 'text/csv'
+        return StreamingResponse(reporting.stream_csv(dataset.columns, dataset.rows(), compress=compress), headers=headers, media_type=media_type)
+
     elif format == "pdf":
-        file_stream = reporting.generate_pdf(data, "Orders Report")
-        headers = {'Content-Disposition': 'attachment; filename="orders.pdf"'}
+        file_stream = reporting.render_pdf(dataset.columns, dataset.rows(), dataset.title)
+        headers = {'Content-Disposition': f'attachment; filename="{dataset.name}.pdf"'}
         return StreamingResponse(file_stream, headers=headers, media_type='application/pdf')
-    
+
     else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use 'excel' or 'pdf'.")
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'excel', 'csv' or 'pdf'.")
+
+@router.get("/orders/export/{format}")
+def export_orders(format: str, compress: bool = False, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    return export_response(format, compress, report_datasets.orders_dataset(db))
 
 @router.get("/inventory/export/{format}")
-def export_inventory(format: str, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    products = list(db.products.find())
-    data = []
-    for p in products:
-        supplier_name = "N/A"
-        if "supplier" in p and p["supplier"]:
-            supplier_name = p["supplier"]["name"]
-        elif "supplier_id" in p:
-             s = db.suppliers.find_one({"id": p["supplier_id"]})
-             if s: supplier_name = s["name"]
+def export_inventory(format: str, compress: bool = False, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    return export_response(format, compress, report_datasets.inventory_dataset(db))
 
-        data.append({
-            "ID": p["id"],
-            "Name": p["name"],
-            "Category": p["category"],
-            "Price": p["price"],
-            "Stock": p["stock_level"],
-            "Reorder Point": p["reorder_point"],
-            "Supplier": supplier_name
-        })
+@router.post("/jobs", response_model=schemas.ReportJob, status_code=202)
+async def create_report_job(request: schemas.ReportJobCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
+    try:
+        return await run_in_threadpool(report_jobs.submit, db, request.dataset, request.format, request.compress)
+    except report_jobs.InvalidReportRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if format == "excel":
-        file_stream = reporting.generate_excel(data, "inventory.xlsx")
-        headers = {'Content-Disposition': 'attachment; filename="inventory.xlsx"'}
-        return StreamingResponse(file_stream, headers=headers, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    
-    elif format == "pdf":
-        file_stream = reporting.generate_pdf(data, "Inventory Report")
-        headers = {'Content-Disposition': 'attachment; filename="inventory.pdf"'}
-        return StreamingResponse(file_stream, headers=headers, media_type='application/pdf')
-    
-    else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use 'excel' or 'pdf'.")
+@router.get("/jobs/{job_id}", response_model=schemas.ReportJob)
+def read_report_job(job_id: str, current_user: schemas.User = Depends(security.get_current_user)):
+    job = report_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.get("/jobs/{job_id}/download")
+def download_report_job(job_id: str, current_user: schemas.User = Depends(security.get_current_user)):
+    job = report_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+    if not os.path.exists(report_jobs.artifact_path(job)):
+        raise HTTPException(status_code=410, detail="Report artifact expired, submit the job again")
+    return FileResponse(report_jobs.artifact_path(job), media_type=report_jobs.media_type(job), filename=report_jobs.artifact_filename(job))
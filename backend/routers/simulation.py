@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 from .. import database, schemas
+from ..services import ids, dashboard_stats, order_details, forecast_cache, supplier_metrics, order_simulation, stock_ledger, change_log
 import random
 from datetime import datetime
 
@@ -8,23 +11,22 @@ router = APIRouter(
     tags=["simulation"]
 )
 
+async def _random_document(collection):
+    cursor = await collection.aggregate([{"$sample": {"size": 1}}])
+    sampled = await cursor.to_list(length=1)
+    return sampled[0] if sampled else None
+
 @router.post("/generate-order")
-def generate_random_order(db = Depends(database.get_db)):
-    products = list(db.products.find())
-    suppliers = list(db.suppliers.find())
+async def generate_random_order(db = Depends(database.get_async_db)):
+    product = await _random_document(db.products)
+    supplier = await _random_document(db.suppliers)
     
-    if not products or not suppliers:
+    if not product or not supplier:
         return {"message": "No products or suppliers to simulate orders with."}
     
-    product = random.choice(products)
-    supplier = random.choice(suppliers)
-    
     quantity = random.randint(1, 20)
     
-    last_order = list(db.orders.find().sort("id", -1).limit(1))
-    new_id = 1
-    if last_order:
-        new_id = last_order[0]["id"] + 1
+    new_id = await ids.next_id_async(db, "orders")
 
     new_order = {
         "id": new_id,
@@ -33,14 +35,31 @@ def generate_random_order(db = Depends(database.get_db)):
         "quantity": quantity,
         "status": random.choice(["Pending", "Shipped", "Delivered"]),
         "order_date": datetime.utcnow(),
-        "product": product,
-        "supplier": supplier
     }
+    new_order["status_history"] = [{"status": new_order["status"], "at": new_order["order_date"]}]
+    order_details.apply_storage(new_order, product, supplier)
     
+    await db.orders.insert_one(new_order)
+
+    low_stock_delta = 0
     if new_order["status"] in ["Shipped", "Delivered"]:
-         new_stock = product["stock_level"] + quantity
-         db.products.update_one({"id": product["id"]}, {"$set": {"stock_level": new_stock}})
+         # $inc through the ledger rather than writing back the sampled level,
+         # which would lose concurrent updates.
+         await stock_ledger.apply_movements_async(db, [stock_ledger.movement(product["id"], "receipt", quantity, order_id=new_id)])
+         low_stock_delta = int(dashboard_stats.is_low_stock({**product, "stock_level": product["stock_level"] + quantity})) - int(dashboard_stats.is_low_stock(product))
     
-    db.orders.insert_one(new_order)
+    await dashboard_stats.record_order(db, quantity, product["price"], low_stock_delta, stock_changed=new_order["status"] in ["Shipped", "Delivered"])
+    await supplier_metrics.record_order_created(db, new_order)
+    await forecast_cache.record_order(db, product["id"])
+    await change_log.record_orders_async(db, [new_order])
     
     return {"message": "Random order generated", "order_id": new_order["id"], "product": product["name"], "quantity": quantity}
+
+@router.post("/generate-orders")
+async def generate_orders(count: int = 1000, days: int = 30, trend: float = 0.0, seasonality: float = 0.3, noise: float = 0.2, seed: Optional[int] = None, db = Depends(database.get_db)):
+    if count > order_simulation.SIM_MAX_ORDERS:
+        raise HTTPException(status_code=400, detail=f"count is limited to {order_simulation.SIM_MAX_ORDERS}; use the order_simulation CLI for larger datasets")
+    try:
+        return await run_in_threadpool(order_simulation.simulate_orders, db, count, days, trend, seasonality, noise, seed)
+    except order_simulation.InvalidSimulation as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,59 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
 from .. import schemas, database
 from ..core import security
+from ..services import ids, dashboard_stats, pagination
 
 router = APIRouter(
     prefix="/suppliers",
     tags=["suppliers"],
 )
 
+SUPPLIER_FIELDS = pagination.model_fields(schemas.Supplier)
+
 @router.post("/", response_model=schemas.Supplier)
-def create_supplier(supplier: schemas.SupplierCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    db_supplier = db.suppliers.find_one({"name": supplier.name})
+async def create_supplier(supplier: schemas.SupplierCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    db_supplier = await db.suppliers.find_one({"name": supplier.name})
     if db_supplier:
         raise HTTPException(status_code=400, detail="Supplier already registered")
     
-    last_supplier = list(db.suppliers.find().sort("id", -1).limit(1))
-    new_id = 1
-    if last_supplier:
-        new_id = last_supplier[0]["id"] + 1
+    new_id = await ids.next_id_async(db, "suppliers")
 
     new_supplier_data = supplier.dict()
     new_supplier_data["id"] = new_id
     
-    db.suppliers.insert_one(new_supplier_data)
+    await db.suppliers.insert_one(new_supplier_data)
+    await dashboard_stats.record_supplier_created(db)
     
     return schemas.Supplier(**new_supplier_data)
 
 @router.get("/", response_model=List[schemas.Supplier])
-def read_suppliers(skip: int = 0, limit: int = 100, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    suppliers = list(db.suppliers.find().skip(skip).limit(limit))
+async def read_suppliers(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    try:
+        projection = pagination.parse_fields(fields, SUPPLIER_FIELDS)
+        suppliers, next_cursor = await pagination.fetch_page(db.suppliers, {}, limit, cursor, skip, projection)
+    except pagination.InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if projection is not None:
+        return pagination.partial_response(suppliers, next_cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return suppliers
 
 @router.get("/{supplier_id}", response_model=schemas.Supplier)
-def read_supplier(supplier_id: int, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    supplier = db.suppliers.find_one({"id": supplier_id})
+async def read_supplier(supplier_id: int, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    supplier = await db.suppliers.find_one({"id": supplier_id})
     if supplier is None:
         raise HTTPException(status_code=404, detail="Supplier not found")
     return supplier
 
 @router.put("/{supplier_id}", response_model=schemas.Supplier)
-def update_supplier(supplier_id: int, supplier: schemas.SupplierCreate, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    db_supplier = db.suppliers.find_one({"id": supplier_id})
+async def update_supplier(supplier_id: int, supplier: schemas.SupplierCreate, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    db_supplier = await db.suppliers.find_one({"id": supplier_id})
     if db_supplier is None:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
     update_data = supplier.dict(exclude_unset=True)
-    db.suppliers.update_one({"id": supplier_id}, {"$set": update_data})
+    await db.suppliers.update_one({"id": supplier_id}, {"$set": update_data})
+    await dashboard_stats.record_supplier_updated(db)
     
-    updated_supplier = db.suppliers.find_one({"id": supplier_id})
+    updated_supplier = await db.suppliers.find_one({"id": supplier_id})
     return updated_supplier
 
 @router.delete("/{supplier_id}")
-def delete_supplier(supplier_id: int, db = Depends(database.get_db), current_user: schemas.User = Depends(security.get_current_user)):
-    result = db.suppliers.delete_one({"id": supplier_id})
+async def delete_supplier(supplier_id: int, db = Depends(database.get_async_db), current_user: schemas.User = Depends(security.get_current_user)):
+    result = await db.suppliers.delete_one({"id": supplier_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Supplier not found")
+    await dashboard_stats.record_supplier_deleted(db)
     
     return {"message": "Supplier deleted successfully"}
@@ -9,6 +9,7 @@ class SupplierBase(BaseModel):
     email: Optional[str] = None
     address: Optional[str] = None
     reliability_score: Optional[float] = 1.0
+    lead_time_days: Optional[float] = None
 
 class SupplierCreate(SupplierBase):
     pass
@@ -26,6 +27,14 @@ class ProductBase(BaseModel):
     stock_level: int
     reorder_point: int
     supplier_id: int
+    # Optional overrides of the category/default EOQ parameters.
+    annual_demand: Optional[float] = None
+    ordering_cost: Optional[float] = None
+    holding_cost_rate: Optional[float] = None
+    lead_time_days: Optional[float] = None
+    demand_cv: Optional[float] = None
+    # Smallest quantity the replenishment planner orders at once.
+    min_order_quantity: Optional[int] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -37,6 +46,39 @@ class Product(ProductBase):
     class Config:
         orm_mode = True
 
+class StockMovementCreate(BaseModel):
+    type: str
+    # Receipts and sales take a positive quantity; adjustments are signed.
+    quantity: int
+    reason: Optional[str] = None
+
+class StockMovement(BaseModel):
+    type: str
+    quantity: int
+    at: datetime
+    stock_level: int
+    order_id: Optional[int] = None
+    reason: Optional[str] = None
+
+class StockHistory(BaseModel):
+    product_id: int
+    start: datetime
+    end: datetime
+    opening_stock: int
+    closing_stock: int
+    movements: List[StockMovement]
+    truncated: bool
+
+class CategoryCostsBase(BaseModel):
+    annual_demand: Optional[float] = None
+    ordering_cost: Optional[float] = None
+    holding_cost_rate: Optional[float] = None
+    lead_time_days: Optional[float] = None
+    demand_cv: Optional[float] = None
+
+class CategoryCosts(CategoryCostsBase):
+    category: str
+
 class OrderBase(BaseModel):
     product_id: int
     supplier_id: int
@@ -46,9 +88,20 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     pass
 
+class OrderStatusUpdate(BaseModel):
+    status: str
+
+class OrderStatusChange(BaseModel):
+    status: str
+    at: datetime
+
 class Order(OrderBase):
     id: int
     order_date: datetime
+    product_name: Optional[str] = None
+    unit_price: Optional[float] = None
+    supplier_name: Optional[str] = None
+    status_history: Optional[List[OrderStatusChange]] = None
 
     class Config:
         orm_mode = True
@@ -57,6 +110,20 @@ class OrderWithDetails(Order):
     product: Optional[Product] = None
     supplier: Optional[Supplier] = None
 
+class ReportJobCreate(BaseModel):
+    dataset: str
+    format: str
+    compress: bool = False
+
+class ReportJob(ReportJobCreate):
+    id: str
+    status: str
+    cached: bool
+    progress: dict
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 class UserBase(BaseModel):
     username: str
     email: Optional[str] = None
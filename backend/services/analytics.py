@@ -1,8 +1,15 @@
+import asyncio
+import logging
+import os
+import uuid
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from . import change_log, dashboard_stats, forecast_cache, ids, order_details
+
+logger = logging.getLogger(__name__)
 
 def calculate_eoq(demand: float, ordering_cost: float, holding_cost: float) -> float:
     """
@@ -13,178 +20,736 @@ def calculate_eoq(demand: float, ordering_cost: float, holding_cost: float) -> f
         return 0.0
     return np.sqrt((2 * demand * ordering_cost) / holding_cost)
 
-def get_demand_forecast(db, product_id: int, periods: int = 3):
+# Forecasting models. Each takes a (products x days) matrix of daily demand,
+# right-aligned so the last column is each product's last order day, the
+# column where each product's history starts, and a horizon, and returns a
+# (products x horizon) matrix of predictions. Every model works on all rows
+# at once.
+SEASON_LENGTH = 7
+BACKTEST_DAYS = 7
+
+def _active(history, start):
+    return np.arange(history.shape[1]) >= start[:, None]
+
+def linear_trend(history, start, horizon):
     """
-    Simple linear regression forecast based on order history.
+    Least-squares trend line through each product's history.
     """
-    orders = list(db.orders.find({"product_id": product_id}).sort("order_date", 1))
-    
-    if len(orders) < 2:
-        return {"error": "Not enough data for forecasting"}
+    T = history.shape[1]
+    x = np.arange(T, dtype=float)
+    w = _active(history, start)
+    n = np.maximum(w.sum(axis=1), 1)
+    mean_x = (w * x).sum(axis=1) / n
+    mean_y = (w * history).sum(axis=1) / n
+    dx = np.where(w, x - mean_x[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * (history - mean_y[:, None])).sum(axis=1)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    future = np.arange(T, T + horizon, dtype=float)
+    return mean_y[:, None] + slope[:, None] * (future - mean_x[:, None])
 
-    df = pd.DataFrame([(o["order_date"], o["quantity"]) for o in orders], columns=['date', 'quantity'])
-    df['date_ordinal'] = pd.to_datetime(df['date']).map(pd.Timestamp.toordinal)
+def moving_average(history, start, horizon, window: int = SEASON_LENGTH):
+    """
+    Flat forecast at the mean of the last `window` days.
+    """
+    T = history.shape[1]
+    w = np.arange(T) >= np.maximum(start, T - window)[:, None]
+    mean = (w * history).sum(axis=1) / np.maximum(w.sum(axis=1), 1)
+    return np.repeat(mean[:, None], horizon, axis=1)
 
-    X = df[['date_ordinal']]
-    y = df['quantity']
+def seasonal_naive(history, start, horizon, season: int = SEASON_LENGTH):
+    """
+    Repeat the last observed week.
+    """
+    last_season = history[:, -season:]
+    return np.tile(last_season, -(-horizon // season))[:, :horizon]
 
-    model = LinearRegression()
-    model.fit(X, y)
+def holt_winters(history, start, horizon, season: int = SEASON_LENGTH, alpha: float = 0.3, beta: float = 0.05, gamma: float = 0.1):
+    """
+    Additive Holt-Winters (level, trend and weekly seasonality) with fixed
+    smoothing parameters, run for every product in lock-step.
+    """
+    P, T = history.shape
+    level = np.zeros(P)
+    trend = np.zeros(P)
+    seasonal = np.zeros((P, season))
+    started = np.zeros(P, dtype=bool)
 
-    last_date = df['date'].max()
-    future_dates = [last_date + pd.Timedelta(days=i) for i in range(1, periods + 1)]
-    future_ordinals = np.array([d.toordinal() for d in future_dates]).reshape(-1, 1)
-    
-    predictions = model.predict(future_ordinals)
-    
-    return {
-        "dates": [d.strftime("%Y-%m-%d") for d in future_dates],
-        "forecast": predictions.tolist()
+    for t in range(T):
+        y = history[:, t]
+        s = seasonal[:, t % season]
+        active = t >= start
+        first = active & ~started
+        update = active & started
+
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonal[:, t % season] = np.where(update, gamma * (y - new_level) + (1 - gamma) * s, s)
+        trend = np.where(update, new_trend, trend)
+        level = np.where(first, y, np.where(update, new_level, level))
+        started |= active
+
+    steps = np.arange(1, horizon + 1)
+    return level[:, None] + trend[:, None] * steps + seasonal[:, (T + steps - 1) % season]
+
+FORECAST_MODELS = {
+    "linear": linear_trend,
+    "holt_winters": holt_winters,
+    "seasonal_naive": seasonal_naive,
+    "moving_average": moving_average,
+}
+DEFAULT_FORECAST_MODEL = "linear"
+
+def backtest(history, start, model: str, holdout: int = BACKTEST_DAYS):
+    """
+    Fit on all but the last `holdout` days and score the prediction of
+    those days. Returns per-product (rmse, mape); NaN where the history is
+    too short to hold anything out or, for MAPE, where nothing was sold.
+    """
+    train, actual = history[:, :-holdout], history[:, -holdout:]
+    error = FORECAST_MODELS[model](train, start, holdout) - actual
+    rmse = np.sqrt((error ** 2).mean(axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(actual > 0, np.abs(error) / actual, np.nan)
+        sold = (actual > 0).any(axis=1)
+        mape = np.full(len(history), np.nan)
+        mape[sold] = np.nanmean(ape[sold], axis=1) * 100
+    too_short = start > history.shape[1] - holdout - 2
+    rmse[too_short] = np.nan
+    mape[too_short] = np.nan
+    return rmse, mape
+
+def fit_forecasts(history, start, horizon: int, model: str = "auto"):
+    """
+    Forecast every row with `model`, or with "auto" pick each product's
+    model by lowest backtest RMSE (falling back to the default model when
+    the history is too short to backtest). Forecasts are clipped at zero.
+    Returns (predictions, model names, rmse, mape).
+    """
+    names = list(FORECAST_MODELS) if model == "auto" else [model]
+    scores = [backtest(history, start, name) for name in names]
+    rmse = np.stack([r for r, _ in scores])
+    mape = np.stack([m for _, m in scores])
+
+    if len(names) == 1:
+        best = np.zeros(len(history), dtype=int)
+    else:
+        best = np.where(
+            np.isnan(rmse).all(axis=0),
+            names.index(DEFAULT_FORECAST_MODEL),
+            np.argmin(np.where(np.isnan(rmse), np.inf, rmse), axis=0),
+        )
+
+    rows = np.arange(len(history))
+    predictions = np.empty((len(history), horizon))
+    for i, name in enumerate(names):
+        chosen = best == i
+        if chosen.any():
+            predictions[chosen] = FORECAST_MODELS[name](history[chosen], start[chosen], horizon)
+    return np.maximum(predictions, 0), np.array(names)[best], rmse[best, rows], mape[best, rows]
+
+# ABC classes by cumulative share of value: A up to 80%, B up to 95%, C the
+# rest. Classes are kept per basis in ABC_COLLECTION, both across the whole
+# catalog and within each product category.
+ABC_CLASSES = ["A", "B", "C"]
+ABC_THRESHOLDS = np.array([0.80, 0.95])
+ABC_COLLECTION = "abc_classes"
+ABC_BASES = {
+    "stock": ("products",),
+    "revenue": ("orders", "products"),
+}
+ABC_WRITE_BATCH = 1000
+# The background task reclassifies every ABC_REFRESH_INTERVAL seconds when
+# the data changed. Reads serve the stored classes and only reclassify
+# inline when they are older than ABC_MAX_STALENESS (e.g. the task is not
+# running) or were never computed.
+ABC_REFRESH_INTERVAL = int(os.getenv("ABC_REFRESH_INTERVAL", "300"))
+ABC_MAX_STALENESS = int(os.getenv("ABC_MAX_STALENESS", "3600"))
+
+def abc_values(db, basis: str):
+    """
+    Value of every product as parallel arrays: stock value (price *
+    stock level) or revenue sold, summed from orders in one aggregation.
+    """
+    docs = list(db.products.find({}, {"_id": 0, "id": 1, "name": 1, "category": 1, "price": 1, "stock_level": 1}))
+    columns = {
+        "product_id": np.fromiter((p["id"] for p in docs), dtype=np.int64, count=len(docs)),
+        "name": np.array([p.get("name") for p in docs], dtype=object),
+        "product_category": np.array([p.get("category") for p in docs], dtype=object),
     }
+    if basis == "stock":
+        price = np.fromiter((_number(p.get("price"), 0.0) for p in docs), dtype=float, count=len(docs))
+        stock = np.fromiter((_number(p.get("stock_level"), 0.0) for p in docs), dtype=float, count=len(docs))
+        columns["value"] = price * stock
+        return columns
 
-def abc_analysis(db):
-    """
-    Perform ABC Analysis based on revenue (Price * Stock/Sold).
-    A: Top 20% items (80% value)
-    B: Next 30% items (15% value)
-    C: Last 50% items (5% value)
-    """
-    products = list(db.products.find())
-    data = []
-    
-    for p in products:
-        value = p["price"] * p["stock_level"]
-        data.append({"product_id": p["id"], "name": p["name"], "value": value})
-    
-    if not data:
-         return []
-
-    df = pd.DataFrame(data)
-    df = df.sort_values(by='value', ascending=False)
-    
-    df['cumulative_value'] = df['value'].cumsum()
-    df['total_value'] = df['value'].sum()
-    df['percentage'] = df['cumulative_value'] / df['total_value']
-    
-    def classify(pct):
-        if pct <= 0.80: return 'A'
-        elif pct <= 0.95: return 'B'
-        else: return 'C'
-        
-    df['category'] = df['percentage'].apply(classify)
-    
-    return df[['product_id', 'name', 'value', 'category']].to_dict(orient='records')
-
-def classify_suppliers(db):
-    """
-    Classify suppliers using K-Nearest Neighbors (KNN).
-    Features (Simulated): Delivery Time (days), Defect Rate (%)
-    Target: Reliability Tier (High, Medium, Low)
-    """
-    suppliers = list(db.suppliers.find())
-    if not suppliers:
-        return []
-
-    data = [] 
-    for s in suppliers:
-        score = s.get("reliability_score", 3.0) 
-        
-        delivery_time = 10 - (score * 1.5) + np.random.normal(0, 0.5) 
-        defect_rate = 5 - (score * 0.8) + np.random.normal(0, 0.2)   
-        
-        delivery_time = max(1, delivery_time)
-        defect_rate = max(0, defect_rate)
-
-        data.append({
-            "id": s["id"],
-            "name": s["name"],
-            "reliability_score": score,
-            "delivery_time": round(delivery_time, 1),
-            "defect_rate": round(defect_rate, 2)
-        })
-
-    df = pd.DataFrame(data)
-
-    X = df[['delivery_time', 'defect_rate']]
-    
-    conditions = [
-        (df['reliability_score'] >= 4.0),
-        (df['reliability_score'] >= 2.5) & (df['reliability_score'] < 4.0),
-        (df['reliability_score'] < 2.5)
+    pipeline = [
+        {"$match": {"product_id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$product_id",
+            "revenue": {"$sum": {"$multiply": ["$quantity", {"$ifNull": ["$unit_price", "$product.price", 0]}]}},
+        }},
     ]
-    choices = ['High Performance', 'Average', 'Risk']
-    df['tier'] = np.select(conditions, choices, default='Average')
+    sold = list(db.orders.aggregate(pipeline, allowDiskUse=True))
+    sold_ids = np.fromiter((g["_id"] for g in sold), dtype=np.int64, count=len(sold))
+    revenue = np.fromiter((g["revenue"] for g in sold), dtype=float, count=len(sold))
+    order = np.argsort(sold_ids)
+    sold_ids, revenue = sold_ids[order], revenue[order]
 
-    y = df['tier']
+    columns["value"] = np.zeros(len(docs))
+    if len(sold_ids):
+        position = np.searchsorted(sold_ids, columns["product_id"]).clip(max=len(sold_ids) - 1)
+        found = sold_ids[position] == columns["product_id"]
+        columns["value"][found] = revenue[position[found]]
+    return columns
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    k = min(3, len(df))
-    knn = KNeighborsClassifier(n_neighbors=k)
-    knn.fit(X_scaled, y)
+def abc_classify(value, group=None):
+    """
+    ABC class index (0=A, 1=B, 2=C) of every value, ranked within its group
+    (one group when `group` is None).
+    """
+    if group is None:
+        group = np.zeros(len(value), dtype=np.int64)
+    order = np.lexsort((-value, group))
+    v, g = value[order], group[order]
+    totals = np.bincount(g, weights=v)
+    offsets = np.concatenate(([0.0], np.cumsum(totals)[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = (np.cumsum(v) - offsets[g]) / totals[g]
+    classes = np.empty(len(value), dtype=np.int64)
+    classes[order] = np.searchsorted(ABC_THRESHOLDS, share, side='left')
+    return classes
 
-    predictions = knn.predict(X_scaled)
-    df['predicted_tier'] = predictions
+def refresh_abc(db, basis: str = "stock", force: bool = False, max_age: int = None) -> dict:
+    """
+    Recompute the classification when the source collections changed since
+    the last run (and, with `max_age`, the last run is older than that many
+    seconds), and write only the products whose value or classes changed.
+    Returns the run state.
+    """
+    state_id = f"abc_{basis}"
+    state = db[dashboard_stats.STATS_COLLECTION].find_one({"_id": state_id})
+    if state is not None and not force and max_age is not None:
+        if datetime.utcnow() - state["refreshed_at"] <= timedelta(seconds=max_age):
+            return state
+    version = dashboard_stats.collection_version(db, ABC_BASES[basis])
+    if state is not None and state.get("version") == version and not force:
+        return state
 
-    return df.to_dict(orient='records')
+    columns = abc_values(db, basis)
+    value = columns["value"]
+    overall = abc_classify(value)
+    within_category = abc_classify(value, pd.factorize(columns["product_category"], use_na_sentinel=False)[0])
 
-def get_eoq_data(db):
+    stored = {
+        d["product_id"]: (d.get("value"), d.get("class"), d.get("category_class"), d.get("name"), d.get("product_category"))
+        for d in db[ABC_COLLECTION].find({"basis": basis}, {"_id": 0, "product_id": 1, "value": 1, "class": 1, "category_class": 1, "name": 1, "product_category": 1})
+    }
+    requests = []
+    for i in range(len(value)):
+        doc = (float(value[i]), ABC_CLASSES[overall[i]], ABC_CLASSES[within_category[i]], columns["name"][i], columns["product_category"][i])
+        product_id = int(columns["product_id"][i])
+        if stored.pop(product_id, None) != doc:
+            requests.append(UpdateOne(
+                {"basis": basis, "product_id": product_id},
+                {"$set": dict(zip(("value", "class", "category_class", "name", "product_category"), doc))},
+                upsert=True,
+            ))
+    for start in range(0, len(requests), ABC_WRITE_BATCH):
+        db[ABC_COLLECTION].bulk_write(requests[start:start + ABC_WRITE_BATCH], ordered=False)
+    if stored:
+        db[ABC_COLLECTION].delete_many({"basis": basis, "product_id": {"$in": list(stored)}})
+
+    counts = np.bincount(overall, minlength=3)
+    state = {
+        "_id": state_id,
+        "version": version,
+        "refreshed_at": datetime.utcnow(),
+        "products": len(value),
+        "changed": len(requests),
+        "removed": len(stored),
+        "classes": {c: int(n) for c, n in zip(ABC_CLASSES, counts)},
+    }
+    db[dashboard_stats.STATS_COLLECTION].replace_one({"_id": state_id}, state, upsert=True)
+    return state
+
+async def refresh_abc_periodically(db, interval: int = ABC_REFRESH_INTERVAL):
+    """
+    Background task: refresh every basis immediately, then every
+    `interval` seconds.
+    """
+    while True:
+        for basis in ABC_BASES:
+            try:
+                await asyncio.to_thread(refresh_abc, db, basis)
+            except Exception:
+                logger.exception("ABC refresh (%s) failed", basis)
+        await asyncio.sleep(interval)
+
+def abc_analysis(db, basis: str = "stock", category: str = None, skip: int = 0, limit: int = None):
+    """
+    Perform ABC Analysis based on stock value (price * stock level) or sold
+    revenue, from the stored classification; it is refreshed first only
+    when older than ABC_MAX_STALENESS.
+    With `category`, products of that category ranked by their class within
+    it. Returns (one page by descending value, total).
+    """
+    refresh_abc(db, basis, max_age=ABC_MAX_STALENESS)
+    query = {"basis": basis}
+    if category is not None:
+        query["product_category"] = category
+    class_field = "category_class" if category is not None else "class"
+    cursor = db[ABC_COLLECTION].find(query, {"_id": 0}).sort([("value", -1), ("product_id", 1)]).skip(skip)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    # `category` is the ABC class, as in the original response.
+    results = [
+        {
+            "product_id": d["product_id"],
+            "name": d["name"],
+            "value": d["value"],
+            "category": d[class_field],
+            "product_category": d["product_category"],
+            "category_class": d["category_class"],
+        }
+        for d in cursor
+    ]
+    return results, db[ABC_COLLECTION].count_documents(query)
+
+# EOQ and reorder point defaults. Products can override any of these with
+# a field of the same name, and categories through the category_costs
+# collection; the first value present wins.
+ORDERING_COST = 50.0
+HOLDING_COST_RATE = 0.2
+DEFAULT_ANNUAL_DEMAND = 1000.0
+DEFAULT_LEAD_TIME_DAYS = 7.0
+DEMAND_CV = 0.3
+SERVICE_LEVEL_Z = 1.65
+
+CATEGORY_COSTS_COLLECTION = "category_costs"
+COST_DEFAULTS = {
+    "annual_demand": DEFAULT_ANNUAL_DEMAND,
+    "ordering_cost": ORDERING_COST,
+    "holding_cost_rate": HOLDING_COST_RATE,
+    "lead_time_days": DEFAULT_LEAD_TIME_DAYS,
+    "demand_cv": DEMAND_CV,
+}
+EOQ_STATUSES = ["Understocked", "Overstocked", "Good"]
+EOQ_PROJECTION = {"_id": 0, "id": 1, "name": 1, "category": 1, "price": 1, "stock_level": 1, **{f: 1 for f in COST_DEFAULTS}}
+
+def _number(value, default=np.nan):
+    return float(value) if isinstance(value, (int, float)) else default
+
+def load_eoq_inputs(db, query: dict = None, fields: tuple = ()):
+    """
+    Load only the fields EOQ needs, plus any numeric `fields`, into NumPy
+    arrays. Missing cost and extra fields are NaN.
+    """
+    docs = list(db.products.find(query or {}, {**EOQ_PROJECTION, **{f: 1 for f in fields}}))
+    columns = {
+        "id": np.fromiter((p["id"] for p in docs), dtype=np.int64, count=len(docs)),
+        "name": np.array([p.get("name") for p in docs], dtype=object),
+        "category": np.array([p.get("category") for p in docs], dtype=object),
+        "price": np.fromiter((_number(p.get("price"), 0.0) for p in docs), dtype=float, count=len(docs)),
+        "stock_level": np.fromiter((_number(p.get("stock_level"), 0.0) for p in docs), dtype=float, count=len(docs)),
+    }
+    for field in (*COST_DEFAULTS, *fields):
+        columns[field] = np.fromiter((_number(p.get(field)) for p in docs), dtype=float, count=len(docs))
+    return columns
+
+def resolve_costs(columns: dict, category_costs: dict):
+    """
+    Fill each product's missing cost parameters from its category, then
+    from the defaults.
+    """
+    index, categories = pd.factorize(columns["category"], use_na_sentinel=False)
+    for field, default in COST_DEFAULTS.items():
+        per_category = np.array([category_costs.get(c, {}).get(field, np.nan) for c in categories], dtype=float)
+        per_category = np.where(np.isnan(per_category), default, per_category)
+        values = columns[field]
+        columns[field] = np.where(np.isnan(values), per_category[index], values)
+    return columns
+
+def compute_eoq(price, stock_level, annual_demand, ordering_cost, holding_cost_rate, lead_time_days, demand_cv, z: float = SERVICE_LEVEL_Z):
+    """
+    EOQ, safety stock, reorder point and stock status for every product at
+    once. Safety stock covers demand variability over the lead time:
+    z * (demand_cv * daily demand) * sqrt(lead time).
+    """
+    holding_cost = price * holding_cost_rate
+    eoq = np.sqrt(np.divide(2 * annual_demand * ordering_cost, holding_cost, out=np.zeros_like(price), where=holding_cost > 0))
+    daily_demand = annual_demand / 365
+    safety_stock = z * demand_cv * daily_demand * np.sqrt(lead_time_days)
+    reorder_point = daily_demand * lead_time_days + safety_stock
+    status = np.select([stock_level < eoq * 0.5, stock_level > eoq * 2], [0, 1], default=2)
+    return {
+        "eoq": np.round(eoq),
+        "safety_stock": np.round(safety_stock, 1),
+        "reorder_point": np.ceil(reorder_point),
+        "status": status,
+    }
+
+def get_eoq_data(db, category: str = None, status: str = None, skip: int = 0, limit: int = None):
     """
     Calculate EOQ for all products to identify optimal order quantities.
-    Returns products with current stock, EOQ, and status.
-    """
-    products = list(db.products.find())
-    results = []
-
-    for p in products:
-        annual_demand = p.get("annual_demand", 1000) 
-        ordering_cost = 50.0 
-        holding_cost = p["price"] * 0.2 
-
-        eoq = calculate_eoq(annual_demand, ordering_cost, holding_cost)
-        
-        status = "Good"
-        if p["stock_level"] < eoq * 0.5:
-             status = "Understocked"
-        elif p["stock_level"] > eoq * 2:
-             status = "Overstocked"
-
-        results.append({
-            "id": p["id"],
-            "name": p["name"],
-            "current_stock": p["stock_level"],
-            "eoq": round(eoq, 0),
-            "status": status
-        })
-    
-    results.sort(key=lambda x: 0 if x["status"] == "Understocked" else (1 if x["status"] == "Overstocked" else 2))
-    
-    return results
-
-def analyze_file(file_content, filename: str):
-    """
-    Analyze uploaded message file (CSV/Excel).
-    Returns summary statistics and head preview.
+    Returns (one page of products with current stock, EOQ, reorder point
+    and status, understocked first; total number of matching products).
     """
-    try:
-        if filename.endswith('.csv'):
-            df = pd.read_csv(file_content)
-        elif filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file_content)
-        else:
-            return {"error": "Unsupported file format"}
-            
-        summary = df.describe().to_dict()
-        head = df.head(5).where(pd.notnull(df), None).to_dict(orient='records')
-        columns = df.columns.tolist()
-        row_count = len(df)
-        
-        return {
-            "summary": summary,
-            "head": head,
-            "columns": columns,
-            "row_count": row_count
+    columns = load_eoq_inputs(db, {"category": category} if category is not None else None)
+    category_costs = {c.pop("category"): c for c in db[CATEGORY_COSTS_COLLECTION].find({}, {"_id": 0})}
+    columns = resolve_costs(columns, category_costs)
+    result = compute_eoq(*(columns[f] for f in ("price", "stock_level", *COST_DEFAULTS)))
+
+    selected = np.arange(len(columns["id"]))
+    if status is not None:
+        selected = np.flatnonzero(result["status"] == EOQ_STATUSES.index(status))
+    selected = selected[np.argsort(result["status"][selected], kind="stable")]
+    total = len(selected)
+    page = selected[skip:skip + limit if limit is not None else None]
+
+    return [
+        {
+            "id": int(columns["id"][i]),
+            "name": columns["name"][i],
+            "category": columns["category"][i],
+            "current_stock": int(columns["stock_level"][i]),
+            "eoq": float(result["eoq"][i]),
+            "safety_stock": float(result["safety_stock"][i]),
+            "reorder_point": int(result["reorder_point"][i]),
+            "needs_reorder": bool(columns["stock_level"][i] <= result["reorder_point"][i]),
+            "status": EOQ_STATUSES[result["status"][i]],
         }
-    except Exception as e:
-        return {"error": str(e)}
+        for i in page
+    ], total
+
+# Replenishment planning: an order-up-to policy run over the whole catalog
+# at once. A product is reordered when its inventory position (stock plus
+# open orders) is at or below its reorder level, the larger of its own
+# reorder_point and lead-time demand plus safety stock. It is then ordered
+# up to the reorder level plus one EOQ (at least the demand over a review
+# period), and never less than its minimum order quantity. Safety stock
+# also covers lead-time variability, which grows as the supplier's on-time
+# rate falls.
+REVIEW_PERIOD_DAYS = 7
+# Lead-time coefficient of variation of a supplier that is never on time.
+MAX_LEAD_TIME_CV = 0.5
+DEFAULT_RELIABILITY = 0.75
+# Orders are booked into stock when they are placed or moved past Pending
+# (supplier_metrics.STOCKED_STATUSES), so only Pending orders are still to
+# arrive.
+ON_ORDER_STATUSES = ["Pending"]
+PLAN_FIELDS = ("reorder_point", "supplier_id", "min_order_quantity")
+REPLENISHMENT_BATCH = 1000
+# Placing orders holds a lease kept next to the dashboard summary, so two
+# concurrent runs cannot both order what neither sees on order yet. The
+# lease is renewed before each batch, so it only has to outlast one batch;
+# a run that crashed stops blocking others once its lease expires.
+REPLENISHMENT_LOCK_ID = "replenishment_orders"
+REPLENISHMENT_LEASE = int(os.getenv("REPLENISHMENT_LEASE", "300"))
+
+
+class ReplenishmentInProgress(ValueError):
+    pass
+
+
+def _align(keys, values, lookup, fill=np.nan):
+    """
+    The value of each of `lookup` in the sorted `keys`, `fill` where absent.
+    """
+    out = np.full(len(lookup), fill, dtype=float)
+    if len(keys):
+        position = np.searchsorted(keys, lookup).clip(max=len(keys) - 1)
+        found = keys[position] == lookup
+        out[found] = values[position[found]]
+    return out
+
+def _sorted_pairs(keys, values):
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    order = np.argsort(keys)
+    return keys[order], values[order]
+
+def load_suppliers(db):
+    """
+    Every supplier's lead time and reliability as arrays sorted by id: the
+    observed lead time and on-time rate over the supplier metrics window
+    where orders were received, else the promised lead time and the 1-5
+    reliability score scaled to 0-1 (NaN lead time where neither is known).
+    """
+    # supplier_metrics imports this module.
+    from . import supplier_metrics
+
+    docs = sorted(db.suppliers.find({}, {"_id": 0, "id": 1, "name": 1, "reliability_score": 1, "lead_time_days": 1}), key=lambda s: s["id"])
+    metrics = supplier_metrics.rolling_metrics(db)
+    received = np.fromiter((metrics.get(s["id"], {}).get("received", 0) for s in docs), dtype=float, count=len(docs))
+    on_time = np.fromiter((metrics.get(s["id"], {}).get("on_time", 0) for s in docs), dtype=float, count=len(docs))
+    lead_time_sum = np.fromiter((metrics.get(s["id"], {}).get("lead_time_sum", 0) for s in docs), dtype=float, count=len(docs))
+    promised = np.fromiter((_number(s.get("lead_time_days")) for s in docs), dtype=float, count=len(docs))
+    score = np.fromiter((_number(s.get("reliability_score")) for s in docs), dtype=float, count=len(docs))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed_lead_time = np.where(received > 0, lead_time_sum / received, np.nan)
+        on_time_rate = np.where(received > 0, on_time / received, np.nan)
+    scored = np.clip((score - 1) / 4, 0, 1)
+    return {
+        "id": np.fromiter((s["id"] for s in docs), dtype=np.int64, count=len(docs)),
+        "name": np.array([s.get("name") for s in docs], dtype=object),
+        "lead_time_days": np.where(np.isnan(observed_lead_time), promised, observed_lead_time),
+        "reliability": np.where(np.isnan(on_time_rate), np.where(np.isnan(scored), DEFAULT_RELIABILITY, scored), on_time_rate),
+    }
+
+def load_replenishment_inputs(db, query: dict = None):
+    """
+    Catalog columns for the planner: the EOQ inputs with costs resolved,
+    daily demand (the mean of the stored forecast, else annual_demand / 365),
+    quantity on order, and each product's supplier (index into the supplier
+    table, -1 when unknown), lead time and supplier reliability. Returns
+    (columns, suppliers).
+    """
+    # forecasting imports this module.
+    from . import forecasting
+
+    columns = load_eoq_inputs(db, query, PLAN_FIELDS)
+    own_lead_time = columns["lead_time_days"].copy()
+    category_costs = {c.pop("category"): c for c in db[CATEGORY_COSTS_COLLECTION].find({}, {"_id": 0})}
+    columns = resolve_costs(columns, category_costs)
+    product_ids = columns["id"]
+
+    forecast_query = {"product_id": {"$in": product_ids.tolist()}} if query else {}
+    forecasts = [f for f in db[forecasting.FORECASTS_COLLECTION].find(forecast_query, {"_id": 0, "product_id": 1, "forecast": 1}) if f.get("forecast")]
+    forecast_demand = _align(*_sorted_pairs(
+        [f["product_id"] for f in forecasts], [sum(f["forecast"]) / len(f["forecast"]) for f in forecasts],
+    ), product_ids)
+    columns["forecast"] = ~np.isnan(forecast_demand)
+    columns["daily_demand"] = np.where(columns["forecast"], forecast_demand, columns["annual_demand"] / 365)
+
+    pipeline = [
+        {"$match": {"status": {"$in": ON_ORDER_STATUSES}}},
+        {"$group": {"_id": "$product_id", "quantity": {"$sum": "$quantity"}}},
+    ]
+    open_orders = [g for g in db.orders.aggregate(pipeline, allowDiskUse=True) if isinstance(g["_id"], int)]
+    columns["on_order"] = _align(*_sorted_pairs([g["_id"] for g in open_orders], [g["quantity"] for g in open_orders]), product_ids, 0.0)
+
+    suppliers = load_suppliers(db)
+    supplier_id = np.nan_to_num(columns["supplier_id"], nan=-1).astype(np.int64)
+    supplier_index = _align(suppliers["id"], np.arange(len(suppliers["id"]), dtype=float), supplier_id, -1).astype(np.int64)
+    known = supplier_index >= 0
+    supplier_lead_time = np.where(known, suppliers["lead_time_days"][supplier_index], np.nan)
+    columns["supplier_index"] = supplier_index
+    # The product's own lead time, else its supplier's, else the category's
+    # or the default.
+    columns["lead_time_days"] = np.where(
+        ~np.isnan(own_lead_time), own_lead_time,
+        np.where(np.isnan(supplier_lead_time), columns["lead_time_days"], supplier_lead_time),
+    )
+    columns["reliability"] = np.where(known, suppliers["reliability"][supplier_index], DEFAULT_RELIABILITY)
+    columns["reorder_point"] = np.nan_to_num(columns["reorder_point"], nan=0.0)
+    columns["min_order_quantity"] = np.maximum(np.nan_to_num(columns["min_order_quantity"], nan=1.0), 1)
+    return columns, suppliers
+
+def compute_replenishment(price, stock_level, on_order, reorder_point, daily_demand, lead_time_days, reliability, demand_cv,
+                          ordering_cost, holding_cost_rate, min_order_quantity, z: float = SERVICE_LEVEL_Z, review_period: float = REVIEW_PERIOD_DAYS):
+    """
+    Reorder level, order-up-to level and suggested order quantity (0 when
+    no order is due) for every product at once. Safety stock is
+    z * sqrt(LT * (demand_cv * d)^2 + (d * sd(LT))^2), with sd(LT) from the
+    supplier's reliability.
+    """
+    position = stock_level + on_order
+    lead_time_sd = MAX_LEAD_TIME_CV * (1 - reliability) * lead_time_days
+    safety_stock = z * np.sqrt(lead_time_days * (demand_cv * daily_demand) ** 2 + (daily_demand * lead_time_sd) ** 2)
+    reorder_level = np.maximum(reorder_point, np.ceil(daily_demand * lead_time_days + safety_stock))
+    holding_cost = price * holding_cost_rate
+    eoq = np.sqrt(np.divide(2 * daily_demand * 365 * ordering_cost, holding_cost, out=np.zeros_like(price), where=holding_cost > 0))
+    order_up_to = reorder_level + np.ceil(np.maximum(eoq, daily_demand * review_period))
+    quantity = np.where(position <= reorder_level, np.maximum(order_up_to - position, min_order_quantity), 0)
+    return {
+        "position": position,
+        "safety_stock": np.round(safety_stock, 1),
+        "reorder_level": reorder_level,
+        "order_up_to": order_up_to,
+        "quantity": np.ceil(quantity),
+        "days_of_cover": np.divide(position, daily_demand, out=np.full_like(position, np.inf), where=daily_demand > 0),
+    }
+
+def _plan(db, category: str = None, supplier_id: int = None):
+    """
+    Plan the (filtered) catalog. Returns (columns, suppliers, result, lines,
+    groups): `lines` indexes the products to order, by supplier and then
+    most urgent first, and `groups` holds each supplier's first line.
+    """
+    query = {}
+    if category is not None:
+        query["category"] = category
+    if supplier_id is not None:
+        query["supplier_id"] = supplier_id
+    columns, suppliers = load_replenishment_inputs(db, query)
+    result = compute_replenishment(*(columns[f] for f in (
+        "price", "stock_level", "on_order", "reorder_point", "daily_demand", "lead_time_days", "reliability", "demand_cv",
+        "ordering_cost", "holding_cost_rate", "min_order_quantity",
+    )))
+    result["unassigned"] = int(((result["quantity"] > 0) & (columns["supplier_index"] < 0)).sum())
+    lines = np.flatnonzero((result["quantity"] > 0) & (columns["supplier_index"] >= 0))
+    lines = lines[np.lexsort((result["days_of_cover"][lines], columns["supplier_index"][lines]))]
+    supplier_index = columns["supplier_index"][lines]
+    groups = np.flatnonzero(np.r_[True, supplier_index[1:] != supplier_index[:-1]]) if len(lines) else np.zeros(0, dtype=np.int64)
+    return columns, suppliers, result, lines, groups
+
+def _plan_line(columns, result, i) -> dict:
+    days_of_cover = result["days_of_cover"][i]
+    return {
+        "product_id": int(columns["id"][i]),
+        "name": columns["name"][i],
+        "category": columns["category"][i],
+        "stock_level": int(columns["stock_level"][i]),
+        "on_order": int(columns["on_order"][i]),
+        "daily_demand": round(float(columns["daily_demand"][i]), 2),
+        "demand_source": "forecast" if columns["forecast"][i] else "annual_demand",
+        "days_of_cover": round(float(days_of_cover), 1) if np.isfinite(days_of_cover) else None,
+        "lead_time_days": round(float(columns["lead_time_days"][i]), 1),
+        "safety_stock": float(result["safety_stock"][i]),
+        "reorder_level": int(result["reorder_level"][i]),
+        "order_up_to": int(result["order_up_to"][i]),
+        "min_order_quantity": int(columns["min_order_quantity"][i]),
+        "quantity": int(result["quantity"][i]),
+        "unit_price": float(columns["price"][i]),
+        "value": round(float(result["quantity"][i] * columns["price"][i]), 2),
+    }
+
+def replenishment_plan(db, category: str = None, supplier_id: int = None, skip: int = 0, limit: int = None):
+    """
+    Suggested purchase orders for the catalog (or one category / supplier),
+    one group of lines per supplier, the suppliers with the most urgent
+    lines first. Products without a known supplier are only counted.
+    Returns (plan with one page of supplier groups, number of groups).
+    """
+    columns, suppliers, result, lines, groups = _plan(db, category, supplier_id)
+    quantity = result["quantity"][lines]
+    value = quantity * columns["price"][lines]
+    bounds = np.r_[groups, len(lines)]
+    group_quantity = np.add.reduceat(quantity, groups) if len(lines) else np.zeros(0)
+    group_value = np.add.reduceat(value, groups) if len(lines) else np.zeros(0)
+    # Lines are sorted most urgent first within each supplier.
+    urgency = result["days_of_cover"][lines[groups]]
+    supplier_index = columns["supplier_index"][lines[groups]]
+    ranked = np.lexsort((suppliers["id"][supplier_index], urgency))
+    page = ranked[skip:skip + limit if limit is not None else None]
+
+    return {
+        "generated_at": datetime.utcnow(),
+        "products": len(columns["id"]),
+        "lines": len(lines),
+        "suppliers": len(groups),
+        "total_quantity": int(quantity.sum()),
+        "total_value": round(float(value.sum()), 2),
+        "unassigned": result["unassigned"],
+        "orders": [
+            {
+                "supplier_id": int(suppliers["id"][supplier_index[g]]),
+                "supplier_name": suppliers["name"][supplier_index[g]],
+                "reliability": round(float(suppliers["reliability"][supplier_index[g]]), 2),
+                "lines": [_plan_line(columns, result, i) for i in lines[bounds[g]:bounds[g + 1]]],
+                "total_quantity": int(group_quantity[g]),
+                "total_value": round(float(group_value[g]), 2),
+            }
+            for g in page
+        ],
+    }, len(groups)
+
+def create_replenishment_orders(db, category: str = None, supplier_id: int = None) -> dict:
+    """
+    Plan as replenishment_plan does and place every suggested line as a
+    Pending order, in batches, with ids allocated per batch. Placed orders
+    count as on order in the next plan, so running this twice does not
+    order twice; a run started while another is placing orders raises
+    ReplenishmentInProgress.
+    """
+    owner = _lock_replenishment(db)
+    try:
+        return _place_replenishment_orders(db, owner, category, supplier_id)
+    finally:
+        db[dashboard_stats.STATS_COLLECTION].delete_one({"_id": REPLENISHMENT_LOCK_ID, "owner": owner})
+
+
+def _lock_replenishment(db) -> str:
+    owner = uuid.uuid4().hex
+    now = datetime.utcnow()
+    try:
+        # Matches a missing or expired lease; a live one makes the upsert
+        # collide with it on _id.
+        db[dashboard_stats.STATS_COLLECTION].update_one(
+            {"_id": REPLENISHMENT_LOCK_ID, "until": {"$not": {"$gt": now}}},
+            {"$set": {"owner": owner, "until": now + timedelta(seconds=REPLENISHMENT_LEASE)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        raise ReplenishmentInProgress("Replenishment orders are already being placed, retry shortly")
+    return owner
+
+
+def _renew_replenishment(db, owner: str):
+    renewed = db[dashboard_stats.STATS_COLLECTION].update_one(
+        {"_id": REPLENISHMENT_LOCK_ID, "owner": owner},
+        {"$set": {"until": datetime.utcnow() + timedelta(seconds=REPLENISHMENT_LEASE)}},
+    )
+    if not renewed.matched_count:
+        # Expired and taken by another run, which plans from the orders
+        # placed so far; placing more here could order twice.
+        raise ReplenishmentInProgress("The replenishment lease expired and another run took over, retry shortly")
+
+
+def _place_replenishment_orders(db, owner: str, category: str = None, supplier_id: int = None) -> dict:
+    from . import supplier_metrics
+
+    columns, suppliers, result, lines, _ = _plan(db, category, supplier_id)
+    now = datetime.utcnow()
+    supplier_docs = {
+        s["id"]: s for s in db.suppliers.find({"id": {"$in": suppliers["id"][np.unique(columns["supplier_index"][lines])].tolist()}}, order_details.SUPPLIER_PROJECTION)
+    }
+    placed, quantity, value = 0, 0, 0.0
+    id_range = []
+    for start in range(0, len(lines), REPLENISHMENT_BATCH):
+        _renew_replenishment(db, owner)
+        batch = lines[start:start + REPLENISHMENT_BATCH]
+        products = {p["id"]: p for p in db.products.find({"id": {"$in": columns["id"][batch].tolist()}}, order_details.PRODUCT_PROJECTION)}
+        docs = []
+        for i, new_id in zip(batch, ids.next_ids(db, "orders", len(batch))):
+            product = products.get(int(columns["id"][i]))
+            supplier = supplier_docs.get(int(suppliers["id"][columns["supplier_index"][i]]))
+            # Deleted since it was planned.
+            if product is None or supplier is None:
+                continue
+            order = {
+                "id": new_id,
+                "product_id": product["id"],
+                "supplier_id": supplier["id"],
+                "quantity": int(result["quantity"][i]),
+                "status": "Pending",
+                "order_date": now,
+                "status_history": [{"status": "Pending", "at": now}],
+            }
+            docs.append(order_details.apply_storage(order, product, supplier))
+        if not docs:
+            continue
+        batch_value = sum(doc["quantity"] * doc["unit_price"] for doc in docs)
+        db.orders.insert_many(docs, ordered=False)
+        # Counted per batch, so a run stopped by a lost lease still counts
+        # the orders it placed.
+        dashboard_stats.record_orders_bulk(db, batch_value)
+        supplier_metrics.record_orders_bulk(db, docs)
+        forecast_cache.record_orders(db, [doc["product_id"] for doc in docs])
+        change_log.record_orders(db, docs)
+        placed += len(docs)
+        quantity += sum(doc["quantity"] for doc in docs)
+        value += batch_value
+        id_range = [id_range[0] if id_range else docs[0]["id"], docs[-1]["id"]]
+
+    return {
+        "orders": placed,
+        "first_id": id_range[0] if id_range else None,
+        "last_id": id_range[1] if id_range else None,
+        "suppliers": len(supplier_docs),
+        "total_quantity": quantity,
+        "total_value": round(value, 2),
+        "unassigned": result["unassigned"],
+    }
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on idle streams, so proxies do not
+# close them.
+KEEPALIVE_INTERVAL = 15
+RETRY_DELAY = 5
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue of (event, data) pairs. get() returns
+    None once the subscriber has been dropped.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    async def get(self):
+        if self.dropped:
+            return None
+        return await self.queue.get()
+
+
+class Broadcaster:
+    """
+    In-process fan-out from one producer to any number of subscribers.
+    publish() never waits: a subscriber whose queue is full is dropped
+    rather than slowing down the producer or the other subscribers. Must
+    be used from the event loop thread.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def _drop(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        subscription.dropped = True
+        self._dropped += 1
+        # Wake the consumer with the end-of-stream marker in place of the
+        # backlog it could not keep up with.
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def publish(self, event: str, data):
+        self._published += 1
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "queue_size": self.queue_size,
+            "published": self._published,
+            "dropped_subscribers": self._dropped,
+        }
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def stream(broadcaster: Broadcaster, subscription: Subscription, initial=()):
+    """
+    Server-Sent Events body: the `initial` (event, data) pairs, then
+    everything published to `subscription` until the client disconnects or
+    is dropped as too slow.
+    """
+    try:
+        for event, data in initial:
+            yield format_sse(event, data)
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                yield format_sse("dropped", {"reason": "slow consumer"})
+                return
+            yield format_sse(*item)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def follow_changes(watch, poll, name: str):
+    """
+    Background task body for a change feed: run `watch()` (a change stream
+    consumer), restarting it after errors, and fall back to `poll()` for
+    good when the server has no change streams (standalone mongod).
+    """
+    use_change_stream = True
+    while True:
+        try:
+            if use_change_stream:
+                await watch()
+            else:
+                await poll()
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                logger.info("Change streams unavailable, %s falls back to polling", name)
+                use_change_stream = False
+                continue
+            logger.exception("%s failed", name)
+        except Exception:
+            logger.exception("%s failed", name)
+        await asyncio.sleep(RETRY_DELAY)
@@ -0,0 +1,283 @@
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError
+
+from .. import schemas
+from . import change_log, dashboard_stats, file_analysis, forecast_cache, ids, order_details, stock_ledger, supplier_metrics
+
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "10000"))
+# Per-row errors listed in the response; the counts cover every row.
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+ENTITIES = {
+    "suppliers": schemas.SupplierCreate,
+    "products": schemas.ProductCreate,
+    "orders": schemas.OrderCreate,
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+class ImportReport:
+    """
+    Row counts and the first IMPORT_MAX_ERRORS row errors of one import.
+    Rows are numbered from 1, not counting the header.
+    """
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.rows = 0
+        self.inserted = 0
+        self.failed_rows = set()
+        self.errors = []
+        self.aborted = None
+
+    def error(self, row, field, message):
+        self.failed_rows.add(row)
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "field": field, "message": message})
+
+    def result(self) -> dict:
+        return {
+            "entity": self.entity,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": len(self.failed_rows),
+            "errors": self.errors,
+            "errors_truncated": len(self.failed_rows) > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+
+def _fields(model) -> dict:
+    fields = getattr(model, "model_fields", None)
+    return fields if fields is not None else model.__fields__
+
+
+def _text_fields(model) -> list:
+    return [name for name, field in _fields(model).items() if field.annotation in (str, Optional[str])]
+
+
+def _required_fields(model) -> list:
+    return [name for name, field in _fields(model).items() if field.is_required()]
+
+
+def _records(chunk, model) -> list:
+    """
+    Rows as dicts for validation. Blank cells are left out, so the schema
+    defaults apply as for an omitted JSON field, and values of string
+    fields are stringified, so that e.g. phone numbers parsed as numbers
+    from a spreadsheet still validate.
+    """
+    chunk = chunk.astype(object).where(pd.notnull(chunk), None)
+    for name in _text_fields(model):
+        if name in chunk.columns:
+            chunk[name] = pd.Series([None if v is None else str(v) for v in chunk[name]], index=chunk.index, dtype=object)
+    return [{k: v for k, v in row.items() if v is not None} for row in chunk.to_dict(orient="records")]
+
+
+def _validate(adapter, records, first_row, report):
+    """
+    Validate a batch of rows in one call. Returns (row number, dict) for
+    the valid rows; invalid rows are reported and dropped.
+    """
+    try:
+        return list(zip(range(first_row, first_row + len(records)), adapter.dump_python(adapter.validate_python(records))))
+    except ValidationError as e:
+        invalid = set()
+        for err in e.errors():
+            index = err["loc"][0]
+            invalid.add(index)
+            report.error(first_row + index, ".".join(str(part) for part in err["loc"][1:]) or None, err["msg"])
+    valid = [i for i in range(len(records)) if i not in invalid]
+    docs = adapter.dump_python(adapter.validate_python([records[i] for i in valid]))
+    return [(first_row + i, doc) for i, doc in zip(valid, docs)]
+
+
+def _lookup(collection, wanted, cache: dict, projection) -> dict:
+    """
+    Fill `cache` with the documents for the ids in `wanted` it does not
+    hold yet (one $in query) and return it. Unknown ids are cached as None.
+    """
+    missing = [i for i in set(wanted) if i not in cache]
+    if missing:
+        found = {d["id"]: d for d in collection.find({"id": {"$in": missing}}, projection)}
+        for i in missing:
+            cache[i] = found.get(i)
+    return cache
+
+
+def _insert(collection, rows, docs, report) -> list:
+    """
+    Unordered insert_many; rows rejected by the server (e.g. a duplicate
+    id) are reported. Returns the inserted documents.
+    """
+    if not docs:
+        return []
+    try:
+        collection.insert_many(docs, ordered=False)
+        return docs
+    except BulkWriteError as e:
+        failed = {}
+        for err in e.details["writeErrors"]:
+            failed[err["index"]] = err["errmsg"]
+            report.error(rows[err["index"]], None, err["errmsg"])
+        return [doc for i, doc in enumerate(docs) if i not in failed]
+
+
+def _assign_ids(db, collection, docs):
+    for doc, new_id in zip(docs, ids.next_ids(db, collection, len(docs))):
+        doc["id"] = new_id
+
+
+def _import_suppliers(db, batch, state, report):
+    names = [doc["name"] for _, doc in batch]
+    taken = state.setdefault("names", set())
+    taken.update(s["name"] for s in db.suppliers.find({"name": {"$in": names}}, {"_id": 0, "name": 1}))
+
+    rows, docs = [], []
+    for row, doc in batch:
+        if doc["name"] in taken:
+            report.error(row, "name", "Supplier already registered")
+            continue
+        taken.add(doc["name"])
+        rows.append(row)
+        docs.append(doc)
+
+    _assign_ids(db, "suppliers", docs)
+    inserted = _insert(db.suppliers, rows, docs, report)
+    dashboard_stats.record_suppliers_bulk(db, len(inserted))
+    return len(inserted)
+
+
+def _import_products(db, batch, state, report):
+    suppliers = _lookup(db.suppliers, [doc["supplier_id"] for _, doc in batch], state.setdefault("suppliers", {}), order_details.SUPPLIER_PROJECTION)
+
+    rows, docs = [], []
+    for row, doc in batch:
+        supplier = suppliers[doc["supplier_id"]]
+        if supplier is None:
+            report.error(row, "supplier_id", "Supplier not found")
+            continue
+        doc["supplier"] = supplier
+        rows.append(row)
+        docs.append(doc)
+
+    _assign_ids(db, "products", docs)
+    inserted = _insert(db.products, rows, docs, report)
+    dashboard_stats.record_products_bulk(db, inserted)
+    stock_ledger.record_movements(db, [
+        stock_ledger.movement(doc["id"], "adjustment", doc["stock_level"], reason="import") for doc in inserted if doc["stock_level"]
+    ])
+    return len(inserted)
+
+
+def _import_orders(db, batch, state, report):
+    products = _lookup(db.products, [doc["product_id"] for _, doc in batch], state.setdefault("products", {}), order_details.PRODUCT_PROJECTION)
+    suppliers = _lookup(db.suppliers, [doc["supplier_id"] for _, doc in batch], state.setdefault("suppliers", {}), order_details.SUPPLIER_PROJECTION)
+    order_dates = state["order_dates"]
+    now = datetime.utcnow()
+
+    rows, docs = [], []
+    for row, doc in batch:
+        product, supplier = products[doc["product_id"]], suppliers[doc["supplier_id"]]
+        if doc["status"] not in supplier_metrics.ORDER_STATUSES:
+            report.error(row, "status", f"Invalid status. Use one of: {', '.join(supplier_metrics.ORDER_STATUSES)}.")
+        elif product is None:
+            report.error(row, "product_id", "Product not found")
+        elif supplier is None:
+            report.error(row, "supplier_id", "Supplier not found")
+        elif order_dates.get(row, now) is None:
+            report.error(row, "order_date", "Invalid datetime")
+        else:
+            doc["order_date"] = order_dates.get(row, now)
+            doc["status_history"] = [{"status": doc["status"], "at": doc["order_date"]}]
+            order_details.apply_storage(doc, product, supplier)
+            rows.append(row)
+            docs.append(doc)
+
+    _assign_ids(db, "orders", docs)
+    inserted = _insert(db.orders, rows, docs, report)
+    dashboard_stats.record_orders_bulk(db, sum(doc["quantity"] * doc["unit_price"] for doc in inserted))
+    supplier_metrics.record_orders_bulk(db, inserted)
+    forecast_cache.record_orders(db, [doc["product_id"] for doc in inserted])
+    change_log.record_orders(db, inserted)
+    return len(inserted)
+
+
+IMPORTERS = {
+    "suppliers": _import_suppliers,
+    "products": _import_products,
+    "orders": _import_orders,
+}
+
+
+def _order_dates(chunk, first_row) -> dict:
+    """
+    Orders may carry an ISO 8601 `order_date` column (e.g. history from
+    another system); rows without one are dated at import time.
+    Unparseable dates map to None.
+    """
+    if "order_date" not in chunk.columns:
+        return {}
+    raw = chunk["order_date"]
+    provided = (raw.notna() & (raw != "")).to_numpy()
+    parsed = pd.to_datetime(raw, errors="coerce", utc=True, format="ISO8601").dt.tz_convert(None)
+    values = np.array(parsed.dt.to_pydatetime(), dtype=object)
+    values[parsed.isna().to_numpy()] = None
+    return dict(zip((first_row + np.flatnonzero(provided)).tolist(), values[provided].tolist()))
+
+
+def import_file(db, entity: str, source, filename: str, batch_rows: int = IMPORT_BATCH_ROWS) -> dict:
+    """
+    Import every row of a CSV, Excel or NDJSON file as `entity`
+    (suppliers, products or orders). Rows are validated against the
+    entity's Create schema a batch at a time, foreign keys are resolved
+    with one query per batch, ids are reserved in one block per batch and
+    rows are written with unordered insert_many. Invalid rows are skipped
+    and reported; the valid rows of the file are imported regardless.
+
+    Imported orders are history: unlike POST /orders and the simulator,
+    Shipped or Delivered rows do not book receipts, since the imported
+    products' stock_level already holds the stock on hand.
+    """
+    model = ENTITIES.get(entity)
+    if model is None:
+        raise InvalidImport(f"Unknown entity. Use one of: {', '.join(ENTITIES)}.")
+    try:
+        chunks = file_analysis.read_chunks(source, filename, batch_rows, text=True)
+    except file_analysis.UnsupportedFile as e:
+        raise InvalidImport(str(e))
+
+    adapter = TypeAdapter(List[model])
+    report = ImportReport(entity)
+    state = {}
+    try:
+        for chunk in chunks:
+            if report.rows == 0:
+                missing = [name for name in _required_fields(model) if name not in chunk.columns]
+                if missing:
+                    raise InvalidImport(f"Missing columns: {', '.join(missing)}")
+            first_row = report.rows + 1
+            report.rows += len(chunk)
+            state["order_dates"] = _order_dates(chunk, first_row) if entity == "orders" else {}
+            batch = _validate(adapter, _records(chunk, model), first_row, report)
+            if batch:
+                report.inserted += IMPORTERS[entity](db, batch, state, report)
+    except InvalidImport:
+        raise
+    except ValueError as e:
+        # A malformed file part-way through: keep what was imported.
+        if report.rows == 0:
+            raise InvalidImport(str(e))
+        report.aborted = str(e)
+    finally:
+        chunks.close()
+    return report.result()
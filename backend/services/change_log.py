@@ -0,0 +1,103 @@
+import os
+from datetime import datetime
+
+from pymongo.errors import CollectionInvalid
+
+# Capped log of order inserts and stock changes, one entry per write, read
+# by the /events feed on servers without change streams, and only written
+# there. A tailable cursor
+# returns it in insertion order and never skips an entry that commits late,
+# unlike a range query on order ids (leased in blocks per process) or on
+# ObjectIds (generated by each client).
+CHANGE_LOG_COLLECTION = "change_log"
+CHANGE_LOG_SIZE = int(os.getenv("CHANGE_LOG_SIZE", str(16 * 1024 * 1024)))
+# Orders kept per entry; the entry also carries the total.
+CHANGE_LOG_MAX_ORDERS = int(os.getenv("EVENTS_MAX_ITEMS", "50"))
+# "auto" writes the log only where the feed needs it, on servers without
+# change streams; "on" or "off" decide regardless of the server.
+CHANGE_LOG = os.getenv("CHANGE_LOG", "auto").lower()
+
+# Decided on first use in each process.
+_enabled = None
+
+ORDER_FIELDS = ("id", "product_id", "supplier_id", "quantity", "status", "order_date", "product_name", "unit_price", "supplier_name")
+
+
+def ensure_collection(db):
+    """
+    Create the capped log, or convert a plain collection of that name left
+    by a writer that ran first. It starts with one entry so tailable cursors
+    on it stay open.
+    """
+    try:
+        db.create_collection(CHANGE_LOG_COLLECTION, capped=True, size=CHANGE_LOG_SIZE)
+    except CollectionInvalid:
+        if db[CHANGE_LOG_COLLECTION].options().get("capped"):
+            return
+        db.command("convertToCapped", CHANGE_LOG_COLLECTION, size=CHANGE_LOG_SIZE)
+    db[CHANGE_LOG_COLLECTION].insert_one({"kind": "created", "at": datetime.utcnow()})
+
+
+def _has_change_streams(hello: dict) -> bool:
+    # Replica set members and mongos routers; a standalone mongod has none.
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+def enabled(db) -> bool:
+    global _enabled
+    if _enabled is None:
+        if CHANGE_LOG == "auto":
+            _enabled = not _has_change_streams(db.client.admin.command("hello"))
+        else:
+            _enabled = CHANGE_LOG == "on"
+    return _enabled
+
+
+async def enabled_async(db) -> bool:
+    global _enabled
+    if _enabled is None:
+        if CHANGE_LOG == "auto":
+            _enabled = not _has_change_streams(await db.client.admin.command("hello"))
+        else:
+            _enabled = CHANGE_LOG == "on"
+    return _enabled
+
+
+def _orders_entry(orders) -> dict:
+    return {
+        "kind": "orders",
+        "count": len(orders),
+        "orders": [{field: order.get(field) for field in ORDER_FIELDS} for order in orders[-CHANGE_LOG_MAX_ORDERS:]],
+        "at": datetime.utcnow(),
+    }
+
+
+def _stock_entry(product_ids) -> dict:
+    # Distinct, most recently changed last.
+    return {"kind": "stock", "product_ids": list(reversed(dict.fromkeys(reversed(product_ids)))), "at": datetime.utcnow()}
+
+
+def record_orders(db, orders: list):
+    """
+    Called by the write paths after inserting orders.
+    """
+    if orders and enabled(db):
+        db[CHANGE_LOG_COLLECTION].insert_one(_orders_entry(orders))
+
+
+async def record_orders_async(db, orders: list):
+    if orders and await enabled_async(db):
+        await db[CHANGE_LOG_COLLECTION].insert_one(_orders_entry(orders))
+
+
+def record_stock(db, product_ids: list):
+    """
+    Called by the stock ledger after writing movements.
+    """
+    if product_ids and enabled(db):
+        db[CHANGE_LOG_COLLECTION].insert_one(_stock_entry(product_ids))
+
+
+async def record_stock_async(db, product_ids: list):
+    if product_ids and await enabled_async(db):
+        await db[CHANGE_LOG_COLLECTION].insert_one(_stock_entry(product_ids))
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "stats"
+DASHBOARD_ID = "dashboard"
+RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))
+# Attempts at replacing the figures before reconcile gives up until the
+# next run.
+RECONCILE_ATTEMPTS = 3
+
+FIELDS = ("total_revenue", "total_products", "low_stock_alerts", "active_suppliers")
+
+
+def is_low_stock(product) -> bool:
+    return product["stock_level"] <= product["reorder_point"]
+
+
+def _changes(changed: tuple, deltas: dict) -> dict:
+    changes = {field: value for field, value in deltas.items() if value}
+    for collection in changed:
+        changes[f"versions.{collection}"] = 1
+    if changes:
+        # Counts every increment, so reconcile can tell whether one landed
+        # while it was recomputing.
+        changes["writes"] = 1
+    return changes
+
+
+async def _increment(db, changed: tuple, **deltas):
+    """
+    Apply stat deltas and bump the data version of every collection in
+    `changed`. Versions let caches (e.g. report artifacts) detect writes
+    without scanning the collections.
+    """
+    changes = _changes(changed, deltas)
+    if not changes:
+        return
+    await db[STATS_COLLECTION].update_one({"_id": DASHBOARD_ID}, {"$inc": changes}, upsert=True)
+
+
+def _increment_sync(db, changed: tuple, **deltas):
+    """
+    _increment with the sync client, for bulk writers running in worker
+    threads.
+    """
+    changes = _changes(changed, deltas)
+    if not changes:
+        return
+    db[STATS_COLLECTION].update_one({"_id": DASHBOARD_ID}, {"$inc": changes}, upsert=True)
+
+
+async def record_order(db, quantity: int, unit_price: float, low_stock_delta: int = 0, stock_changed: bool = False):
+    changed = ("orders", "products") if stock_changed or low_stock_delta else ("orders",)
+    await _increment(db, changed, total_revenue=quantity * unit_price, low_stock_alerts=low_stock_delta)
+
+
+async def record_order_status_changed(db, low_stock_delta: int = 0, stock_changed: bool = False):
+    changed = ("orders", "products") if stock_changed or low_stock_delta else ("orders",)
+    await _increment(db, changed, low_stock_alerts=low_stock_delta)
+
+
+async def record_product_created(db, product):
+    await _increment(db, ("products",), total_products=1, low_stock_alerts=int(is_low_stock(product)))
+
+
+async def record_product_updated(db, before, after):
+    await _increment(db, ("products",), low_stock_alerts=int(is_low_stock(after)) - int(is_low_stock(before)))
+
+
+async def record_product_deleted(db, product):
+    await _increment(db, ("products",), total_products=-1, low_stock_alerts=-int(is_low_stock(product)))
+
+
+def record_orders_bulk(db, revenue: float, low_stock_delta: int = 0, stock_changed: bool = False):
+    changed = ("orders", "products") if stock_changed or low_stock_delta else ("orders",)
+    _increment_sync(db, changed, total_revenue=revenue, low_stock_alerts=low_stock_delta)
+
+
+def record_products_bulk(db, products):
+    _increment_sync(db, ("products",), total_products=len(products), low_stock_alerts=sum(is_low_stock(p) for p in products))
+
+
+def record_suppliers_bulk(db, count: int):
+    _increment_sync(db, ("suppliers",), active_suppliers=count)
+
+
+async def record_supplier_created(db):
+    await _increment(db, ("suppliers",), active_suppliers=1)
+
+
+async def record_supplier_updated(db):
+    await _increment(db, ("suppliers",))
+
+
+async def record_supplier_deleted(db):
+    await _increment(db, ("suppliers",), active_suppliers=-1)
+
+
+def compute_stats(db):
+    """
+    Recompute the dashboard figures from scratch. Revenue uses the unit
+    price captured on the order (or its legacy embedded product) where
+    available, falling back to the current product price.
+    """
+    pipeline = [
+        {
+            "$lookup": {
+                "from": "products",
+                "localField": "product_id",
+                "foreignField": "id",
+                "as": "product_info"
+            }
+        },
+        {
+            "$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": True}
+        },
+        {
+            "$group": {
+                "_id": None,
+                "totalRevenue": {
+                    "$sum": {
+                        "$multiply": [
+                            "$quantity",
+                            {"$ifNull": ["$unit_price", "$product.price", "$product_info.price", 0]}
+                        ]
+                    }
+                }
+            }
+        }
+    ]
+
+    revenue_result = list(db.orders.aggregate(pipeline))
+    total_revenue = revenue_result[0]["totalRevenue"] if revenue_result else 0
+
+    return {
+        "total_revenue": total_revenue,
+        "total_products": db.products.count_documents({}),
+        "low_stock_alerts": db.products.count_documents({"$expr": {"$lte": ["$stock_level", "$reorder_point"]}}),
+        "active_suppliers": db.suppliers.count_documents({}),
+    }
+
+
+def _drift(fresh: dict, stored: dict) -> dict:
+    drift = {}
+    for field in FIELDS:
+        difference = fresh[field] - stored.get(field, 0)
+        if abs(difference) > 1e-6:
+            drift[field] = difference
+    return drift
+
+
+def reconcile(db, attempts: int = RECONCILE_ATTEMPTS):
+    """
+    Recompute the summary document and overwrite the incrementally
+    maintained one, unless an increment landed during the recompute (the
+    overwrite would lose it); then try again. After `attempts` tries the
+    counters are left alone: an increment that landed between reading them
+    and the recompute is in both, so applying the difference would count
+    it twice. Returns the fresh figures and the drift found
+    (fresh - stored) for each field.
+    """
+    stats = db[STATS_COLLECTION]
+    for attempt in range(attempts):
+        stored = stats.find_one({"_id": DASHBOARD_ID}) or {}
+        fresh = compute_stats(db)
+        drift = _drift(fresh, stored)
+        unchanged = {"writes": stored["writes"]} if "writes" in stored else {"writes": {"$exists": False}}
+        try:
+            result = stats.update_one(
+                {"_id": DASHBOARD_ID, **unchanged},
+                {"$set": {**fresh, "reconciled_at": datetime.utcnow()}},
+                upsert=not stored,
+            )
+        except DuplicateKeyError:
+            # The document was created by an increment in the meantime.
+            continue
+        if result.matched_count or result.upserted_id is not None:
+            break
+    else:
+        logger.warning("Dashboard stats changed during each of %d recomputes, left as they are", attempts)
+        return {"stats": fresh, "drift": drift}
+
+    if drift and stored.get("reconciled_at"):
+        logger.warning("Dashboard stats drifted from source data: %s", drift)
+    return {"stats": fresh, "drift": drift}
+
+
+def data_version(db, collections) -> dict:
+    """
+    Current write version of each collection, as maintained by the
+    record_* helpers.
+    """
+    doc = db[STATS_COLLECTION].find_one({"_id": DASHBOARD_ID}, {"versions": 1}) or {}
+    versions = doc.get("versions", {})
+    return {collection: versions.get(collection, 0) for collection in collections}
+
+
+def collection_version(db, collections) -> dict:
+    """
+    Write versions plus collection sizes: the versions catch changes made
+    through the API, the sizes also catch inserts made by other tools
+    (imports, migrations).
+    """
+    return {
+        collection: [count, db[collection].estimated_document_count()]
+        for collection, count in data_version(db, collections).items()
+    }
+
+
+async def reconcile_periodically(db, interval: int = RECONCILE_INTERVAL):
+    """
+    Background task: reconcile immediately, then every `interval` seconds.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(reconcile, db)
+        except Exception:
+            logger.exception("Dashboard stats reconciliation failed")
+        await asyncio.sleep(interval)
+
+
+async def get_stats(db, sync_db):
+    """
+    Read the summary document. A document that has never been reconciled
+    (first start, or created by an increment) is rebuilt with the sync
+    client before being returned.
+    """
+    doc = await db[STATS_COLLECTION].find_one({"_id": DASHBOARD_ID})
+    if doc is None or "reconciled_at" not in doc:
+        doc = (await asyncio.to_thread(reconcile, sync_db))["stats"]
+    return {field: doc.get(field, 0) for field in FIELDS}
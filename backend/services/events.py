@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+from collections import deque
+
+from pymongo import CursorType
+
+from . import broadcast, change_log, dashboard_stats, stock_ledger
+
+logger = logging.getLogger(__name__)
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+# Changes are gathered and published at most once per interval, as one
+# event per kind, so a bulk write of 100k orders costs subscribers a
+# handful of events rather than 100k.
+EVENTS_FLUSH_INTERVAL = float(os.getenv("EVENTS_FLUSH_INTERVAL", "0.5"))
+# Orders / products listed per event; the event also carries the total.
+EVENTS_MAX_ITEMS = int(os.getenv("EVENTS_MAX_ITEMS", "50"))
+# Used on a standalone mongod, which has no change streams.
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "2"))
+
+# New orders, stock ledger entries (every stock change writes one) and
+# updates of the dashboard summary.
+WATCH_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": "insert", "ns.coll": {"$in": ["orders", stock_ledger.LEDGER_COLLECTION]}},
+        {"ns.coll": dashboard_stats.STATS_COLLECTION, "documentKey._id": dashboard_stats.DASHBOARD_ID},
+    ]}},
+    {"$project": {"operationType": 1, "ns": 1, **{f"fullDocument.{field}": 1 for field in change_log.ORDER_FIELDS}}},
+]
+
+
+def _order(doc) -> dict:
+    return {field: doc.get(field) for field in change_log.ORDER_FIELDS}
+
+
+def _stats(doc) -> dict:
+    stats = {field: (doc or {}).get(field, 0) for field in dashboard_stats.FIELDS}
+    stats["total_revenue"] = int(stats["total_revenue"])
+    return stats
+
+
+class EventFeed:
+    """
+    One upstream feed of database changes per process, fanned out to any
+    number of /events subscribers as "order-created", "stock-changed" and
+    "stats-updated" events.
+    """
+
+    def __init__(self, broadcaster: broadcast.Broadcaster, flush_interval: float = EVENTS_FLUSH_INTERVAL, max_items: int = EVENTS_MAX_ITEMS):
+        self.broadcaster = broadcaster
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+        self.mode = None
+        # Dashboard figures sent to new subscribers; None when stale.
+        self.stats_snapshot = None
+        self._reset()
+
+    def _reset(self):
+        self._orders = deque(maxlen=self.max_items)
+        self._order_count = 0
+        self._products = {}
+        self._stats_changed = False
+
+    def add_orders(self, orders, count: int = None):
+        orders = list(orders)
+        self._orders.extend(orders)
+        self._order_count += len(orders) if count is None else count
+
+    def add_stock_changes(self, product_ids):
+        for product_id in product_ids:
+            # Most recently changed last.
+            self._products.pop(product_id, None)
+            self._products[product_id] = None
+
+    def mark_stats_changed(self):
+        self._stats_changed = True
+
+    def apply_change(self, change: dict):
+        collection = change["ns"]["coll"]
+        if collection == "orders":
+            self.add_orders([_order(change["fullDocument"])])
+        elif collection == stock_ledger.LEDGER_COLLECTION:
+            self.add_stock_changes([change["fullDocument"]["product_id"]])
+        else:
+            self.mark_stats_changed()
+
+    def apply_log_entry(self, entry: dict):
+        if entry["kind"] == "orders":
+            self.add_orders(map(_order, entry["orders"]), entry["count"])
+        elif entry["kind"] == "stock":
+            self.add_stock_changes(entry["product_ids"])
+
+    async def flush(self, db):
+        """
+        Publish what changed since the last flush. The stock levels and
+        the dashboard figures are read here, once per flush, and only while
+        someone is subscribed.
+        """
+        orders, order_count, products, stats_changed = list(self._orders), self._order_count, list(self._products), self._stats_changed
+        self._reset()
+        if stats_changed:
+            self.stats_snapshot = None
+        if not self.broadcaster.subscribers:
+            return
+        if orders:
+            self.broadcaster.publish("order-created", {"count": order_count, "orders": orders})
+        if products:
+            listed = products[-self.max_items:]
+            levels = {}
+            async for product in db.products.find({"id": {"$in": listed}}, {"_id": 0, "id": 1, "stock_level": 1}):
+                levels[product["id"]] = product["stock_level"]
+            self.broadcaster.publish("stock-changed", {
+                "count": len(products),
+                "products": [{"product_id": product_id, "stock_level": levels.get(product_id)} for product_id in listed],
+            })
+        if stats_changed:
+            self.broadcaster.publish("stats-updated", await self.current_stats(db))
+
+    async def current_stats(self, db) -> dict:
+        """
+        The dashboard figures, read again only after they changed.
+        """
+        if self.stats_snapshot is None:
+            self.stats_snapshot = _stats(await db[dashboard_stats.STATS_COLLECTION].find_one({"_id": dashboard_stats.DASHBOARD_ID}))
+        return self.stats_snapshot
+
+    async def _flush_periodically(self, db):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(db)
+            except Exception:
+                logger.exception("Event feed flush failed")
+
+    async def _watch(self, db):
+        async with await db.watch(WATCH_PIPELINE) as changes:
+            self.mode = "change_stream"
+            async for change in changes:
+                self.apply_change(change)
+
+    async def _poll(self, db, interval: float):
+        """
+        Without change streams: new orders and stock changes from a
+        tailable cursor on the change log, and the summary document, every
+        `interval` seconds.
+        """
+        self.mode = "polling"
+        if not await change_log.enabled_async(db):
+            logger.warning("The change log is not written (CHANGE_LOG=%s), the event feed only publishes dashboard updates", change_log.CHANGE_LOG)
+        log = db[change_log.CHANGE_LOG_COLLECTION]
+        last_stats = await db[dashboard_stats.STATS_COLLECTION].find_one({"_id": dashboard_stats.DASHBOARD_ID})
+        cursor = None
+        while True:
+            if cursor is None or not cursor.alive:
+                if cursor is not None:
+                    # The log wrapped past the cursor's position.
+                    logger.warning("Event feed fell behind the change log, some changes were not published")
+                cursor = log.find({}, cursor_type=CursorType.TAILABLE)
+                # Entries written before the feed (re)started are skipped.
+                async for _ in cursor:
+                    pass
+            else:
+                async for entry in cursor:
+                    self.apply_log_entry(entry)
+
+            stats = await db[dashboard_stats.STATS_COLLECTION].find_one({"_id": dashboard_stats.DASHBOARD_ID})
+            if stats != last_stats:
+                last_stats = stats
+                self.mark_stats_changed()
+            await asyncio.sleep(interval)
+
+    async def run(self, db, poll_interval: float = EVENTS_POLL_INTERVAL):
+        """
+        Background task: follow the changes and flush them every
+        flush_interval seconds.
+        """
+        flusher = asyncio.create_task(self._flush_periodically(db))
+        try:
+            await broadcast.follow_changes(lambda: self._watch(db), lambda: self._poll(db, poll_interval), "Event feed")
+        finally:
+            flusher.cancel()
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "flush_interval": self.flush_interval, **self.broadcaster.stats()}
+
+
+broadcaster = broadcast.Broadcaster(EVENTS_QUEUE_SIZE)
+feed = EventFeed(broadcaster)
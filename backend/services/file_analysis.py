@@ -0,0 +1,323 @@
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Uploads are read this many rows at a time, so memory depends on the chunk
+# size and column count, not on the file size.
+ANALYZE_CHUNK_ROWS = int(os.getenv("ANALYZE_CHUNK_ROWS", "100000"))
+# Quantiles come from a uniform reservoir sample of each numeric column;
+# they are exact for columns with at most this many values.
+QUANTILE_SAMPLE_SIZE = int(os.getenv("ANALYZE_QUANTILE_SAMPLE", "100000"))
+# Distinct values tracked per text column (for unique/top/freq).
+DISTINCT_LIMIT = int(os.getenv("ANALYZE_DISTINCT_LIMIT", "100000"))
+
+PERCENTILES = (0.25, 0.5, 0.75)
+HEAD_ROWS = 5
+
+
+class UnsupportedFile(ValueError):
+    pass
+
+
+def _none_if_nan(value):
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+
+class NumericSummary:
+    """
+    Mergeable running statistics for one numeric column: count, mean and
+    sum of squared deviations (Chan et al. parallel update), min, max and
+    a reservoir sample for the quartiles.
+    """
+
+    def __init__(self, sample_size: int = QUANTILE_SAMPLE_SIZE, seed: int = 0):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sample_size = sample_size
+        self.sample = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self._sample(values)
+        mean = values.mean()
+        self._merge_moments(len(values), mean, ((values - mean) ** 2).sum(), values.min(), values.max())
+
+    def merge(self, other: "NumericSummary"):
+        if not other.count:
+            return
+        # Each slot of the merged reservoir comes from either side in
+        # proportion to the number of values that side has seen.
+        total = self.count + other.count
+        take = min(self._rng.binomial(self.sample_size, self.count / total), len(self.sample))
+        take_other = min(self.sample_size - take, len(other.sample))
+        self.sample = np.concatenate([
+            self._rng.choice(self.sample, take, replace=False),
+            self._rng.choice(other.sample, take_other, replace=False),
+        ])
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+
+    def _merge_moments(self, count, mean, m2, low, high):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def _sample(self, values):
+        """
+        Algorithm R over a whole chunk at once: the i-th value seen replaces
+        a random slot with probability sample_size / i. Later values win
+        when two land on the same slot, as they would one at a time.
+        """
+        fill = min(self.sample_size - len(self.sample), len(values))
+        if fill:
+            self.sample = np.concatenate([self.sample, values[:fill]])
+        rest = values[fill:]
+        if len(rest):
+            seen = self.count + fill + np.arange(1, len(rest) + 1)
+            slots = (self._rng.random(len(rest)) * seen).astype(np.int64)
+            keep = slots < self.sample_size
+            self.sample[slots[keep]] = rest[keep]
+
+    def result(self) -> dict:
+        """
+        The fields of DataFrame.describe() for a numeric column.
+        """
+        if not self.count:
+            return {"count": 0.0, "mean": None, "std": None, "min": None, **{f"{int(q * 100)}%": None for q in PERCENTILES}, "max": None}
+        quartiles = np.quantile(self.sample, PERCENTILES)
+        return {
+            "count": float(self.count),
+            "mean": float(self.mean),
+            "std": float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None,
+            "min": float(self.min),
+            **{f"{int(q * 100)}%": float(v) for q, v in zip(PERCENTILES, quartiles)},
+            "max": float(self.max),
+        }
+
+
+class TextSummary:
+    """
+    Running value counts for one non-numeric column. Past DISTINCT_LIMIT
+    values the rarest are dropped, so unique becomes a lower bound.
+    """
+
+    def __init__(self, limit: int = DISTINCT_LIMIT):
+        self.count = 0
+        self.limit = limit
+        self.counts = Counter()
+
+    def update(self, series):
+        counts = series.value_counts(sort=False)
+        self.count += int(counts.sum())
+        self.counts.update(counts.to_dict())
+        self._prune()
+
+    def merge(self, other: "TextSummary"):
+        self.count += other.count
+        self.counts.update(other.counts)
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) > self.limit:
+            self.counts = Counter(dict(self.counts.most_common(self.limit)))
+
+    def result(self) -> dict:
+        top, freq = self.counts.most_common(1)[0] if self.counts else (None, None)
+        return {"count": self.count, "unique": len(self.counts), "top": top, "freq": freq}
+
+
+def _is_numeric(series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _records(frame) -> list:
+    return frame.astype(object).where(pd.notnull(frame), None).to_dict(orient="records")
+
+
+class FileSummary:
+    """
+    Folds DataFrame chunks into per-column summaries. A column is numeric
+    while every chunk parsed it as numbers; like describe() on the whole
+    frame, only numeric columns are summarised when there are any.
+
+    Text value counts are skipped while there are numeric columns, so when
+    the last numeric column turns out to be text they only cover part of
+    the file (`text_exact` is False) and have to be recounted from a second
+    pass. Columns that turned to text after their first chunk are listed in
+    `flipped`: their head values were read as numbers.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.head = None
+        self.row_count = 0
+        self.numeric = {}
+        self.text = {}
+        self.text_exact = True
+        self.flipped = set()
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = chunk.columns.tolist()
+            self.head = []
+        if len(self.head) < HEAD_ROWS:
+            self.head += _records(chunk.head(HEAD_ROWS - len(self.head)))
+        self.row_count += len(chunk)
+        text = []
+        for column in chunk.columns:
+            series = chunk[column]
+            if _is_numeric(series) and column not in self.text:
+                self.numeric.setdefault(column, NumericSummary()).update(series.to_numpy(dtype=float, na_value=np.nan))
+                continue
+            if column in self.numeric:
+                # Values already folded in as numbers stay out of the counts.
+                if self.numeric.pop(column).count:
+                    self.text_exact = False
+                    self.flipped.add(column)
+            elif _is_numeric(series) and series.notna().any():
+                # Counted as numbers here, as strings in the other chunks.
+                self.text_exact = False
+            self.text.setdefault(column, TextSummary())
+            text.append(column)
+        # Text columns are only reported when there are no numeric ones, so
+        # their value counts (the expensive part) are skipped otherwise.
+        if not self.numeric:
+            for column in text:
+                self.text[column].update(chunk[column])
+        elif text:
+            self.text_exact = False
+
+    def recount_text(self, chunks):
+        """
+        Count every text column again from a pass that reads cells as
+        strings, as reading the whole file at once would.
+        """
+        self.text = {column: TextSummary() for column in self.text}
+        for chunk in chunks:
+            for column, summary in self.text.items():
+                summary.update(chunk[column])
+        self.text_exact = True
+
+    def replace_head(self, chunk):
+        """
+        Head values of the flipped columns from a read that kept them as
+        strings.
+        """
+        for row, values in zip(self.head, _records(chunk.head(HEAD_ROWS))):
+            row.update((column, values[column]) for column in self.flipped)
+
+    def result(self) -> dict:
+        columns = self.columns or []
+        if self.numeric:
+            summary = {c: self.numeric[c].result() for c in columns if c in self.numeric}
+        else:
+            summary = {c: self.text[c].result() for c in columns if c in self.text}
+        return {
+            "summary": {c: {k: _none_if_nan(v) for k, v in s.items()} for c, s in summary.items()},
+            "head": self.head or [],
+            "columns": columns,
+            "row_count": self.row_count,
+        }
+
+
+def _csv_chunks(source, chunk_rows, text=False):
+    options = {"dtype": str, "keep_default_na": False, "na_values": [""]} if text else {}
+    yield from pd.read_csv(source, chunksize=chunk_rows, **options)
+
+
+def _ndjson_chunks(source, chunk_rows, text=False):
+    # Values keep their JSON types; only column dtypes are inferred.
+    yield from pd.read_json(source, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+
+
+def _xlsx_chunks(source, chunk_rows, text=False):
+    """
+    Rows of the first worksheet through openpyxl's read-only mode, which
+    streams the sheet XML instead of loading the workbook.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)]
+        batch = []
+        for row in rows:
+            batch.append(row[:len(columns)])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _xls_chunks(source, chunk_rows, text=False):
+    # Legacy .xls sheets are capped at 65536 rows, so they are read whole.
+    yield pd.read_excel(source)
+
+
+READERS = {
+    ".csv": _csv_chunks,
+    ".xlsx": _xlsx_chunks,
+    ".xls": _xls_chunks,
+    ".ndjson": _ndjson_chunks,
+    ".jsonl": _ndjson_chunks,
+}
+
+
+def read_chunks(source, filename: str, chunk_rows: int = ANALYZE_CHUNK_ROWS, text: bool = False):
+    """
+    DataFrames of at most `chunk_rows` rows from a CSV, Excel or NDJSON
+    file, picked by extension. With `text`, CSV cells are kept as strings
+    (blank cells as NaN) instead of having their types inferred.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in READERS:
+        raise UnsupportedFile("Unsupported file format")
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return READERS[extension](source, chunk_rows, text)
+
+
+def analyze_chunks(chunks) -> dict:
+    summary = FileSummary()
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary.result()
+
+
+def analyze_file(source, filename: str, chunk_rows: int = ANALYZE_CHUNK_ROWS) -> dict:
+    """
+    Summary statistics, a head preview, the column names and the row count
+    of an uploaded CSV, Excel or NDJSON file, read in chunks of
+    `chunk_rows` rows. `source` is a path or a seekable binary file. Means,
+    std, min and max are exact; quartiles are exact up to
+    QUANTILE_SAMPLE_SIZE values per column and sampled beyond that. A file
+    whose last numeric column turns to text after the first chunk is read
+    a second time for the text counts.
+    """
+    summary = FileSummary()
+    for chunk in read_chunks(source, filename, chunk_rows):
+        summary.update(chunk)
+    if summary.flipped:
+        summary.replace_head(next(iter(read_chunks(source, filename, HEAD_ROWS, text=True))))
+    if not summary.numeric and not summary.text_exact:
+        summary.recount_text(read_chunks(source, filename, chunk_rows, text=True))
+    return summary.result()
@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from pymongo import UpdateOne
+
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "10000"))
+# Stored forecasts double as the second tier; set to 0 to only use memory.
+FORECAST_CACHE_PERSISTENT = os.getenv("FORECAST_CACHE_PERSISTENT", "1") == "1"
+
+OUTCOMES = ("memory_hit", "persistent_hit", "miss")
+
+# Per-product order counters ({_id: product_id, seq}) that version the
+# stored and cached forecasts.
+FORECAST_VERSIONS_COLLECTION = "forecast_versions"
+
+
+def history_version(db, product_id: int) -> int:
+    """
+    Number of orders recorded for the product by record_orders. It changes
+    whenever an order for the product is inserted, in any API process,
+    whatever id the order got.
+    """
+    doc = db[FORECAST_VERSIONS_COLLECTION].find_one({"_id": product_id})
+    return doc["seq"] if doc else 0
+
+
+def history_versions(db, product_ids=None) -> dict:
+    query = {} if product_ids is None else {"_id": {"$in": list(product_ids)}}
+    return {doc["_id"]: doc["seq"] for doc in db[FORECAST_VERSIONS_COLLECTION].find(query)}
+
+
+class ForecastCache:
+    """
+    In-process LRU of forecast responses keyed by (product_id, model). An
+    entry only counts as a hit while its history version matches.
+    """
+
+    def __init__(self, maxsize: int = FORECAST_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {outcome: 0 for outcome in OUTCOMES}
+        self._latency = {outcome: 0.0 for outcome in OUTCOMES}
+        self._max_latency = {outcome: 0.0 for outcome in OUTCOMES}
+        self._invalidations = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def put(self, key, version, value: dict):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, product_id: int):
+        self.invalidate_many([product_id])
+
+    def invalidate_many(self, product_ids):
+        product_ids = set(product_ids)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in product_ids]:
+                del self._entries[key]
+            self._invalidations += len(product_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, outcome: str, seconds: float):
+        with self._lock:
+            self._counts[outcome] += 1
+            self._latency[outcome] += seconds
+            self._max_latency[outcome] = max(self._max_latency[outcome], seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._counts.values())
+            hits = self._counts["memory_hit"] + self._counts["persistent_hit"]
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "persistent": FORECAST_CACHE_PERSISTENT,
+                "requests": total,
+                "hit_ratio": round(hits / total, 4) if total else None,
+                "invalidations": self._invalidations,
+                **{
+                    outcome: {
+                        "count": self._counts[outcome],
+                        "avg_ms": round(self._latency[outcome] / self._counts[outcome] * 1000, 3) if self._counts[outcome] else None,
+                        "max_ms": round(self._max_latency[outcome] * 1000, 3),
+                    }
+                    for outcome in OUTCOMES
+                },
+            }
+
+
+cache = ForecastCache()
+
+
+def record_orders(db, product_ids):
+    """
+    Called by the write paths after inserting orders, one product id per
+    order: bumps the products' history versions, so every process sees its
+    forecasts as stale, and drops them from this process's cache.
+    """
+    counts = Counter(product_ids)
+    if not counts:
+        return
+    db[FORECAST_VERSIONS_COLLECTION].bulk_write(
+        [UpdateOne({"_id": product_id}, {"$inc": {"seq": n}}, upsert=True) for product_id, n in counts.items()],
+        ordered=False,
+    )
+    cache.invalidate_many(counts)
+
+
+async def record_order(db, product_id: int):
+    await db[FORECAST_VERSIONS_COLLECTION].update_one({"_id": product_id}, {"$inc": {"seq": 1}}, upsert=True)
+    cache.invalidate(product_id)
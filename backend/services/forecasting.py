@@ -0,0 +1,287 @@
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import ReplaceOne
+
+from . import analytics, forecast_cache
+
+FORECASTS_COLLECTION = "forecasts"
+FORECAST_PERIODS = 3
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "auto")
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "180"))
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))
+# Fitting is vectorized across products, so a chunk has to be large before
+# shipping it to another process pays for the pickling.
+FORECAST_CHUNK_SIZE = int(os.getenv("FORECAST_CHUNK_SIZE", "25000"))
+MIN_HISTORY_DAYS = 2
+WRITE_BATCH_SIZE = 1000
+
+EPOCH = datetime(1970, 1, 1)
+DAY_MS = 24 * 60 * 60 * 1000
+
+NOT_ENOUGH_DATA = "Not enough data for forecasting"
+MODELS = list(analytics.FORECAST_MODELS) + ["auto"]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class InvalidForecastRequest(ValueError):
+    pass
+
+
+def check_model(model: str):
+    if model not in MODELS:
+        raise InvalidForecastRequest(f"Unknown model. Use one of: {', '.join(MODELS)}.")
+
+
+def _get_executor():
+    # Spawned like the report workers: the API process holds Mongo clients
+    # and threads that must not be forked.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=FORECAST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard(executor):
+    """
+    Drop a pool broken by a dead worker (e.g. OOM-killed) so the next call
+    starts a new one; a broken pool fails every call submitted to it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def daily_demand(db, product_ids=None):
+    """
+    Total ordered quantity per (product, day) for the whole catalog in one
+    aggregation. Returns parallel arrays (product_ids, days, quantities),
+    days counted from the Unix epoch.
+    """
+    match = {"product_id": {"$ne": None}}
+    if product_ids is not None:
+        match["product_id"] = {"$in": list(product_ids)}
+    day = {"$floor": {"$divide": [{"$subtract": ["$order_date", EPOCH]}, DAY_MS]}}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"product_id": "$product_id", "day": day},
+            "quantity": {"$sum": "$quantity"},
+        }},
+    ]
+    groups = list(db.orders.aggregate(pipeline, allowDiskUse=True))
+    products = np.fromiter((g["_id"]["product_id"] for g in groups), dtype=np.int64, count=len(groups))
+    days = np.fromiter((g["_id"]["day"] for g in groups), dtype=np.int64, count=len(groups))
+    quantities = np.fromiter((g["quantity"] for g in groups), dtype=np.float64, count=len(groups))
+    return products, days, quantities
+
+
+def demand_matrix(products, days, quantities, history_days: int = FORECAST_HISTORY_DAYS):
+    """
+    Lay the daily totals out as a (products x history_days) matrix, each
+    row ending on that product's last order day and zero on days without
+    orders. Returns (product ids, matrix, first history column per row,
+    last order day per row, days with orders per row).
+    """
+    ids, groups = np.unique(products, return_inverse=True)
+    last_day = np.full(len(ids), np.iinfo(np.int64).min)
+    first_day = np.full(len(ids), np.iinfo(np.int64).max)
+    np.maximum.at(last_day, groups, days)
+    np.minimum.at(first_day, groups, days)
+
+    column = days - last_day[groups] + history_days - 1
+    keep = column >= 0
+    history = np.zeros((len(ids), history_days))
+    np.add.at(history, (groups[keep], column[keep]), quantities[keep])
+    order_days = np.bincount(groups[keep], minlength=len(ids))
+
+    start = np.maximum(first_day - last_day + history_days - 1, 0)
+    return ids, history, start, last_day, order_days
+
+
+def _chunks(size: int, chunk_size: int):
+    for first in range(0, size, chunk_size):
+        yield slice(first, min(first + chunk_size, size))
+
+
+def fit_all(history, start, periods: int, model: str):
+    """
+    Fit every row, fanning chunks of rows out to the process pool when
+    there is more than one chunk.
+    """
+    chunks = list(_chunks(len(history), FORECAST_CHUNK_SIZE))
+    if len(chunks) <= 1 or FORECAST_WORKERS <= 1:
+        return analytics.fit_forecasts(history, start, periods, model)
+
+    for attempt in range(2):
+        executor = _get_executor()
+        try:
+            futures = [executor.submit(analytics.fit_forecasts, history[c], start[c], periods, model) for c in chunks]
+            parts = [f.result() for f in futures]
+            break
+        except BrokenProcessPool:
+            # Fits are pure, so the whole run is retried once on a new pool.
+            _discard(executor)
+            if attempt:
+                raise
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def _metric(value):
+    return None if math.isnan(value) else round(float(value), 4)
+
+
+def forecast_products(db, product_ids=None, periods: int = FORECAST_PERIODS, model: str = FORECAST_MODEL):
+    """
+    Forecast daily demand `periods` days past each product's last order day.
+    Returns (forecast documents, number of products with order history).
+    """
+    check_model(model)
+    # Read before the history: an order inserted meanwhile leaves the
+    # forecast with an older version, so it is refitted rather than kept.
+    versions = forecast_cache.history_versions(db, product_ids)
+    products, days, quantities = daily_demand(db, product_ids)
+    if len(products) == 0:
+        return [], 0
+
+    ids, history, start, last_day, order_days = demand_matrix(products, days, quantities)
+    fitted = np.flatnonzero(order_days >= MIN_HISTORY_DAYS)
+    if len(fitted) == 0:
+        return [], len(ids)
+
+    predictions, models, rmse, mape = fit_all(history[fitted], start[fitted], periods, model)
+
+    generated_at = datetime.utcnow()
+    steps = np.arange(1, periods + 1)
+    docs = []
+    for row, i in enumerate(fitted):
+        docs.append({
+            "product_id": int(ids[i]),
+            "model": str(models[row]),
+            "dates": [(EPOCH + timedelta(days=int(d))).strftime("%Y-%m-%d") for d in last_day[i] + steps],
+            "forecast": predictions[row].tolist(),
+            "backtest": {"rmse": _metric(rmse[row]), "mape": _metric(mape[row])},
+            "history_days": int(order_days[i]),
+            "history_version": versions.get(int(ids[i]), 0),
+            "generated_at": generated_at,
+        })
+    return docs, len(ids)
+
+
+def save_forecasts(db, docs, batch_size: int = WRITE_BATCH_SIZE):
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        db[FORECASTS_COLLECTION].bulk_write(
+            [ReplaceOne({"product_id": d["product_id"]}, d, upsert=True) for d in batch],
+            ordered=False,
+        )
+
+
+def run_forecasts(db, periods: int = FORECAST_PERIODS, model: str = FORECAST_MODEL) -> dict:
+    """
+    Forecast the whole catalog and replace the stored forecasts. Products
+    that no longer have enough history lose their stale forecast.
+    """
+    started = time.perf_counter()
+    docs, with_history = forecast_products(db, periods=periods, model=model)
+    save_forecasts(db, docs)
+    forecast_cache.cache.clear()
+    db[FORECASTS_COLLECTION].delete_many({"product_id": {"$nin": [d["product_id"] for d in docs]}})
+    chosen = {}
+    for d in docs:
+        chosen[d["model"]] = chosen.get(d["model"], 0) + 1
+    return {
+        "products_with_orders": with_history,
+        "forecasted": len(docs),
+        "skipped": with_history - len(docs),
+        "models": chosen,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def get_forecast(db, product_id: int, model: str = None):
+    """
+    Forecast for one product, served from the in-process cache, then the
+    stored forecast, and fitted only when neither matches the product's
+    current order history. Asking for a model other than the stored one
+    fits it without replacing the stored forecast.
+    """
+    if model is not None:
+        check_model(model)
+    started = time.perf_counter()
+    key = (product_id, model)
+    version = forecast_cache.history_version(db, product_id)
+
+    result = forecast_cache.cache.get(key, version)
+    if result is not None:
+        forecast_cache.cache.record("memory_hit", time.perf_counter() - started)
+        return result
+
+    fields = ["dates", "forecast", "model", "backtest"]
+    doc = None
+    if forecast_cache.FORECAST_CACHE_PERSISTENT:
+        doc = db[FORECASTS_COLLECTION].find_one(
+            {"product_id": product_id}, {"_id": 0, "history_version": 1, **{f: 1 for f in fields}}
+        )
+        if doc is not None and doc.pop("history_version", None) == version and model in (None, doc.get("model")):
+            forecast_cache.cache.put(key, version, doc)
+            forecast_cache.cache.record("persistent_hit", time.perf_counter() - started)
+            return doc
+
+    docs, _ = forecast_products(db, [product_id], model=model or FORECAST_MODEL)
+    if docs:
+        result = {f: docs[0][f] for f in fields}
+        if model is None and forecast_cache.FORECAST_CACHE_PERSISTENT:
+            save_forecasts(db, docs)
+    else:
+        result = {"error": NOT_ENOUGH_DATA}
+    forecast_cache.cache.put(key, version, result)
+    forecast_cache.cache.record("miss", time.perf_counter() - started)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute demand forecasts for every product.")
+    parser.add_argument("--periods", type=int, default=FORECAST_PERIODS)
+    parser.add_argument("--model", choices=MODELS, default=FORECAST_MODEL)
+    args = parser.parse_args(argv)
+
+    from .. import database
+
+    try:
+        summary = run_forecasts(database.db, periods=args.periods, model=args.model)
+    finally:
+        shutdown()
+    print(f"Forecasted {summary['forecasted']} products "
+          f"({summary['skipped']} skipped for short history) in {summary['elapsed_s']} s: {summary['models']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
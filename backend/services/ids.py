@@ -0,0 +1,197 @@
+import os
+import asyncio
+import threading
+from pymongo import ReturnDocument
+
+COUNTERS_COLLECTION = "counters"
+DEFAULT_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "1"))
+
+
+def _parse_block_sizes(raw: str) -> dict:
+    """
+    Parse per-collection block sizes, e.g. "orders=500,products=20".
+    """
+    sizes = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, size = item.split("=", 1)
+        sizes[name.strip()] = max(1, int(size))
+    return sizes
+
+
+BLOCK_SIZES = _parse_block_sizes(os.getenv("ID_BLOCK_SIZES", ""))
+
+
+def _seed_counter(db, collection: str):
+    """
+    Make sure the counter is at least the highest id already stored, so
+    collections created before the counters existed keep counting upwards.
+    $max makes this safe to run concurrently from several workers.
+    """
+    last = list(db[collection].find({}, {"id": 1, "_id": 0}).sort("id", -1).limit(1))
+    current_max = last[0]["id"] if last else 0
+    db[COUNTERS_COLLECTION].update_one(
+        {"_id": collection},
+        {"$max": {"seq": current_max}},
+        upsert=True,
+    )
+
+
+def reserve_block(db, collection: str, size: int = 1):
+    """
+    Atomically reserve `size` consecutive ids for `collection`.
+    Returns the inclusive (first, last) range.
+    """
+    counter = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"seq": size}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = counter["seq"]
+    return last - size + 1, last
+
+
+async def _seed_counter_async(db, collection: str):
+    cursor = db[collection].find({}, {"id": 1, "_id": 0}).sort("id", -1).limit(1)
+    last = await cursor.to_list(length=1)
+    current_max = last[0]["id"] if last else 0
+    await db[COUNTERS_COLLECTION].update_one(
+        {"_id": collection},
+        {"$max": {"seq": current_max}},
+        upsert=True,
+    )
+
+
+async def reserve_block_async(db, collection: str, size: int = 1):
+    counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"seq": size}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = counter["seq"]
+    return last - size + 1, last
+
+
+class IdAllocator:
+    """
+    Hands out integer ids backed by the `counters` collection.
+
+    With a block size of 1 every id costs one `$inc` round-trip. Larger
+    block sizes lease a range of ids per worker process and serve them
+    from memory until the range is exhausted; ids stay unique across
+    workers but are only roughly ordered by insertion time.
+    """
+
+    def __init__(self, default_block_size: int = DEFAULT_BLOCK_SIZE, block_sizes: dict = None):
+        self.default_block_size = max(1, default_block_size)
+        self.block_sizes = dict(block_sizes or {})
+        self._lock = threading.Lock()
+        self._async_lock = None
+        self._blocks = {}
+        self._seeded = set()
+        self._pid = os.getpid()
+
+    def block_size(self, collection: str) -> int:
+        return self.block_sizes.get(collection, self.default_block_size)
+
+    def _check_fork(self):
+        # Leased ranges must never be shared with a forked worker.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._blocks.clear()
+            self._seeded.clear()
+            self._async_lock = None
+
+    def _ensure_seeded(self, db, collection: str):
+        if collection not in self._seeded:
+            _seed_counter(db, collection)
+            self._seeded.add(collection)
+
+    def next_id(self, db, collection: str) -> int:
+        with self._lock:
+            self._check_fork()
+            self._ensure_seeded(db, collection)
+
+            new_id = self._take(collection)
+            if new_id is None:
+                first, last = reserve_block(db, collection, self.block_size(collection))
+                self._blocks[collection] = [first + 1, last]
+                new_id = first
+            return new_id
+
+    def next_ids(self, db, collection: str, count: int) -> list:
+        """
+        Reserve `count` ids in a single round-trip, for bulk inserts.
+        """
+        if count <= 0:
+            return []
+        with self._lock:
+            self._check_fork()
+            self._ensure_seeded(db, collection)
+        first, last = reserve_block(db, collection, count)
+        return list(range(first, last + 1))
+
+    def _take(self, collection: str):
+        block = self._blocks.get(collection)
+        if block is None or block[0] > block[1]:
+            return None
+        new_id = block[0]
+        block[0] += 1
+        return new_id
+
+    async def next_id_async(self, db, collection: str) -> int:
+        # The blocks are shared with next_id, which runs on threadpool
+        # threads, so every read and write of them takes the thread lock.
+        # It is only held by a thread across a refill round-trip.
+        with self._lock:
+            self._check_fork()
+            new_id = self._take(collection)
+        if new_id is not None:
+            return new_id
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            with self._lock:
+                new_id = self._take(collection)
+            if new_id is not None:
+                return new_id
+            if collection not in self._seeded:
+                await _seed_counter_async(db, collection)
+                self._seeded.add(collection)
+            first, last = await reserve_block_async(db, collection, self.block_size(collection))
+            with self._lock:
+                self._blocks[collection] = [first + 1, last]
+            return first
+
+    async def next_ids_async(self, db, collection: str, count: int) -> list:
+        if count <= 0:
+            return []
+        self._check_fork()
+        if collection not in self._seeded:
+            await _seed_counter_async(db, collection)
+            self._seeded.add(collection)
+        first, last = await reserve_block_async(db, collection, count)
+        return list(range(first, last + 1))
+
+
+allocator = IdAllocator(block_sizes=BLOCK_SIZES)
+
+
+def next_id(db, collection: str) -> int:
+    return allocator.next_id(db, collection)
+
+
+def next_ids(db, collection: str, count: int) -> list:
+    return allocator.next_ids(db, collection, count)
+
+
+async def next_id_async(db, collection: str) -> int:
+    return await allocator.next_id_async(db, collection)
+
+
+async def next_ids_async(db, collection: str, count: int) -> list:
+    return await allocator.next_ids_async(db, collection, count)
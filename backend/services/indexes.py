@@ -0,0 +1,177 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from . import change_log
+
+logger = logging.getLogger(__name__)
+
+# Required indexes per collection. Every lookup the routers do by `id`
+# relies on the unique id indexes; the compound orders index serves
+# per-product order history (filter on product_id, sort on order_date). The
+# (filter, id) indexes serve the filtered, keyset-paginated list endpoints,
+# and stored forecasts are read and paged by product_id. Stock history reads
+# the ledger and the snapshots by (product_id, at); the snapshot job scans
+# the ledger by time.
+INDEXES = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("supplier_id", ASCENDING), ("id", ASCENDING)], name="supplier_id_id"),
+        IndexModel([("category", ASCENDING), ("id", ASCENDING)], name="category_id"),
+    ],
+    "suppliers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("product_id", ASCENDING), ("order_date", ASCENDING)], name="product_id_order_date"),
+        IndexModel([("product_id", ASCENDING), ("id", ASCENDING)], name="product_id_id"),
+        IndexModel([("supplier_id", ASCENDING), ("id", ASCENDING)], name="supplier_id_id"),
+        IndexModel([("status", ASCENDING), ("id", ASCENDING)], name="status_id"),
+        IndexModel([("order_date", ASCENDING)], name="order_date"),
+    ],
+    "abc_classes": [
+        IndexModel([("basis", ASCENDING), ("product_id", ASCENDING)], name="basis_product_id_unique", unique=True),
+        IndexModel([("basis", ASCENDING), ("value", DESCENDING), ("product_id", ASCENDING)], name="basis_value"),
+        IndexModel(
+            [("basis", ASCENDING), ("product_category", ASCENDING), ("value", DESCENDING), ("product_id", ASCENDING)],
+            name="basis_product_category_value",
+        ),
+    ],
+    "supplier_metrics_daily": [
+        IndexModel([("supplier_id", ASCENDING), ("day", ASCENDING)], name="supplier_id_day_unique", unique=True),
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    "supplier_classifications": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "category_costs": [
+        IndexModel([("category", ASCENDING)], name="category_unique", unique=True),
+    ],
+    "forecasts": [
+        IndexModel([("product_id", ASCENDING)], name="product_id_unique", unique=True),
+    ],
+    "stock_movements": [
+        IndexModel([("product_id", ASCENDING), ("at", ASCENDING)], name="product_id_at"),
+        IndexModel([("at", ASCENDING)], name="at"),
+    ],
+    "stock_snapshots": [
+        IndexModel([("product_id", ASCENDING), ("at", DESCENDING)], name="product_id_at_unique", unique=True),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel(
+            [("email", ASCENDING)],
+            name="email_unique",
+            unique=True,
+            partialFilterExpression={"email": {"$type": "string"}},
+        ),
+    ],
+}
+
+# Representative shapes of the hot queries issued by the API. Each entry is
+# (name, collection, filter, sort).
+HOT_QUERIES = [
+    ("products by id", "products", {"id": 1}, None),
+    ("suppliers by id", "suppliers", {"id": 1}, None),
+    ("suppliers by name", "suppliers", {"name": "example"}, None),
+    ("orders by id", "orders", {"id": 1}, None),
+    ("users by username", "users", {"username": "example"}, None),
+    ("users by email", "users", {"email": "example@example.com"}, None),
+    ("forecast order history", "orders", {"product_id": 1}, [("order_date", ASCENDING)]),
+    ("stored forecast by product", "forecasts", {"product_id": 1}, None),
+    ("abc page", "abc_classes", {"basis": "stock"}, [("value", DESCENDING), ("product_id", ASCENDING)]),
+    ("abc page by category", "abc_classes", {"basis": "stock", "product_category": "example"}, [("value", DESCENDING), ("product_id", ASCENDING)]),
+    ("dashboard-stats $lookup on products.id", "products", {"id": 1}, None),
+    ("last order id", "orders", {}, [("id", DESCENDING)]),
+    ("products page by category", "products", {"category": "example", "id": {"$gt": 0}}, [("id", ASCENDING)]),
+    ("orders page by supplier", "orders", {"supplier_id": 1, "id": {"$gt": 0}}, [("id", ASCENDING)]),
+    ("stock snapshot at or before", "stock_snapshots", {"product_id": 1, "at": {"$lte": datetime(2024, 1, 1)}}, [("at", DESCENDING)]),
+    ("stock movements by product", "stock_movements", {"product_id": 1, "at": {"$gt": datetime(2024, 1, 1)}}, [("at", ASCENDING)]),
+    ("orders page by status", "orders", {"status": "Pending", "id": {"$gt": 0}}, [("id", ASCENDING)]),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every declared index, and the capped change log where it is
+    written. Failures (e.g. duplicate values preventing a unique index) are
+    logged per collection instead of aborting startup.
+    Returns {collection: [index names] or error string}.
+    """
+    results = {}
+    for collection, models in INDEXES.items():
+        try:
+            results[collection] = db[collection].create_indexes(models)
+        except PyMongoError as e:
+            logger.warning("Could not create indexes on %s: %s", collection, e)
+            results[collection] = str(e)
+    try:
+        if change_log.enabled(db):
+            change_log.ensure_collection(db)
+    except PyMongoError as e:
+        logger.warning("Could not create the %s collection: %s", change_log.CHANGE_LOG_COLLECTION, e)
+    return results
+
+
+def _plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def verify_query_plans(db):
+    """
+    Run explain() on every hot query and report the winning plan stages.
+    A query is flagged when its plan contains a COLLSCAN.
+    """
+    report = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        report.append({
+            "query": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create required indexes and verify hot query plans.")
+    parser.add_argument("--verify-only", action="store_true", help="Do not create indexes, only run explain().")
+    args = parser.parse_args(argv)
+
+    from .. import database
+
+    if not args.verify_only:
+        for collection, result in ensure_indexes(database.db).items():
+            print(f"{collection}: {result}")
+
+    report = verify_query_plans(database.db)
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"[{flag:>8}] {entry['query']} ({entry['collection']}): {' > '.join(entry['stages'])}")
+
+    return 1 if any(entry["collscan"] for entry in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from . import broadcast, dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+# Used when the server has no change streams (standalone mongod): the low
+# products are re-read every LOW_STOCK_POLL_INTERVAL seconds instead.
+LOW_STOCK_POLL_INTERVAL = float(os.getenv("LOW_STOCK_POLL_INTERVAL", "5"))
+LOW_STOCK_QUEUE_SIZE = int(os.getenv("LOW_STOCK_QUEUE_SIZE", "100"))
+
+LOW_STOCK_QUERY = {"$expr": {"$lte": ["$stock_level", "$reorder_point"]}}
+PRODUCT_FIELDS = {"_id": 1, "id": 1, "name": 1, "stock_level": 1, "reorder_point": 1}
+# Only changes that can move a product across its reorder point.
+WATCH_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.stock_level": {"$exists": True}},
+        {"updateDescription.updatedFields.reorder_point": {"$exists": True}},
+    ]}},
+]
+
+
+def _alert(product) -> dict:
+    return {
+        "product_id": product["id"],
+        "name": product.get("name"),
+        "stock_level": product["stock_level"],
+        "reorder_point": product["reorder_point"],
+    }
+
+
+class LowStockMonitor:
+    """
+    The set of products at or below their reorder point, kept in memory
+    and up to date from a change stream on products (or by polling). Every
+    change to the set is published: "low_stock" when a product enters it
+    or its stock changes while in it, "cleared" (restocked, deleted, or
+    not_low after a reload) when it leaves.
+    """
+
+    def __init__(self, broadcaster: broadcast.Broadcaster):
+        self.broadcaster = broadcaster
+        self.products = {}
+        # Document _id -> product id, as delete events only carry the _id.
+        self._keys = {}
+        self.mode = None
+        self.updated_at = None
+
+    def low_stock(self) -> list:
+        return [self.products[product_id] for product_id in sorted(self.products)]
+
+    def _set(self, key, alert: dict):
+        if self.products.get(alert["product_id"]) != alert:
+            self.products[alert["product_id"]] = alert
+            self.broadcaster.publish("low_stock", {**alert, "at": datetime.utcnow()})
+        self._keys[key] = alert["product_id"]
+
+    def _clear(self, key, product_id, reason: str):
+        self._keys.pop(key, None)
+        if self.products.pop(product_id, None) is not None:
+            self.broadcaster.publish("cleared", {"product_id": product_id, "reason": reason, "at": datetime.utcnow()})
+
+    def apply_change(self, change: dict):
+        key = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            product_id = self._keys.get(key)
+            if product_id is not None:
+                self._clear(key, product_id, "deleted")
+        else:
+            product = change.get("fullDocument")
+            # None when the product was deleted before the lookup; its
+            # delete event follows.
+            if product is not None:
+                if dashboard_stats.is_low_stock(product):
+                    self._set(key, _alert(product))
+                else:
+                    self._clear(key, product["id"], "restocked")
+        self.updated_at = datetime.utcnow()
+
+    async def load(self, db):
+        """
+        Re-read every low product and publish the differences from the
+        current set.
+        """
+        found = {}
+        async for product in db.products.find(LOW_STOCK_QUERY, PRODUCT_FIELDS):
+            found[product["_id"]] = _alert(product)
+        low = {alert["product_id"] for alert in found.values()}
+        # Deleted and restocked products look the same from here.
+        for product_id in set(self.products) - low:
+            self._clear(None, product_id, "not_low")
+        self._keys = {}
+        for key, alert in found.items():
+            self._set(key, alert)
+        self.updated_at = datetime.utcnow()
+
+    async def _watch(self, db):
+        # Opened before the initial load so no change falls in between.
+        async with await db.products.watch(WATCH_PIPELINE, full_document="updateLookup") as changes:
+            self.mode = "change_stream"
+            await self.load(db)
+            async for change in changes:
+                self.apply_change(change)
+
+    async def _poll(self, db, interval: float):
+        self.mode = "polling"
+        while True:
+            await self.load(db)
+            await asyncio.sleep(interval)
+
+    async def run(self, db, poll_interval: float = LOW_STOCK_POLL_INTERVAL):
+        """
+        Background task: follow the products change stream, or poll when
+        the server does not support change streams. Restarts (with a full
+        reload) after errors.
+        """
+        await broadcast.follow_changes(lambda: self._watch(db), lambda: self._poll(db, poll_interval), "Low-stock monitor")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "low_stock": len(self.products),
+            "updated_at": self.updated_at,
+            **self.broadcaster.stats(),
+        }
+
+
+broadcaster = broadcast.Broadcaster(LOW_STOCK_QUEUE_SIZE)
+monitor = LowStockMonitor(broadcaster)
@@ -0,0 +1,143 @@
+import argparse
+import os
+import sys
+from pymongo import UpdateOne
+
+# "normalized" stores ids plus a small snapshot on each order; "embedded"
+# additionally copies the full product and supplier documents (legacy).
+ORDER_STORAGE = os.getenv("ORDER_STORAGE", "normalized")
+
+# Fields returned for the nested product/supplier of an order. The product's
+# own embedded supplier is left out; the order carries its supplier anyway.
+PRODUCT_PROJECTION = {"_id": 0, "supplier": 0}
+SUPPLIER_PROJECTION = {"_id": 0}
+
+# Orders are read without any legacy embedded documents.
+ORDER_PROJECTION = {"product": 0, "supplier": 0}
+
+
+def order_snapshot(product, supplier) -> dict:
+    """
+    The fields captured on an order at creation time.
+    """
+    return {
+        "product_name": product["name"],
+        "unit_price": product["price"],
+        "supplier_name": supplier["name"],
+    }
+
+
+def apply_storage(order: dict, product, supplier) -> dict:
+    order.update(order_snapshot(product, supplier))
+    if ORDER_STORAGE == "embedded":
+        order["product"] = product
+        order["supplier"] = supplier
+    return order
+
+
+def _foreign_ids(orders):
+    product_ids = {o["product_id"] for o in orders if "product_id" in o}
+    supplier_ids = {o["supplier_id"] for o in orders if "supplier_id" in o}
+    return list(product_ids), list(supplier_ids)
+
+
+def attach_details(orders, products_by_id: dict, suppliers_by_id: dict):
+    """
+    Set `product` and `supplier` on each order from the lookup tables,
+    keeping a legacy embedded document when the referenced one is gone.
+    """
+    for o in orders:
+        o["product"] = products_by_id.get(o.get("product_id"), o.get("product"))
+        o["supplier"] = suppliers_by_id.get(o.get("supplier_id"), o.get("supplier"))
+    return orders
+
+
+def resolve_details(db, orders):
+    """
+    Resolve product/supplier details for a page of orders with one $in
+    query per collection.
+    """
+    product_ids, supplier_ids = _foreign_ids(orders)
+    products = db.products.find({"id": {"$in": product_ids}}, PRODUCT_PROJECTION)
+    suppliers = db.suppliers.find({"id": {"$in": supplier_ids}}, SUPPLIER_PROJECTION)
+    return attach_details(
+        orders,
+        {p["id"]: p for p in products},
+        {s["id"]: s for s in suppliers},
+    )
+
+
+async def resolve_details_async(db, orders):
+    product_ids, supplier_ids = _foreign_ids(orders)
+    products = await db.products.find({"id": {"$in": product_ids}}, PRODUCT_PROJECTION).to_list(length=None)
+    suppliers = await db.suppliers.find({"id": {"$in": supplier_ids}}, SUPPLIER_PROJECTION).to_list(length=None)
+    return attach_details(
+        orders,
+        {p["id"]: p for p in products},
+        {s["id"]: s for s in suppliers},
+    )
+
+
+def migrate_orders(db, batch_size: int = 1000, dry_run: bool = False):
+    """
+    Rewrite orders that embed full product/supplier documents into the
+    normalized shape, in id order and in batches. The embedded documents are
+    the state at order time, so the snapshot is taken from them. Safe to
+    re-run: migrated orders no longer match the filter.
+    """
+    legacy = {"$or": [{"product": {"$type": "object"}}, {"supplier": {"$type": "object"}}]}
+    migrated = 0
+    last_id = None
+
+    while True:
+        query = dict(legacy)
+        if last_id is not None:
+            query = {"$and": [legacy, {"id": {"$gt": last_id}}]}
+        batch = list(
+            db.orders.find(query, {"id": 1, "product": 1, "supplier": 1})
+            .sort("id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+        last_id = batch[-1]["id"]
+
+        requests = []
+        for o in batch:
+            snapshot = {}
+            product = o.get("product") or {}
+            supplier = o.get("supplier") or {}
+            if "name" in product:
+                snapshot["product_name"] = product["name"]
+            if "price" in product:
+                snapshot["unit_price"] = product["price"]
+            if "name" in supplier:
+                snapshot["supplier_name"] = supplier["name"]
+            update = {"$unset": {"product": "", "supplier": ""}}
+            if snapshot:
+                update["$set"] = snapshot
+            requests.append(UpdateOne({"_id": o["_id"]}, update))
+
+        if not dry_run:
+            db.orders.bulk_write(requests, ordered=False)
+        migrated += len(requests)
+
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite embedded orders into the normalized storage shape.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    from .. import database
+
+    migrated = migrate_orders(database.db, batch_size=args.batch_size, dry_run=args.dry_run)
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} orders")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+from . import change_log, dashboard_stats, forecast_cache, ids, order_details, stock_ledger, supplier_metrics
+
+# Products drawn (with $sample) per simulation request; orders are spread
+# over this working set. 0 uses the whole catalog.
+SIM_PRODUCT_SAMPLE = int(os.getenv("SIM_PRODUCT_SAMPLE", "1000"))
+SIM_BATCH_ORDERS = int(os.getenv("SIM_BATCH_ORDERS", "10000"))
+SIM_MAX_ORDERS = int(os.getenv("SIM_MAX_ORDERS", "100000"))
+# Upper bound on (product, day) intensities held at once.
+SIM_MAX_CELLS = int(os.getenv("SIM_MAX_CELLS", "2000000"))
+
+SIM_STATUSES = ["Pending", "Shipped", "Delivered"]
+MAX_QUANTITY = 20
+
+PRODUCT_FIELDS = {"_id": 0, "id": 1, "name": 1, "price": 1, "supplier_id": 1, "stock_level": 1, "reorder_point": 1}
+
+
+class InvalidSimulation(ValueError):
+    pass
+
+
+def _uniform(ids_, salt: int):
+    """
+    A uniform [0, 1) value per id (splitmix64 of id and salt), so every
+    product keeps the same demand profile across runs and processes.
+    """
+    x = ids_.astype(np.uint64) + np.uint64(salt * 0x9E3779B97F4A7C15 % 2 ** 64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(float) / 2.0 ** 53
+
+
+def demand_profiles(product_ids, trend: float, seasonality: float) -> dict:
+    """
+    Per-product demand parameters: an exponentially distributed popularity,
+    the window's trend and weekly seasonality each scaled by 0.5-1.5, and
+    a weekly phase.
+    """
+    return {
+        "popularity": -np.log1p(-_uniform(product_ids, 1)),
+        "trend": trend * (0.5 + _uniform(product_ids, 2)),
+        "seasonality": np.clip(seasonality * (0.5 + _uniform(product_ids, 3)), 0, 1),
+        "phase": 7 * _uniform(product_ids, 4),
+    }
+
+
+def demand_intensity(profiles: dict, days: list, noise: float, rng):
+    """
+    Expected orders per (product, day): popularity x linear trend over the
+    window x weekly seasonality on the calendar weekday x lognormal noise.
+    """
+    n = len(days)
+    position = np.arange(n) / max(n - 1, 1)
+    weekday = np.array([d.weekday() for d in days])
+    trend = np.clip(1 + profiles["trend"][:, None] * position, 0, None)
+    season = 1 + profiles["seasonality"][:, None] * np.sin(2 * np.pi * (weekday + profiles["phase"][:, None]) / 7)
+    shocks = rng.lognormal(0, noise, (len(profiles["popularity"]), n)) if noise > 0 else 1
+    return profiles["popularity"][:, None] * trend * season * shocks
+
+
+def _catalog(db, sample: int):
+    """
+    Product arrays for the working set: a $sample of `sample` products, or
+    the whole catalog when sample is 0 or covers it.
+    """
+    if sample and sample < db.products.estimated_document_count():
+        cursor = db.products.aggregate([{"$sample": {"size": sample}}, {"$project": PRODUCT_FIELDS}])
+    else:
+        cursor = db.products.find({}, PRODUCT_FIELDS)
+    products = list(cursor)
+    suppliers = {s["id"]: s for s in db.suppliers.find({}, order_details.SUPPLIER_PROJECTION)} if products else {}
+    return products, suppliers
+
+
+def _orders(products, suppliers, supplier_ids, product_index, day_index, days, statuses, quantities, seconds, first_id, now):
+    """
+    Order documents for the drawn (product, day) pairs.
+    """
+    docs = []
+    for i, d, status, quantity, offset, new_id in zip(product_index, day_index, statuses, quantities, seconds, range(first_id, first_id + len(product_index))):
+        product = products[i]
+        supplier = suppliers.get(product.get("supplier_id")) or suppliers[supplier_ids[new_id % len(supplier_ids)]]
+        order_date = min(days[d] + timedelta(seconds=int(offset)), now)
+        order = {
+            "id": new_id,
+            "product_id": product["id"],
+            "supplier_id": supplier["id"],
+            "quantity": int(quantity),
+            "status": SIM_STATUSES[status],
+            "order_date": order_date,
+            "status_history": [{"status": SIM_STATUSES[status], "at": order_date}],
+        }
+        docs.append(order_details.apply_storage(order, product, supplier))
+    return docs
+
+
+def simulate_orders(db, count: int, days: int = 30, trend: float = 0.0, seasonality: float = 0.3, noise: float = 0.2,
+                    seed: int = None, sample: int = SIM_PRODUCT_SAMPLE, batch_size: int = SIM_BATCH_ORDERS) -> dict:
+    """
+    Generate `count` orders dated over the last `days` days and insert
+    them in batches. Orders are spread over the products in proportion to
+    each product's demand intensity; products' own suppliers are used
+    where they exist. Shipped and Delivered orders add their quantity to
+    the product's stock through the stock ledger, as the single-order
+    simulator does.
+    """
+    if count <= 0 or days <= 0:
+        raise InvalidSimulation("count and days must be positive")
+    if trend < -1 or not 0 <= seasonality <= 1 or noise < 0:
+        raise InvalidSimulation("trend must be >= -1, seasonality between 0 and 1 and noise >= 0")
+    products, suppliers = _catalog(db, sample)
+    if not products or not suppliers:
+        raise InvalidSimulation("No products or suppliers to simulate orders with.")
+
+    rng = np.random.default_rng(seed)
+    noise_seed = int(rng.integers(2 ** 63))
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    window = [today - timedelta(days=days - 1 - d) for d in range(days)]
+    product_ids = np.array([p["id"] for p in products])
+    prices = np.array([p["price"] for p in products], dtype=float)
+    supplier_ids = sorted(suppliers)
+
+    # The (products x days) intensities are built one block of products at
+    # a time; each block's noise has its own seed so the block can be
+    # rebuilt instead of kept.
+    block = max(1, SIM_MAX_CELLS // days)
+    blocks = [(first, min(first + block, len(products))) for first in range(0, len(products), block)]
+
+    def intensity(index):
+        first, last = blocks[index]
+        profiles = demand_profiles(product_ids[first:last], trend, seasonality)
+        return demand_intensity(profiles, window, noise, np.random.default_rng([noise_seed, index])).ravel()
+
+    totals = np.array([intensity(i).sum() for i in range(len(blocks))]) if len(blocks) > 1 else np.ones(1)
+    per_block = rng.multinomial(count, totals / totals.sum())
+
+    stock = np.zeros(len(products), dtype=np.int64)
+    revenue = 0.0
+    id_range = []
+    for index, block_count in enumerate(per_block.tolist()):
+        if not block_count:
+            continue
+        offset = blocks[index][0]
+        probabilities = intensity(index)
+        probabilities /= probabilities.sum()
+        for start in range(0, block_count, batch_size):
+            size = min(batch_size, block_count - start)
+            first_id = ids.next_ids(db, "orders", size)[0]
+            id_range = [id_range[0] if id_range else first_id, first_id + size - 1]
+            cells = np.repeat(np.arange(len(probabilities)), rng.multinomial(size, probabilities))
+            rng.shuffle(cells)
+            product_index = offset + cells // days
+            statuses = rng.integers(0, len(SIM_STATUSES), size)
+            quantities = rng.integers(1, MAX_QUANTITY + 1, size)
+            docs = _orders(products, suppliers, supplier_ids, product_index, cells % days, window, statuses, quantities,
+                           rng.integers(0, 86400, size), first_id, now)
+            db.orders.insert_many(docs, ordered=False)
+            supplier_metrics.record_orders_bulk(db, docs)
+            forecast_cache.record_orders(db, product_ids[product_index].tolist())
+            change_log.record_orders(db, docs)
+
+            revenue += float((quantities * prices[product_index]).sum())
+            stocked = np.isin(statuses, [i for i, s in enumerate(SIM_STATUSES) if s in supplier_metrics.STOCKED_STATUSES])
+            np.add.at(stock, product_index[stocked], quantities[stocked])
+            stock_ledger.apply_movements(db, [
+                stock_ledger.movement(doc["product_id"], "receipt", doc["quantity"], order_id=doc["id"])
+                for doc, is_stocked in zip(docs, stocked.tolist()) if is_stocked
+            ])
+
+    low_stock_delta = 0
+    changed = np.flatnonzero(stock)
+    if len(changed):
+        before = [products[i] for i in changed]
+        after = [{**p, "stock_level": p["stock_level"] + int(stock[i])} for p, i in zip(before, changed)]
+        low_stock_delta = sum(map(dashboard_stats.is_low_stock, after)) - sum(map(dashboard_stats.is_low_stock, before))
+    dashboard_stats.record_orders_bulk(db, revenue, low_stock_delta, stock_changed=bool(len(changed)))
+
+    return {
+        "orders": count,
+        "first_id": id_range[0],
+        "last_id": id_range[1],
+        "products": len(products),
+        "start": window[0],
+        "end": now,
+        "revenue": round(revenue, 2),
+        "stock_updates": len(changed),
+    }
+
+
+def seed_catalog(db, suppliers: int, products: int, seed: int = None, categories: int = 20) -> dict:
+    """
+    Insert synthetic suppliers and products (for benchmark datasets).
+    """
+    rng = np.random.default_rng(seed)
+    supplier_docs = [
+        {"id": new_id, "name": f"Supplier {new_id}", "reliability_score": round(float(score), 1), "lead_time_days": int(lead)}
+        for new_id, score, lead in zip(ids.next_ids(db, "suppliers", suppliers), rng.uniform(1, 5, suppliers), rng.integers(2, 21, suppliers))
+    ]
+    if supplier_docs:
+        db.suppliers.insert_many(supplier_docs, ordered=False)
+        dashboard_stats.record_suppliers_bulk(db, len(supplier_docs))
+    supplier_ids = [s["id"] for s in db.suppliers.find({}, {"_id": 0, "id": 1})]
+
+    for start in range(0, products, SIM_BATCH_ORDERS):
+        size = min(SIM_BATCH_ORDERS, products - start)
+        docs = [
+            {"id": new_id, "name": f"Product {new_id}", "category": f"Category {category}", "price": round(float(price), 2),
+             "stock_level": int(stock), "reorder_point": int(reorder), "supplier_id": supplier_ids[supplier]}
+            for new_id, category, price, stock, reorder, supplier in zip(
+                ids.next_ids(db, "products", size), rng.integers(0, categories, size), rng.lognormal(3, 1, size),
+                rng.integers(0, 500, size), rng.integers(10, 100, size), rng.integers(0, len(supplier_ids), size),
+            )
+        ]
+        db.products.insert_many(docs, ordered=False)
+        dashboard_stats.record_products_bulk(db, docs)
+    return {"suppliers": len(supplier_docs), "products": products}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic catalog and simulated order history.")
+    parser.add_argument("--suppliers", type=int, default=0, help="suppliers to create first")
+    parser.add_argument("--products", type=int, default=0, help="products to create first")
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--trend", type=float, default=0.0, help="demand growth over the window, e.g. 0.2 for +20%%")
+    parser.add_argument("--seasonality", type=float, default=0.3, help="weekly amplitude, 0-1")
+    parser.add_argument("--noise", type=float, default=0.2, help="sigma of the daily lognormal noise")
+    parser.add_argument("--sample", type=int, default=0, help="products per working set (0: whole catalog)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from .. import database
+
+    if args.suppliers or args.products:
+        print(seed_catalog(database.db, args.suppliers, args.products, args.seed))
+    if args.orders:
+        print(simulate_orders(database.db, args.orders, args.days, args.trend, args.seasonality, args.noise, args.seed, args.sample))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
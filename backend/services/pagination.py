@@ -0,0 +1,82 @@
+import base64
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def model_fields(model) -> set:
+    fields = getattr(model, "model_fields", None)
+    if fields is None:
+        fields = model.__fields__
+    return set(fields)
+
+
+def parse_fields(fields: str, allowed: set):
+    """
+    Turn a comma separated `fields=` value into a Mongo projection.
+    Returns None when no projection was requested. `id` is always included
+    because it is the pagination key.
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - allowed
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {name: 1 for name in requested}
+    projection["id"] = 1
+    projection["_id"] = 0
+    return projection
+
+
+async def fetch_page(collection, query: dict, limit: int, cursor: str = None, skip: int = 0, projection: dict = None, key: str = "id"):
+    """
+    Fetch one page ordered by `key` (a unique integer field, `id` unless
+    the collection is keyed by something else). With a cursor the page
+    starts after the cursor's key (keyset pagination); without one `skip`
+    is honoured for backwards compatibility. Returns (documents, next_cursor).
+    """
+    query = dict(query)
+    if cursor:
+        query[key] = {"$gt": decode_cursor(cursor)}
+        skip = 0
+
+    find = collection.find(query, projection).sort(key, 1)
+    if skip:
+        find = find.skip(skip)
+    docs = await find.limit(limit + 1).to_list(length=None)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1][key])
+    return docs, next_cursor
+
+
+def partial_response(docs, next_cursor: str = None):
+    """
+    Response for projected documents, which would not validate against the
+    full response models.
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return JSONResponse(content=jsonable_encoder(docs), headers=headers)
@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Tuple
+
+BATCH_SIZE = 1000
+
+ORDER_COLUMNS = ["Order ID", "Product", "Quantity", "Date", "Status", "Supplier"]
+INVENTORY_COLUMNS = ["ID", "Name", "Category", "Price", "Stock", "Reorder Point", "Supplier"]
+
+# Only the fields the reports print, plus the names of any legacy embedded
+# documents as a fallback for deleted products/suppliers.
+ORDER_REPORT_PROJECTION = {
+    "_id": 0, "id": 1, "product_id": 1, "supplier_id": 1, "quantity": 1,
+    "order_date": 1, "status": 1, "product_name": 1, "supplier_name": 1,
+    "product.name": 1, "supplier.name": 1,
+}
+INVENTORY_REPORT_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "category": 1, "price": 1,
+    "stock_level": 1, "reorder_point": 1, "supplier_id": 1, "supplier.name": 1,
+}
+
+
+@dataclass
+class ReportDataset:
+    name: str
+    title: str
+    columns: List[str]
+    rows: Callable[[], Iterable[dict]]
+    # Collections whose contents end up in the report; the first one has
+    # one document per row.
+    sources: Tuple[str, ...] = ()
+
+
+def _batches(cursor, size: int):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _names_by_id(collection, ids) -> dict:
+    """
+    One bulk query resolving {id: name} for a batch of foreign keys.
+    """
+    ids = list({i for i in ids if i is not None})
+    if not ids:
+        return {}
+    return {doc["id"]: doc["name"] for doc in collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "name": 1})}
+
+
+def _embedded_name(doc, field: str):
+    embedded = doc.get(field)
+    return embedded.get("name") if isinstance(embedded, dict) else None
+
+
+def order_rows(db, batch_size: int = BATCH_SIZE):
+    cursor = db.orders.find({}, ORDER_REPORT_PROJECTION, batch_size=batch_size)
+    for batch in _batches(cursor, batch_size):
+        products = _names_by_id(db.products, (o.get("product_id") for o in batch))
+        suppliers = _names_by_id(db.suppliers, (o.get("supplier_id") for o in batch))
+        for o in batch:
+            yield {
+                "Order ID": o["id"],
+                "Product": products.get(o.get("product_id")) or o.get("product_name") or _embedded_name(o, "product") or "N/A",
+                "Quantity": o["quantity"],
+                "Date": o["order_date"].strftime("%Y-%m-%d"),
+                "Status": o["status"],
+                "Supplier": suppliers.get(o.get("supplier_id")) or o.get("supplier_name") or _embedded_name(o, "supplier") or "N/A",
+            }
+
+
+def inventory_rows(db, batch_size: int = BATCH_SIZE):
+    cursor = db.products.find({}, INVENTORY_REPORT_PROJECTION, batch_size=batch_size)
+    for batch in _batches(cursor, batch_size):
+        suppliers = _names_by_id(db.suppliers, (p.get("supplier_id") for p in batch))
+        for p in batch:
+            yield {
+                "ID": p["id"],
+                "Name": p["name"],
+                "Category": p["category"],
+                "Price": p["price"],
+                "Stock": p["stock_level"],
+                "Reorder Point": p["reorder_point"],
+                "Supplier": suppliers.get(p.get("supplier_id")) or _embedded_name(p, "supplier") or "N/A",
+            }
+
+
+def orders_dataset(db) -> ReportDataset:
+    return ReportDataset("orders", "Orders Report", ORDER_COLUMNS, lambda: order_rows(db), ("orders", "products", "suppliers"))
+
+
+def inventory_dataset(db) -> ReportDataset:
+    return ReportDataset("inventory", "Inventory Report", INVENTORY_COLUMNS, lambda: inventory_rows(db), ("products", "suppliers"))
+
+
+DATASETS = {
+    "orders": orders_dataset,
+    "inventory": inventory_dataset,
+}
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from . import dashboard_stats, report_datasets, reporting
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = os.getenv("REPORT_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "scm_reports"))
+JOBS_DIR = os.path.join(ARTIFACT_DIR, "jobs")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+PROGRESS_EVERY = 1000
+# Every write changes the collection versions, so each export of a busy
+# dataset is a new artifact. Only the newest one per dataset, format and
+# compression is kept for good; older ones live this many seconds, long
+# enough for their jobs to be downloaded.
+ARTIFACT_MAX_AGE = int(os.getenv("REPORT_ARTIFACT_MAX_AGE", "3600"))
+# Job files (and leftover partial renders) are removed this many seconds
+# after their last update.
+JOB_TTL = int(os.getenv("REPORT_JOB_TTL", "86400"))
+PRUNE_INTERVAL = 60
+# Artifacts written directly into ARTIFACT_DIR by earlier versions.
+_UNGROUPED_ARTIFACT = re.compile(r"[0-9a-f]{64}\.")
+
+FORMATS = {
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "pdf": ("pdf", "application/pdf"),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_active = {}
+_last_prune = 0.0
+
+
+class InvalidReportRequest(ValueError):
+    pass
+
+
+def _get_executor():
+    # Spawned rather than forked: the API process holds Mongo clients and
+    # threads that must not be copied into the workers.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard(executor):
+    """
+    Drop a pool broken by a dead worker (e.g. OOM-killed) so the next call
+    starts a new one; a broken pool fails every call submitted to it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _save_job(job: dict):
+    """
+    Job state lives on disk so any API worker process can answer polls.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    tmp = _job_path(job["id"]) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f, default=str)
+    os.replace(tmp, _job_path(job["id"]))
+
+
+def _update_job(job_id: str, **changes):
+    job = get_job(job_id)
+    if job is None:
+        return
+    job.update(changes)
+    _save_job(job)
+
+
+def get_job(job_id: str):
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def artifact_key(dataset: str, format: str, compress: bool, version: dict) -> str:
+    payload = json.dumps(
+        {"dataset": dataset, "format": format, "compress": compress, "version": version},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def artifact_filename(job: dict) -> str:
+    extension = FORMATS[job["format"]][0]
+    if job["compress"]:
+        extension += ".gz"
+    return f"{job['dataset']}.{extension}"
+
+
+def artifact_path(job: dict) -> str:
+    """
+    Artifacts are grouped in one directory per dataset, format and
+    compression, named after the download (e.g. orders.csv.gz/).
+    """
+    group = artifact_filename(job)
+    extension = group.split(".", 1)[1]
+    return os.path.join(ARTIFACT_DIR, group, f"{job['key']}.{extension}")
+
+
+def media_type(job: dict) -> str:
+    return "application/gzip" if job["compress"] else FORMATS[job["format"]][1]
+
+
+def _counted(rows, job_id: str, total: int):
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_EVERY == 0:
+            _update_job(job_id, progress={"rows": done, "total": total})
+    _update_job(job_id, progress={"rows": done, "total": total})
+
+
+def render_job(job_id: str):
+    """
+    Worker entry point: render the job's dataset to its artifact path.
+    Runs in a spawned process with its own Mongo client.
+    """
+    from .. import database
+
+    job = get_job(job_id)
+    _update_job(job_id, status="running", started_at=datetime.utcnow())
+
+    dataset = report_datasets.DATASETS[job["dataset"]](database.db)
+    total = database.db[dataset.sources[0]].estimated_document_count()
+    rows = _counted(dataset.rows(), job_id, total)
+
+    path = artifact_path(job)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{job_id}.part"
+    try:
+        with open(tmp, "wb") as f:
+            if job["format"] == "pdf":
+                reporting.render_pdf(dataset.columns, rows, dataset.title, f)
+            else:
+                if job["format"] == "excel":
+                    chunks = reporting.stream_xlsx(dataset.columns, rows)
+                else:
+                    chunks = reporting.stream_csv(dataset.columns, rows, compress=job["compress"])
+                for chunk in chunks:
+                    f.write(chunk)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    _update_job(job_id, status="completed", finished_at=datetime.utcnow())
+
+
+def _files(directory: str):
+    """
+    (mtime, path) of the files in `directory`, oldest first.
+    """
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    files = []
+    for entry in entries:
+        try:
+            if entry.is_file():
+                files.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            pass
+    return sorted(files)
+
+
+def _remove(path: str) -> int:
+    # Other API processes prune the same directories.
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def prune(now: float = None) -> dict:
+    """
+    Delete artifacts superseded for longer than ARTIFACT_MAX_AGE (the
+    newest of each group is what unchanged data is served from, so it
+    stays), partial renders and job files older than JOB_TTL, except the
+    files of jobs in flight in this process. Returns the counts removed.
+    """
+    now = time.time() if now is None else now
+    removed = {"artifacts": 0, "jobs": 0}
+    for group in os.listdir(ARTIFACT_DIR) if os.path.isdir(ARTIFACT_DIR) else []:
+        directory = os.path.join(ARTIFACT_DIR, group)
+        if directory == JOBS_DIR or not os.path.isdir(directory):
+            continue
+        files = _files(directory)
+        partial = [(mtime, path) for mtime, path in files if path.endswith(".part")]
+        artifacts = [(mtime, path) for mtime, path in files if not path.endswith(".part")]
+        for mtime, path in artifacts[:-1]:
+            if now - mtime > ARTIFACT_MAX_AGE:
+                removed["artifacts"] += _remove(path)
+        for mtime, path in partial:
+            if now - mtime > JOB_TTL:
+                _remove(path)
+
+    for mtime, path in _files(ARTIFACT_DIR):
+        if _UNGROUPED_ARTIFACT.match(os.path.basename(path)) and now - mtime > ARTIFACT_MAX_AGE:
+            removed["artifacts"] += _remove(path)
+
+    in_flight = {_job_path(job_id) for job_id in _active.values()}
+    for mtime, path in _files(JOBS_DIR):
+        if now - mtime > JOB_TTL and path not in in_flight:
+            removed["jobs"] += _remove(path)
+    return removed
+
+
+def _prune_periodically():
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    try:
+        prune(now)
+    except OSError:
+        logger.exception("Pruning report artifacts failed")
+
+
+def _on_done(job_id: str, key: str, executor, future):
+    _active.pop(key, None)
+    error = future.exception()
+    if isinstance(error, BrokenProcessPool):
+        _discard(executor)
+    if error is not None:
+        logger.error("Report job %s failed: %s", job_id, error)
+        _update_job(job_id, status="failed", error=str(error), finished_at=datetime.utcnow())
+
+
+def submit(db, dataset: str, format: str, compress: bool = False) -> dict:
+    """
+    Queue an export. Identical requests against unchanged data are answered
+    from the cached artifact, and identical requests already in flight share
+    one job.
+    """
+    if dataset not in report_datasets.DATASETS:
+        raise InvalidReportRequest(f"Unknown dataset. Use one of: {', '.join(report_datasets.DATASETS)}.")
+    if format not in FORMATS:
+        raise InvalidReportRequest(f"Invalid format. Use one of: {', '.join(FORMATS)}.")
+    compress = compress and format == "csv"
+    _prune_periodically()
+
+    sources = report_datasets.DATASETS[dataset](db).sources
+    version = dashboard_stats.collection_version(db, sources)
+    key = artifact_key(dataset, format, compress, version)
+
+    if key in _active:
+        job = get_job(_active[key])
+        if job is not None:
+            return job
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "dataset": dataset,
+        "format": format,
+        "compress": compress,
+        "key": key,
+        "status": "queued",
+        "cached": False,
+        "progress": {"rows": 0, "total": None},
+        "created_at": datetime.utcnow(),
+    }
+
+    if os.path.exists(artifact_path(job)):
+        job.update(status="completed", cached=True, finished_at=datetime.utcnow())
+        _save_job(job)
+        return get_job(job["id"])
+
+    _save_job(job)
+    for attempt in range(2):
+        executor = _get_executor()
+        try:
+            future = executor.submit(render_job, job["id"])
+            break
+        except BrokenProcessPool:
+            _discard(executor)
+            if attempt:
+                _update_job(job["id"], status="failed", error="Report workers unavailable", finished_at=datetime.utcnow())
+                raise
+    # Only once submitted, so a failed submit never leaves identical
+    # requests waiting on a job that will not run.
+    _active[key] = job["id"]
+    future.add_done_callback(lambda f: _on_done(job["id"], key, executor, f))
+    return get_job(job["id"])
@@ -1,45 +1,271 @@
-import pandas as pd
+import csv
+import io
+import math
+import re
+import zipfile
+import zlib
 from io import BytesIO
+from itertools import islice
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
-def generate_excel(data: list, filename: str):
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Sheet1')
-    output.seek(0)
-    return output
+PDF_FONT = 'Helvetica'
+PDF_HEADER_FONT = 'Helvetica-Bold'
+PDF_FONT_SIZE = 10
+PDF_ROW_HEIGHT = 18
+PDF_HEADER_HEIGHT = 26
+PDF_CELL_PADDING = 12
+PDF_WIDTH_SAMPLE_ROWS = 500
+
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), PDF_HEADER_FONT),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def _pdf_column_widths(columns, sample, available_width):
+    """
+    Widths from the header and a sample of rows, scaled down to the frame
+    when they do not fit. Fixed widths let reportlab skip measuring every
+    cell of every table.
+    """
+    widths = []
+    for i, col in enumerate(columns):
+        width = stringWidth(col, PDF_HEADER_FONT, PDF_FONT_SIZE)
+        for values in sample:
+            width = max(width, stringWidth(values[i], PDF_FONT, PDF_FONT_SIZE))
+        widths.append(width + PDF_CELL_PADDING)
+    total = sum(widths)
+    if total > available_width:
+        widths = [w * available_width / total for w in widths]
+    return widths
+
+
+def _pdf_fit(text, width):
+    # Cells are single-line with a fixed row height, so anything wider than
+    # its column is truncated rather than spilling into the next one.
+    limit = width - PDF_CELL_PADDING
+    if stringWidth(text, PDF_FONT, PDF_FONT_SIZE) <= limit:
+        return text
+    while text and stringWidth(text + '\u2026', PDF_FONT, PDF_FONT_SIZE) > limit:
+        text = text[:-1]
+    return text + '\u2026'
+
+
+class _PagedRows(Flowable):
+    """
+    A table over an iterator of rows that lays out one page at a time.
+    Each split takes the rows that fit the space left on the page and
+    returns them as a Table with the header repeated, followed by a
+    _PagedRows for the rest, so only the current page's cells are alive.
+    """
+
+    def __init__(self, columns, rows, sample, col_widths=None):
+        super().__init__()
+        self.columns = columns
+        self.rows = rows
+        self.sample = sample
+        self.col_widths = col_widths
+
+    def wrap(self, availWidth, availHeight):
+        # Always taller than the space left, so the frame asks for a split.
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        count = int((availHeight - PDF_HEADER_HEIGHT) // PDF_ROW_HEIGHT)
+        if count < 1:
+            return []
+        if self.col_widths is None:
+            self.col_widths = _pdf_column_widths(self.columns, self.sample, availWidth)
+        page = self.sample[:count]
+        page += islice(self.rows, count - len(page))
+        cells = [self.columns] + [[_pdf_fit(value, w) for value, w in zip(values, self.col_widths)] for values in page]
+        table = Table(cells, colWidths=self.col_widths, rowHeights=[PDF_HEADER_HEIGHT] + [PDF_ROW_HEIGHT] * len(page), repeatRows=1)
+        table.setStyle(PDF_TABLE_STYLE)
+        # Peek, so the last page does not leave an empty flowable behind.
+        rest = self.sample[count:] or list(islice(self.rows, 1))
+        if not rest:
+            return [table]
+        return [table, _PagedRows(self.columns, self.rows, rest, self.col_widths)]
 
-def generate_pdf(data: list, title: str):
-    output = BytesIO()
+    def draw(self):
+        pass
+
+
+def render_pdf(columns, rows, title: str, output=None, sample_rows: int = PDF_WIDTH_SAMPLE_ROWS):
+    """
+    Render rows (dicts keyed by column) as a paginated table. Rows are
+    consumed one page at a time: each page is its own Table with the header
+    repeated and column widths computed from the first sample_rows rows.
+    """
+    output = output if output is not None else BytesIO()
     doc = SimpleDocTemplate(output, pagesize=letter)
-    elements = []
-    
     styles = getSampleStyleSheet()
-    elements.append(Paragraph(title, styles['Title']))
-    
-    if not data:
-        elements.append(Paragraph("No data available", styles['Normal']))
-    else:
-        headers = list(data[0].keys())
-        table_data = [headers] + [[str(row[col]) for col in headers] for row in data]
-        
-        t = Table(table_data)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(t)
-    
-    doc.build(elements)
-    output.seek(0)
+
+    rows = ([str(row.get(col, '')) for col in columns] for row in rows)
+    sample = list(islice(rows, sample_rows))
+    body = _PagedRows(columns, rows, sample) if sample else Paragraph("No data available", styles['Normal'])
+    doc.build([Paragraph(title, styles['Title']), body])
+
+    if isinstance(output, BytesIO):
+        output.seek(0)
     return output
+
+
+STREAM_BATCH_ROWS = 1000
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Non-seekable file object collecting written bytes until drained.
+    zipfile writes data descriptors instead of seeking back on such files.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(ref: str, value) -> str:
+    # Excel has no NaN or infinity; a sheet containing them will not open.
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return f'<c r="{ref}"/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row_number: int, letters: list, values) -> str:
+    cells = "".join(_xlsx_cell(f"{letter}{row_number}", value) for letter, value in zip(letters, values))
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def stream_xlsx(columns: list, rows, batch_rows: int = STREAM_BATCH_ROWS):
+    """
+    Yield an .xlsx workbook as it is produced. `rows` is any iterable of
+    dicts keyed by `columns`; only one batch of rows is held in memory.
+    """
+    sink = _ChunkSink()
+    letters = [_column_letter(i) for i in range(len(columns))]
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(1, letters, columns).encode())
+
+            buffer = []
+            for row_number, row in enumerate(rows, start=2):
+                buffer.append(_xlsx_row(row_number, letters, [row.get(col) for col in columns]))
+                if len(buffer) >= batch_rows:
+                    sheet.write("".join(buffer).encode())
+                    buffer = []
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            if buffer:
+                sheet.write("".join(buffer).encode())
+            sheet.write(b"</sheetData></worksheet>")
+
+    yield sink.drain()
+
+
+def stream_csv(columns: list, rows, compress: bool = False, batch_rows: int = STREAM_BATCH_ROWS):
+    """
+    Yield CSV (optionally gzip-compressed) in chunks of `batch_rows` rows.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+
+    def take():
+        data = text.getvalue().encode("utf-8")
+        text.seek(0)
+        text.truncate()
+        return compressor.compress(data) if compressor else data
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_rows:
+            pending = 0
+            chunk = take()
+            if chunk:
+                yield chunk
+
+    chunk = take()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import InvalidOperation
+
+from . import change_log, dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+LEDGER_COLLECTION = "stock_movements"
+SNAPSHOTS_COLLECTION = "stock_snapshots"
+# Progress of the snapshot job, kept next to the dashboard summary.
+SNAPSHOT_STATE_ID = "stock_snapshots"
+SNAPSHOT_INTERVAL = int(os.getenv("STOCK_SNAPSHOT_INTERVAL", "3600"))
+# Movements are stamped just before they are written; a snapshot only
+# covers movements at least this old so none is written behind it.
+SNAPSHOT_LAG = int(os.getenv("STOCK_SNAPSHOT_LAG", "60"))
+SNAPSHOT_BATCH = 10000
+HISTORY_LIMIT = 1000
+
+# Quantities are signed stock deltas: receipts add, sales remove and
+# adjustments go either way.
+MOVEMENT_TYPES = ("receipt", "sale", "adjustment")
+
+# Set to False the first time the server turns down a client-level bulk
+# write (MongoDB < 8.0); the ledger and the products are then written with
+# one bulk operation each.
+_client_bulk_write = True
+
+
+class InvalidMovement(ValueError):
+    pass
+
+
+def movement(product_id: int, movement_type: str, quantity: int, at: datetime = None, **reference) -> dict:
+    """
+    A ledger entry. `reference` holds what caused it, e.g. order_id or
+    reason; None values are dropped.
+    """
+    if movement_type not in MOVEMENT_TYPES:
+        raise InvalidMovement(f"Invalid movement type. Use one of: {', '.join(MOVEMENT_TYPES)}.")
+    doc = {"product_id": product_id, "type": movement_type, "quantity": int(quantity), "at": at or datetime.utcnow()}
+    doc.update((key, value) for key, value in reference.items() if value is not None)
+    return doc
+
+
+def _deltas(movements) -> dict:
+    deltas = defaultdict(int)
+    for m in movements:
+        deltas[m["product_id"]] += m["quantity"]
+    return {product_id: delta for product_id, delta in deltas.items() if delta}
+
+
+def _client_models(db, movements, deltas):
+    ledger, products = f"{db.name}.{LEDGER_COLLECTION}", f"{db.name}.products"
+    return [InsertOne(m, namespace=ledger) for m in movements] + [
+        UpdateOne({"id": product_id}, {"$inc": {"stock_level": delta}}, namespace=products) for product_id, delta in deltas.items()
+    ]
+
+
+def _stock_updates(deltas):
+    return [UpdateOne({"id": product_id}, {"$inc": {"stock_level": delta}}) for product_id, delta in deltas.items()]
+
+
+def _write_movements(db, movements: list):
+    global _client_bulk_write
+    deltas = _deltas(movements)
+    if _client_bulk_write and hasattr(db.client, "bulk_write"):
+        try:
+            db.client.bulk_write(_client_models(db, movements, deltas), ordered=True)
+            return
+        except InvalidOperation:
+            _client_bulk_write = False
+    db[LEDGER_COLLECTION].insert_many(movements, ordered=False)
+    if deltas:
+        db.products.bulk_write(_stock_updates(deltas), ordered=False)
+
+
+async def _write_movements_async(db, movements: list):
+    global _client_bulk_write
+    deltas = _deltas(movements)
+    if _client_bulk_write and hasattr(db.client, "bulk_write"):
+        try:
+            await db.client.bulk_write(_client_models(db, movements, deltas), ordered=True)
+            return
+        except InvalidOperation:
+            _client_bulk_write = False
+    await db[LEDGER_COLLECTION].insert_many(movements, ordered=False)
+    if deltas:
+        await db.products.bulk_write(_stock_updates(deltas), ordered=False)
+
+
+def apply_movements(db, movements: list):
+    """
+    Append `movements` to the ledger and $inc each product's stock by its
+    net delta, in one client-level bulk write where the server supports it.
+    The ledger is written first: if the stock update fails, the snapshots
+    (built from the ledger) still hold the intended levels.
+    """
+    if movements:
+        _write_movements(db, movements)
+        change_log.record_stock(db, [m["product_id"] for m in movements])
+
+
+async def apply_movements_async(db, movements: list):
+    """
+    apply_movements with the async client.
+    """
+    if movements:
+        await _write_movements_async(db, movements)
+        await change_log.record_stock_async(db, [m["product_id"] for m in movements])
+
+
+def record_movements(db, movements: list):
+    """
+    Ledger only, for stock that was already written with the product
+    (creation, imports).
+    """
+    if movements:
+        db[LEDGER_COLLECTION].insert_many(movements, ordered=False)
+        change_log.record_stock(db, [m["product_id"] for m in movements])
+
+
+async def record_movements_async(db, movements: list):
+    if movements:
+        await db[LEDGER_COLLECTION].insert_many(movements, ordered=False)
+        await change_log.record_stock_async(db, [m["product_id"] for m in movements])
+
+
+async def apply_guarded_movement(db, entry: dict):
+    """
+    Apply a single movement, refusing to take stock below zero. Returns the
+    product before the movement, or None when the product does not exist or
+    has too little stock.
+    """
+    query = {"id": entry["product_id"]}
+    if entry["quantity"] < 0:
+        query["stock_level"] = {"$gte": -entry["quantity"]}
+    before = await db.products.find_one_and_update(query, {"$inc": {"stock_level": entry["quantity"]}}, return_document=ReturnDocument.BEFORE)
+    if before is not None:
+        await record_movements_async(db, [entry])
+    return before
+
+
+def _moved_pipeline(match: dict):
+    return [{"$match": match}, {"$group": {"_id": "$product_id", "quantity": {"$sum": "$quantity"}}}]
+
+
+def _levels_from_products(db, product_ids, cutoff: datetime) -> dict:
+    """
+    Stock at `cutoff` for products without a snapshot: current stock less
+    whatever moved after the cutoff. None means every product.
+    """
+    query = {} if product_ids is None else {"id": {"$in": product_ids}}
+    levels = {p["id"]: p["stock_level"] for p in db.products.find(query, {"_id": 0, "id": 1, "stock_level": 1})}
+    match = {"at": {"$gt": cutoff}}
+    if product_ids is not None:
+        match["product_id"] = {"$in": product_ids}
+    for moved in db[LEDGER_COLLECTION].aggregate(_moved_pipeline(match)):
+        if moved["_id"] in levels:
+            levels[moved["_id"]] -= moved["quantity"]
+    return levels
+
+
+def _latest_snapshots(db, product_ids) -> dict:
+    pipeline = [
+        {"$match": {"product_id": {"$in": product_ids}}},
+        {"$sort": {"product_id": ASCENDING, "at": DESCENDING}},
+        {"$group": {"_id": "$product_id", "stock_level": {"$first": "$stock_level"}}},
+    ]
+    return {s["_id"]: s["stock_level"] for s in db[SNAPSHOTS_COLLECTION].aggregate(pipeline)}
+
+
+def take_snapshots(db, at: datetime = None) -> dict:
+    """
+    Snapshot the stock of every product that moved since the previous run,
+    as of `at` (default: now less SNAPSHOT_LAG). Levels are carried forward
+    from each product's last snapshot through the ledger; the first run,
+    and products never snapshotted, start from the current stock.
+    Snapshots are upserts, so overlapping runs are harmless.
+    """
+    cutoff = at or datetime.utcnow() - timedelta(seconds=SNAPSHOT_LAG)
+    state = db[dashboard_stats.STATS_COLLECTION].find_one({"_id": SNAPSHOT_STATE_ID}) or {}
+    since = state.get("at")
+    if since is not None and cutoff <= since:
+        return {"at": since, "snapshots": 0}
+
+    if since is None:
+        levels = _levels_from_products(db, None, cutoff)
+    else:
+        moved = {m["_id"]: m["quantity"] for m in db[LEDGER_COLLECTION].aggregate(_moved_pipeline({"at": {"$gt": since, "$lte": cutoff}}))}
+        product_ids = list(moved)
+        levels = {}
+        for start in range(0, len(product_ids), SNAPSHOT_BATCH):
+            batch = product_ids[start:start + SNAPSHOT_BATCH]
+            previous = _latest_snapshots(db, batch)
+            levels.update((product_id, previous[product_id] + moved[product_id]) for product_id in batch if product_id in previous)
+            levels.update(_levels_from_products(db, [product_id for product_id in batch if product_id not in previous], cutoff))
+
+    items = list(levels.items())
+    for start in range(0, len(items), SNAPSHOT_BATCH):
+        db[SNAPSHOTS_COLLECTION].bulk_write([
+            UpdateOne({"product_id": product_id, "at": cutoff}, {"$set": {"stock_level": level}}, upsert=True)
+            for product_id, level in items[start:start + SNAPSHOT_BATCH]
+        ], ordered=False)
+    db[dashboard_stats.STATS_COLLECTION].update_one({"_id": SNAPSHOT_STATE_ID}, {"$set": {"at": cutoff}}, upsert=True)
+    return {"at": cutoff, "snapshots": len(items)}
+
+
+async def snapshot_periodically(db, interval: int = SNAPSHOT_INTERVAL):
+    """
+    Background task: take snapshots immediately, then every `interval`
+    seconds.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(take_snapshots, db)
+        except Exception:
+            logger.exception("Stock snapshot failed")
+        await asyncio.sleep(interval)
+
+
+async def _moved(db, product_id: int, after: datetime, until: datetime = None) -> int:
+    window = {"$gt": after}
+    if until is not None:
+        window["$lte"] = until
+    cursor = await db[LEDGER_COLLECTION].aggregate(_moved_pipeline({"product_id": product_id, "at": window}))
+    moved = await cursor.to_list(length=1)
+    return moved[0]["quantity"] if moved else 0
+
+
+async def stock_at(db, product_id: int, at: datetime):
+    """
+    Stock level of a product at `at`: the nearest snapshot at or before it
+    plus the movements since, else the next snapshot less the movements in
+    between, else the current stock less everything after. None when the
+    product has neither snapshots nor a document.
+    """
+    snapshots = db[SNAPSHOTS_COLLECTION]
+    snapshot = await snapshots.find_one({"product_id": product_id, "at": {"$lte": at}}, sort=[("at", DESCENDING)])
+    if snapshot is not None:
+        return snapshot["stock_level"] + await _moved(db, product_id, snapshot["at"], at)
+    snapshot = await snapshots.find_one({"product_id": product_id, "at": {"$gt": at}}, sort=[("at", ASCENDING)])
+    if snapshot is not None:
+        return snapshot["stock_level"] - await _moved(db, product_id, at, snapshot["at"])
+    product = await db.products.find_one({"id": product_id}, {"_id": 0, "stock_level": 1})
+    if product is None:
+        return None
+    return product["stock_level"] - await _moved(db, product_id, at)
+
+
+async def stock_history(db, product_id: int, start: datetime, end: datetime, limit: int = HISTORY_LIMIT):
+    """
+    Opening stock at `start`, the movements in (start, end] with the stock
+    level after each (the first `limit`), and the closing stock at `end`.
+    None when the product is unknown.
+    """
+    opening = await stock_at(db, product_id, start)
+    if opening is None:
+        return None
+    cursor = db[LEDGER_COLLECTION].find(
+        {"product_id": product_id, "at": {"$gt": start, "$lte": end}},
+        {"_id": 0, "product_id": 0},
+    ).sort([("at", ASCENDING), ("_id", ASCENDING)]).limit(limit + 1)
+    movements = await cursor.to_list(length=limit + 1)
+    truncated = len(movements) > limit
+    movements = movements[:limit]
+
+    level = opening
+    for m in movements:
+        level += m["quantity"]
+        m["stock_level"] = level
+    if truncated:
+        level = opening + await _moved(db, product_id, start, end)
+    return {
+        "product_id": product_id,
+        "start": start,
+        "end": end,
+        "opening_stock": opening,
+        "closing_stock": level,
+        "movements": movements,
+        "truncated": truncated,
+    }
@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import threading
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import ReplaceOne, UpdateOne
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+from . import analytics, dashboard_stats
+
+# Daily per-supplier buckets of order events, summed over a rolling window
+# when the classification is refreshed.
+METRICS_COLLECTION = "supplier_metrics_daily"
+CLASSIFICATIONS_COLLECTION = "supplier_classifications"
+MODELS_COLLECTION = "models"
+MODEL_ID = "supplier_tier"
+STATE_ID = "supplier_metrics"
+
+METRICS_WINDOW_DAYS = int(os.getenv("SUPPLIER_METRICS_WINDOW_DAYS", "90"))
+REFRESH_INTERVAL = int(os.getenv("SUPPLIER_METRICS_REFRESH_INTERVAL", "900"))
+RETRAIN_INTERVAL = int(os.getenv("SUPPLIER_MODEL_RETRAIN_INTERVAL", "86400"))
+
+ORDER_STATUSES = ["Pending", "Shipped", "Delivered", "Received", "Cancelled"]
+RECEIVED_STATUSES = {"Delivered", "Received"}
+TERMINAL_STATUSES = RECEIVED_STATUSES | {"Cancelled"}
+# Orders in these statuses are booked into stock; a Pending order is booked
+# when it moves to one of them.
+STOCKED_STATUSES = {"Shipped"} | RECEIVED_STATUSES
+
+FEATURES = ["lead_time_days", "on_time_rate", "cancel_rate", "order_volume"]
+
+_model_lock = threading.Lock()
+_model = (None, None)
+
+
+def _day(at: datetime) -> datetime:
+    return datetime(at.year, at.month, at.day)
+
+
+async def _bump(db, supplier_id, at: datetime, **counts):
+    await db[METRICS_COLLECTION].update_one(
+        {"supplier_id": supplier_id, "day": _day(at)},
+        {"$inc": counts},
+        upsert=True,
+    )
+
+
+async def record_order_created(db, order):
+    await _bump(db, order["supplier_id"], order["order_date"], orders=1, quantity=order["quantity"])
+
+
+def record_orders_bulk(db, orders):
+    """
+    record_order_created for a batch of orders, with one upsert per
+    (supplier, day) bucket.
+    """
+    buckets = {}
+    for order in orders:
+        bucket = buckets.setdefault((order["supplier_id"], _day(order["order_date"])), [0, 0])
+        bucket[0] += 1
+        bucket[1] += order["quantity"]
+    if buckets:
+        db[METRICS_COLLECTION].bulk_write([
+            UpdateOne({"supplier_id": supplier_id, "day": day}, {"$inc": {"orders": count, "quantity": quantity}}, upsert=True)
+            for (supplier_id, day), (count, quantity) in buckets.items()
+        ], ordered=False)
+
+
+async def record_status_change(db, order, status: str, at: datetime, promised_days: float):
+    """
+    Fold one status transition into the supplier's bucket for the day it
+    happened. Receipt records the lead time since the order was placed and
+    whether it arrived within the supplier's promised lead time.
+    """
+    if status in RECEIVED_STATUSES:
+        lead_time = (at - order["order_date"]).total_seconds() / 86400
+        await _bump(
+            db, order["supplier_id"], at,
+            received=1,
+            on_time=int(lead_time <= promised_days),
+            lead_time_sum=lead_time,
+        )
+    elif status == "Cancelled":
+        await _bump(db, order["supplier_id"], at, cancelled=1)
+
+
+def promised_lead_time(supplier) -> float:
+    value = (supplier or {}).get("lead_time_days")
+    return float(value) if isinstance(value, (int, float)) else analytics.DEFAULT_LEAD_TIME_DAYS
+
+
+def rolling_metrics(db, window_days: int = METRICS_WINDOW_DAYS) -> dict:
+    """
+    Sum each supplier's buckets over the window in one aggregation.
+    """
+    since = _day(datetime.utcnow()) - timedelta(days=window_days)
+    pipeline = [
+        {"$match": {"day": {"$gte": since}}},
+        {"$group": {
+            "_id": "$supplier_id",
+            "orders": {"$sum": "$orders"},
+            "quantity": {"$sum": "$quantity"},
+            "received": {"$sum": "$received"},
+            "on_time": {"$sum": "$on_time"},
+            "cancelled": {"$sum": "$cancelled"},
+            "lead_time_sum": {"$sum": "$lead_time_sum"},
+        }},
+    ]
+    return {g["_id"]: g for g in db[METRICS_COLLECTION].aggregate(pipeline)}
+
+
+def _feature_matrix(suppliers, metrics):
+    rows = []
+    for s in suppliers:
+        m = metrics.get(s["id"], {})
+        received = m.get("received", 0)
+        closed = received + m.get("cancelled", 0)
+        rows.append([
+            m.get("lead_time_sum", 0) / received if received else np.nan,
+            m.get("on_time", 0) / received if received else np.nan,
+            m.get("cancelled", 0) / closed if closed else np.nan,
+            np.log1p(m.get("orders", 0)),
+        ])
+    X = np.array(rows, dtype=float).reshape(-1, len(FEATURES))
+    # Suppliers without receipts yet are imputed at the population median.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        medians = np.nan_to_num(np.nanmedian(X, axis=0))
+    return np.where(np.isnan(X), medians, X), X
+
+
+def reliability_tier(score: float) -> str:
+    if score >= 4.0:
+        return "High Performance"
+    if score >= 2.5:
+        return "Average"
+    return "Risk"
+
+
+def train(X, labels):
+    scaler = StandardScaler().fit(X)
+    knn = KNeighborsClassifier(n_neighbors=min(3, len(X))).fit(scaler.transform(X), labels)
+    return scaler, knn
+
+
+def _save_model(db, X, labels, trained_at):
+    """
+    The model is stored as its training data, plain BSON arrays, and refit
+    on load: fitting the scaler and the KNN index is cheap next to the
+    risk of unpickling whatever is in the database.
+    """
+    db[MODELS_COLLECTION].replace_one(
+        {"_id": MODEL_ID},
+        {"_id": MODEL_ID, "features": X.tolist(), "labels": list(labels), "trained_at": trained_at},
+        upsert=True,
+    )
+
+
+def _load_model(db):
+    """
+    The persisted model, rebuilt once per training run per process. Models
+    saved in the old pickled form count as missing, so they are retrained.
+    """
+    global _model
+    doc = db[MODELS_COLLECTION].find_one({"_id": MODEL_ID, "features": {"$exists": True}}, {"trained_at": 1})
+    if doc is None:
+        return None, None
+    with _model_lock:
+        if _model[0] != doc["trained_at"]:
+            stored = db[MODELS_COLLECTION].find_one({"_id": MODEL_ID})
+            _model = (stored["trained_at"], train(np.array(stored["features"], dtype=float), stored["labels"]))
+        return _model[1], _model[0]
+
+
+def refresh(db, retrain: bool = False) -> dict:
+    """
+    Recompute rolling metrics for every supplier and classify them with
+    the persisted model, retraining it first when asked, when it is older
+    than RETRAIN_INTERVAL or when none exists. Results are stored for
+    classification reads.
+    """
+    now = datetime.utcnow()
+    suppliers = list(db.suppliers.find({}, {"_id": 0, "id": 1, "name": 1, "reliability_score": 1}))
+    metrics = rolling_metrics(db)
+    X, raw = _feature_matrix(suppliers, metrics)
+    labels = [reliability_tier(s.get("reliability_score") or 3.0) for s in suppliers]
+
+    model, trained_at = _load_model(db)
+    if suppliers and (retrain or model is None or now - trained_at > timedelta(seconds=RETRAIN_INTERVAL)):
+        model, trained_at = train(X, labels), now
+        _save_model(db, X, labels, trained_at)
+
+    predicted = model[1].predict(model[0].transform(X)) if suppliers and model is not None else []
+    docs = []
+    for s, features, tier, prediction in zip(suppliers, raw, labels, predicted):
+        m = metrics.get(s["id"], {})
+        docs.append({
+            "id": s["id"],
+            "name": s["name"],
+            "reliability_score": s.get("reliability_score"),
+            "orders": m.get("orders", 0),
+            "quantity": m.get("quantity", 0),
+            "received": m.get("received", 0),
+            "cancelled": m.get("cancelled", 0),
+            **{name: (None if np.isnan(value) else round(float(value), 3)) for name, value in zip(FEATURES[:3], features[:3])},
+            # Kept under its previous name for existing clients.
+            "delivery_time": None if np.isnan(features[0]) else round(float(features[0]), 1),
+            "tier": tier,
+            "predicted_tier": str(prediction),
+        })
+
+    if docs:
+        db[CLASSIFICATIONS_COLLECTION].bulk_write([ReplaceOne({"id": d["id"]}, d, upsert=True) for d in docs], ordered=False)
+    db[CLASSIFICATIONS_COLLECTION].delete_many({"id": {"$nin": [d["id"] for d in docs]}})
+
+    state = {"_id": STATE_ID, "refreshed_at": now, "trained_at": trained_at, "suppliers": len(docs), "window_days": METRICS_WINDOW_DAYS}
+    db[dashboard_stats.STATS_COLLECTION].replace_one({"_id": STATE_ID}, state, upsert=True)
+    return state
+
+
+def rebuild(db, promised_days: dict = None) -> int:
+    """
+    Recompute every bucket from the orders collection (order volume from
+    order dates, receipts and cancellations from status_history). For
+    orders created before status history was recorded. Returns the number
+    of buckets written.
+    """
+    if promised_days is None:
+        promised_days = {s["id"]: promised_lead_time(s) for s in db.suppliers.find({}, {"_id": 0, "id": 1, "lead_time_days": 1})}
+    buckets = {}
+
+    def bump(supplier_id, at, **counts):
+        bucket = buckets.setdefault((supplier_id, _day(at)), {})
+        for name, value in counts.items():
+            bucket[name] = bucket.get(name, 0) + value
+
+    projection = {"_id": 0, "supplier_id": 1, "order_date": 1, "quantity": 1, "status_history": 1}
+    for order in db.orders.find({"supplier_id": {"$ne": None}}, projection):
+        bump(order["supplier_id"], order["order_date"], orders=1, quantity=order["quantity"])
+        for change in order.get("status_history", [])[1:]:
+            if change["status"] in RECEIVED_STATUSES:
+                lead_time = (change["at"] - order["order_date"]).total_seconds() / 86400
+                promised = promised_days.get(order["supplier_id"], analytics.DEFAULT_LEAD_TIME_DAYS)
+                bump(order["supplier_id"], change["at"], received=1, on_time=int(lead_time <= promised), lead_time_sum=lead_time)
+            elif change["status"] == "Cancelled":
+                bump(order["supplier_id"], change["at"], cancelled=1)
+
+    db[METRICS_COLLECTION].delete_many({})
+    docs = [{"supplier_id": supplier_id, "day": day, **counts} for (supplier_id, day), counts in buckets.items()]
+    for start in range(0, len(docs), 1000):
+        db[METRICS_COLLECTION].insert_many(docs[start:start + 1000])
+    return len(docs)
+
+
+def get_classifications(db):
+    """
+    Stored classifications, refreshed first when older than
+    REFRESH_INTERVAL.
+    """
+    state = db[dashboard_stats.STATS_COLLECTION].find_one({"_id": STATE_ID})
+    if state is None or datetime.utcnow() - state["refreshed_at"] > timedelta(seconds=REFRESH_INTERVAL):
+        refresh(db)
+    return list(db[CLASSIFICATIONS_COLLECTION].find({}, {"_id": 0}).sort("id", 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild supplier metric buckets from orders and retrain the tier model.")
+    parser.parse_args(argv)
+
+    from .. import database
+
+    buckets = rebuild(database.db)
+    state = refresh(database.db, retrain=True)
+    print(f"Rebuilt {buckets} buckets and classified {state['suppliers']} suppliers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
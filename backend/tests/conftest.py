@@ -0,0 +1,110 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+# Manual scripts against a running server, not part of the suite.
+collect_ignore = ["test_upload.py", "debug_response.py"]
+
+
+# pymongo 4.9+ passes `sort` to the bulk builder, which mongomock does not
+# know about yet.
+def _drop_sort(method):
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _drop_sort(mongomock.collection.BulkOperationBuilder.add_update)
+mongomock.collection.BulkOperationBuilder.add_replace = _drop_sort(mongomock.collection.BulkOperationBuilder.add_replace)
+
+
+class AsyncCursor:
+    """
+    The parts of the async cursor API the services use, over a mongomock
+    cursor.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self.cursor = self.cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self.cursor = self.cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self.cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._docs = iter(self.cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(self.collection.aggregate(pipeline))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    """
+    A mongomock database behind the subset of the AsyncMongoClient API used
+    by the routers and services, sharing data with the sync `db`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.name = db.name
+        self.client = None
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.db[name])
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.db[name])
+
+
+@pytest.fixture
+def db():
+    from backend.services import change_log, stock_ledger
+
+    # mongomock has no client-level bulk write, and like a standalone
+    # mongod no change streams, so the change log is written.
+    stock_ledger._client_bulk_write = False
+    change_log._enabled = True
+    return mongomock.MongoClient().scm_test
+
+
+@pytest.fixture
+def async_db(db):
+    return AsyncDatabase(db)
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from backend.services import analytics, dashboard_stats
+
+
+def _values(db) -> dict:
+    results, _ = analytics.abc_analysis(db, "stock")
+    return {r["product_id"]: r["value"] for r in results}
+
+
+def test_reads_serve_the_stored_classes_until_they_are_stale(db):
+    db.products.insert_many([
+        {"id": 1, "name": "a", "category": "X", "price": 1.0, "stock_level": 90},
+        {"id": 2, "name": "b", "category": "X", "price": 1.0, "stock_level": 10},
+    ])
+    assert _values(db) == {1: 90.0, 2: 10.0}
+
+    db.products.update_one({"id": 2}, {"$set": {"stock_level": 1000}})
+    dashboard_stats.record_products_bulk(db, [])
+    assert _values(db)[2] == 10.0
+
+    # The background refresh picks the change up.
+    analytics.refresh_abc(db, "stock")
+    assert _values(db)[2] == 1000.0
+
+    db.products.update_one({"id": 1}, {"$set": {"stock_level": 5000}})
+    dashboard_stats.record_products_bulk(db, [])
+    state = {"_id": "abc_stock"}
+    stale = datetime.utcnow() - timedelta(seconds=analytics.ABC_MAX_STALENESS + 1)
+    db[dashboard_stats.STATS_COLLECTION].update_one(state, {"$set": {"refreshed_at": stale}})
+    assert _values(db)[1] == 5000.0
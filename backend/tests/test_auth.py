@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend import schemas
+from backend.core import hashing
+from backend.routers import auth
+from backend.services import ids
+
+
+@pytest.fixture
+def users(db, async_db, monkeypatch):
+    db.users.create_index("username", unique=True, name="username_unique")
+    db.users.create_index("email", unique=True, name="email_unique", partialFilterExpression={"email": {"$type": "string"}})
+
+    async def fake_hash(password):
+        return "hashed-" + password
+
+    monkeypatch.setattr(hashing, "hash_password_async", fake_hash)
+    return async_db
+
+
+def _signup(async_db, username, email):
+    return asyncio.run(auth.create_user(schemas.UserCreate(username=username, email=email, password="secret"), db=async_db))
+
+
+def test_signups_without_an_email_do_not_clash(users, db):
+    _signup(users, "ann", None)
+    _signup(users, "bob", None)
+
+    assert db.users.count_documents({}) == 2
+
+
+@pytest.mark.parametrize("username, email, detail", [
+    ("ann", "other@example.com", "Username already registered"),
+    ("bob", "ann@example.com", "Email already registered"),
+])
+def test_a_signup_that_loses_the_race_gets_the_same_400(users, db, monkeypatch, username, email, detail):
+    next_id = ids.next_id_async
+
+    async def racing_next_id(db_, collection):
+        # The other signup is inserted after this one passed the checks.
+        db.users.insert_one({"id": 99, "username": "ann", "email": "ann@example.com", "hashed_password": "x", "is_active": True})
+        return await next_id(db_, collection)
+
+    monkeypatch.setattr(ids, "next_id_async", racing_next_id)
+
+    with pytest.raises(HTTPException) as raised:
+        _signup(users, username, email)
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail == detail
+    assert db.users.count_documents({}) == 1
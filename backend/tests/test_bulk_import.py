@@ -0,0 +1,16 @@
+import io
+
+from backend.services import bulk_import, stock_ledger
+
+
+def test_imported_orders_are_history_and_leave_stock_alone(db):
+    db.suppliers.insert_one({"id": 1, "name": "Acme", "contact_email": "a@example.com", "reliability_score": 0.9})
+    db.products.insert_one({"id": 1, "name": "Bolt", "category": "Parts", "price": 2.0, "stock_level": 40, "reorder_point": 10, "supplier_id": 1})
+    source = io.BytesIO(b"product_id,supplier_id,quantity,status,order_date\n1,1,5,Delivered,2024-01-02\n1,1,3,Pending,2024-01-03\n")
+
+    result = bulk_import.import_file(db, "orders", source, "orders.csv")
+
+    assert result["inserted"] == 2
+    assert db.orders.count_documents({}) == 2
+    assert db.products.find_one({"id": 1})["stock_level"] == 40
+    assert db[stock_ledger.LEDGER_COLLECTION].count_documents({}) == 0
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from backend.services import dashboard_stats
+
+
+def _stored(db) -> dict:
+    doc = db[dashboard_stats.STATS_COLLECTION].find_one({"_id": dashboard_stats.DASHBOARD_ID}) or {}
+    return {field: doc.get(field, 0) for field in dashboard_stats.FIELDS}
+
+
+def test_increments_track_the_source_data(db, async_db):
+    async def run():
+        products = [
+            {"id": 1, "name": "a", "price": 2.0, "stock_level": 5, "reorder_point": 10},
+            {"id": 2, "name": "b", "price": 3.0, "stock_level": 50, "reorder_point": 10},
+        ]
+        for product in products:
+            db.products.insert_one(dict(product))
+            await dashboard_stats.record_product_created(async_db, product)
+        db.suppliers.insert_one({"id": 1, "name": "s"})
+        await dashboard_stats.record_supplier_created(async_db)
+
+        db.orders.insert_one({"id": 1, "product_id": 1, "quantity": 4, "unit_price": 2.0})
+        await dashboard_stats.record_order(async_db, 4, 2.0)
+        after = {**products[1], "stock_level": 1}
+        db.products.update_one({"id": 2}, {"$set": {"stock_level": 1}})
+        await dashboard_stats.record_product_updated(async_db, products[1], after)
+        db.products.delete_one({"id": 1})
+        await dashboard_stats.record_product_deleted(async_db, products[0])
+
+    asyncio.run(run())
+    db.orders.insert_one({"id": 2, "product_id": 2, "quantity": 10, "unit_price": 3.0})
+    dashboard_stats.record_orders_bulk(db, 30.0)
+
+    assert _stored(db) == pytest.approx(dashboard_stats.compute_stats(db))
+    versions = dashboard_stats.data_version(db, ["orders", "products", "suppliers"])
+    assert versions == {"orders": 2, "products": 4, "suppliers": 1}
+
+
+def test_reconcile_repairs_and_reports_drift(db):
+    db.products.insert_many([{"id": i, "price": 1.0, "stock_level": i, "reorder_point": 2} for i in range(1, 5)])
+    db.orders.insert_one({"id": 1, "product_id": 1, "quantity": 3, "unit_price": 5.0})
+    dashboard_stats.record_orders_bulk(db, 15.0)
+    dashboard_stats.record_products_bulk(db, [{"stock_level": 1, "reorder_point": 2}])
+
+    result = dashboard_stats.reconcile(db)
+    assert result["drift"] == {"total_products": 3, "low_stock_alerts": 1}
+    assert _stored(db) == result["stats"] == {"total_revenue": 15.0, "total_products": 4, "low_stock_alerts": 2, "active_suppliers": 0}
+    assert dashboard_stats.reconcile(db)["drift"] == {}
+
+
+def _order_during_reconcile(db, monkeypatch, times: int, before_scan: bool = False):
+    """
+    compute_stats that lets an order (and its increment) land right after
+    it scanned, or right before, the first `times` calls.
+    """
+    compute = dashboard_stats.compute_stats
+    calls = []
+
+    def place_order(database):
+        calls.append(1)
+        database.orders.insert_one({"id": 100 + len(calls), "product_id": 1, "quantity": 1, "unit_price": 10.0})
+        dashboard_stats.record_orders_bulk(database, 10.0)
+
+    def racing(database):
+        placing = len(calls) < times
+        if placing and before_scan:
+            place_order(database)
+        fresh = compute(database)
+        if placing and not before_scan:
+            place_order(database)
+        return fresh
+
+    monkeypatch.setattr(dashboard_stats, "compute_stats", racing)
+
+
+def test_reconcile_keeps_increments_made_during_the_recompute(db, monkeypatch):
+    db.products.insert_one({"id": 1, "price": 10.0, "stock_level": 5, "reorder_point": 1})
+    dashboard_stats.reconcile(db)
+    _order_during_reconcile(db, monkeypatch, times=1)
+
+    dashboard_stats.reconcile(db)
+    assert _stored(db)["total_revenue"] == 10.0
+
+
+def test_reconcile_leaves_the_counters_when_every_attempt_races(db, monkeypatch):
+    db.products.insert_one({"id": 1, "price": 10.0, "stock_level": 5, "reorder_point": 1})
+    dashboard_stats.record_products_bulk(db, [{"stock_level": 5, "reorder_point": 1}] * 3)
+    _order_during_reconcile(db, monkeypatch, times=dashboard_stats.RECONCILE_ATTEMPTS)
+
+    result = dashboard_stats.reconcile(db)
+    assert result["drift"]["total_products"] == -2
+    # Every increment made while reconciling survives, and nothing else changes.
+    assert _stored(db) == {"total_revenue": 30.0, "total_products": 3, "low_stock_alerts": 0, "active_suppliers": 0}
+
+
+def test_orders_between_the_read_and_the_scan_are_not_counted_twice(db, monkeypatch):
+    db.products.insert_one({"id": 1, "price": 10.0, "stock_level": 5, "reorder_point": 1})
+    dashboard_stats.reconcile(db)
+    _order_during_reconcile(db, monkeypatch, times=dashboard_stats.RECONCILE_ATTEMPTS, before_scan=True)
+
+    dashboard_stats.reconcile(db)
+    assert _stored(db)["total_revenue"] == 30.0
+    assert dashboard_stats.reconcile(db)["drift"] == {}
@@ -0,0 +1,66 @@
+import asyncio
+
+from backend.services import broadcast, change_log, events, stock_ledger
+
+
+def _entries(db) -> list:
+    return list(db[change_log.CHANGE_LOG_COLLECTION].find({}, {"_id": 0, "at": 0}))
+
+
+def test_writes_are_logged_once_per_call(db, monkeypatch):
+    monkeypatch.setattr(change_log, "CHANGE_LOG_MAX_ORDERS", 2)
+    db.products.insert_many([{"id": 1, "stock_level": 0}, {"id": 2, "stock_level": 0}])
+    change_log.record_orders(db, [{"id": i, "product_id": 1, "quantity": 1, "_id": i} for i in (7, 3, 5)])
+    change_log.record_orders(db, [])
+    stock_ledger.apply_movements(db, [
+        stock_ledger.movement(2, "receipt", 1),
+        stock_ledger.movement(1, "receipt", 1),
+        stock_ledger.movement(2, "sale", -1),
+    ])
+
+    orders, stock = _entries(db)
+    assert orders["kind"] == "orders" and orders["count"] == 3
+    assert [o["id"] for o in orders["orders"]] == [3, 5]
+    assert set(orders["orders"][0]) == set(change_log.ORDER_FIELDS)
+    assert stock == {"kind": "stock", "product_ids": [1, 2]}
+
+
+def test_log_entries_become_events(db, async_db):
+    db.products.insert_many([{"id": 1, "stock_level": 4}, {"id": 2, "stock_level": 9}])
+    change_log.record_orders(db, [{"id": 2, "product_id": 1, "quantity": 3}])
+    change_log.record_stock(db, [2, 1])
+    change_log.record_orders(db, [{"id": 1, "product_id": 2, "quantity": 1}])
+    db[change_log.CHANGE_LOG_COLLECTION].insert_one({"kind": "created"})
+
+    async def run():
+        feed = events.EventFeed(broadcast.Broadcaster(8))
+        subscription = feed.broadcaster.subscribe()
+        for entry in db[change_log.CHANGE_LOG_COLLECTION].find():
+            feed.apply_log_entry(entry)
+        await feed.flush(async_db)
+        published = []
+        while not subscription.queue.empty():
+            published.append(subscription.queue.get_nowait())
+        return published
+
+    (orders_event, orders), (stock_event, stock) = asyncio.run(run())
+    assert orders_event == "order-created" and orders["count"] == 2
+    # Published in log order, not id order.
+    assert [o["id"] for o in orders["orders"]] == [2, 1]
+    assert stock_event == "stock-changed"
+    assert stock["products"] == [{"product_id": 2, "stock_level": 9}, {"product_id": 1, "stock_level": 4}]
+
+
+def test_the_log_is_only_written_without_change_streams(db, monkeypatch):
+    db.products.insert_one({"id": 1, "stock_level": 0})
+    monkeypatch.setattr(change_log, "CHANGE_LOG", "auto")
+    monkeypatch.setattr(change_log, "_enabled", None)
+    monkeypatch.setattr(db.client.admin, "command", lambda name: {"isWritablePrimary": True, "setName": "rs0"})
+
+    change_log.record_orders(db, [{"id": 1, "product_id": 1, "quantity": 1}])
+    stock_ledger.apply_movements(db, [stock_ledger.movement(1, "receipt", 1)])
+
+    assert _entries(db) == []
+    assert db.products.find_one({"id": 1})["stock_level"] == 1
+    assert not change_log._has_change_streams({"isWritablePrimary": True})
+    assert change_log._has_change_streams({"msg": "isdbgrid"})
@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import file_analysis
+
+
+def _csv(frame) -> io.BytesIO:
+    return io.BytesIO(frame.to_csv(index=False).encode())
+
+
+def test_numeric_summary_matches_describe_across_chunks():
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({"quantity": rng.integers(0, 100, 1000), "price": rng.normal(50, 10, 1000)})
+    frame.loc[::7, "price"] = np.nan
+
+    result = file_analysis.analyze_file(_csv(frame), "data.csv", chunk_rows=64)
+    expected = frame.describe().to_dict()
+    assert result["row_count"] == 1000
+    assert result["columns"] == ["quantity", "price"]
+    for column in frame.columns:
+        for stat in expected[column]:
+            assert result["summary"][column][stat] == pytest.approx(expected[column][stat])
+
+
+def test_merged_summaries_match_a_single_pass():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=5000)
+    whole = file_analysis.NumericSummary()
+    whole.update(values)
+    left, right = file_analysis.NumericSummary(), file_analysis.NumericSummary()
+    left.update(values[:1234])
+    right.update(values[1234:])
+    left.merge(right)
+
+    for stat in ("count", "mean", "std", "min", "max", "50%"):
+        assert left.result()[stat] == pytest.approx(whole.result()[stat])
+
+
+def test_quartiles_are_sampled_past_the_reservoir():
+    values = np.arange(100000, dtype=float)
+    summary = file_analysis.NumericSummary(sample_size=5000)
+    for chunk in np.array_split(values, 20):
+        summary.update(chunk)
+    assert len(summary.sample) == 5000
+    assert summary.result()["50%"] == pytest.approx(np.median(values), rel=0.05)
+    assert summary.result()["mean"] == pytest.approx(values.mean())
+
+
+def test_text_columns_are_summarised_without_numeric_ones():
+    frame = pd.DataFrame({"status": ["Pending", "Shipped", "Pending", "Delivered", "Pending"], "sku": list("abcde")})
+    result = file_analysis.analyze_file(_csv(frame), "data.csv", chunk_rows=2)
+    expected = frame.describe().to_dict()
+    assert result["summary"] == expected
+
+
+def test_text_summary_keeps_the_most_common_values():
+    summary = file_analysis.TextSummary(limit=2)
+    summary.update(pd.Series(["a", "a", "a", "b", "b", "c"]))
+    assert summary.result() == {"count": 6, "unique": 2, "top": "a", "freq": 3}
+
+
+def test_unsupported_extension():
+    with pytest.raises(file_analysis.UnsupportedFile):
+        file_analysis.analyze_file(io.BytesIO(b""), "data.txt")
+
+
+def test_columns_turning_to_text_late_are_counted_in_full():
+    data = b"a,b\n1,p\n3,q\nx,r\ny,r\n"
+    result = file_analysis.analyze_file(io.BytesIO(data), "data.csv", chunk_rows=2)
+    expected = pd.read_csv(io.BytesIO(data)).describe().to_dict()
+    assert result["summary"] == expected
+    assert result["summary"]["b"] == {"count": 4, "unique": 3, "top": "r", "freq": 2}
+    # Head values come from the same read as the whole file.
+    assert [row["a"] for row in result["head"]] == ["1", "3", "x", "y"]
+    assert [row["b"] for row in result["head"]] == ["p", "q", "r", "r"]
+
+
+def test_numeric_chunks_of_a_text_column_are_counted_as_strings():
+    data = b"a,b\nx,1\ny,2\nz,p\n1,2\n5,6\n"
+    result = file_analysis.analyze_file(io.BytesIO(data), "data.csv", chunk_rows=2)
+    assert result["summary"] == pd.read_csv(io.BytesIO(data)).describe().to_dict()
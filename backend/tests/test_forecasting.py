@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.services import forecast_cache, forecasting
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    forecast_cache.cache.clear()
+    yield
+    forecast_cache.cache.clear()
+
+
+def _order(db, order_id: int, product_id: int, day: int, quantity: int):
+    db.orders.insert_one({"id": order_id, "product_id": product_id, "quantity": quantity, "order_date": T0 + timedelta(days=day)})
+    forecast_cache.record_orders(db, [product_id])
+
+
+def test_record_orders_counts_per_product(db, async_db):
+    forecast_cache.record_orders(db, [1, 1, 2])
+    forecast_cache.record_orders(db, [])
+    asyncio.run(forecast_cache.record_order(async_db, 2))
+    assert forecast_cache.history_versions(db) == {1: 2, 2: 2}
+    assert forecast_cache.history_versions(db, [1]) == {1: 2}
+    assert forecast_cache.history_version(db, 3) == 0
+
+
+def test_late_order_with_a_lower_id_refreshes_the_forecast(db):
+    for day in range(10):
+        _order(db, 100 + day, 1, day, 10)
+    first = forecasting.get_forecast(db, 1)
+    assert forecasting.get_forecast(db, 1) == first
+    assert forecast_cache.cache.stats()["memory_hit"]["count"] == 1
+
+    stored = db[forecasting.FORECASTS_COLLECTION].find_one({"product_id": 1})
+    assert stored["history_version"] == 10
+
+    # An id handed out earlier by another process's block, inserted later.
+    _order(db, 5, 1, 10, 1000)
+    forecast_cache.cache.clear()
+    refreshed = forecasting.get_forecast(db, 1)
+    assert refreshed["dates"] != first["dates"]
+    assert db[forecasting.FORECASTS_COLLECTION].find_one({"product_id": 1})["history_version"] == 11
+
+
+class _InlinePool:
+    def __init__(self, **kwargs):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_fits_are_retried_on_a_new_pool_after_a_worker_died(monkeypatch):
+    class BrokenPool(_InlinePool):
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool())
+            return future
+
+    monkeypatch.setattr(forecasting, "FORECAST_WORKERS", 2)
+    monkeypatch.setattr(forecasting, "FORECAST_CHUNK_SIZE", 2)
+    monkeypatch.setattr(forecasting, "_executor", BrokenPool())
+    monkeypatch.setattr(forecasting, "ProcessPoolExecutor", _InlinePool)
+    history = np.tile(np.arange(14.0), (5, 1))
+    start = np.zeros(5, dtype=np.int64)
+
+    predictions, *_ = forecasting.fit_all(history, start, 3, "moving_average")
+    assert predictions.shape == (5, 3)
+    assert isinstance(forecasting._executor, _InlinePool)
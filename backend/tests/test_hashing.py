@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from backend.core import hashing
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    hashing.shutdown()
+    yield
+    hashing.shutdown()
+
+
+def test_a_dead_worker_does_not_break_later_calls(pool):
+    restarts = hashing.stats()["pool_restarts"]
+
+    async def run():
+        hashed = await hashing.hash_password_async("secret")
+        for process in list(hashing._executor._processes.values()):
+            process.kill()
+            process.join()
+        return await hashing.verify_password_async("secret", hashed)
+
+    assert asyncio.run(run()) == (True, None)
+    assert hashing.stats()["pool_restarts"] == restarts + 1
+    assert hashing.stats()["pending"] == 0
+
+
+def test_a_pool_that_keeps_breaking_is_reported(pool, monkeypatch):
+    class Broken:
+        def submit(self, *args):
+            raise BrokenProcessPool()
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(hashing, "_get_executor", Broken)
+    with pytest.raises(hashing.HashingUnavailable):
+        asyncio.run(hashing.hash_password_async("secret"))
+    assert hashing.stats()["pending"] == 0
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+from backend.services import ids
+
+
+def test_counter_continues_from_existing_ids(db):
+    db.orders.insert_many([{"id": 5}, {"id": 42}])
+    allocator = ids.IdAllocator()
+    assert allocator.next_id(db, "orders") == 43
+    assert allocator.next_id(db, "orders") == 44
+
+
+def test_blocks_are_served_from_memory(db):
+    allocator = ids.IdAllocator(block_sizes={"orders": 10})
+    assert [allocator.next_id(db, "orders") for _ in range(10)] == list(range(1, 11))
+    assert db.counters.find_one({"_id": "orders"})["seq"] == 10
+    assert allocator.next_id(db, "orders") == 11
+    assert db.counters.find_one({"_id": "orders"})["seq"] == 20
+
+
+def test_allocators_sharing_a_counter_never_overlap(db):
+    # Two worker processes, each leasing its own blocks.
+    first, second = ids.IdAllocator(default_block_size=7), ids.IdAllocator(default_block_size=3)
+    taken = []
+    for _ in range(20):
+        taken.append(first.next_id(db, "orders"))
+        taken.append(second.next_id(db, "orders"))
+    taken += first.next_ids(db, "orders", 50)
+    assert len(set(taken)) == len(taken)
+
+
+def test_concurrent_threads_get_unique_ids(db):
+    allocator = ids.IdAllocator(default_block_size=5)
+    taken = []
+
+    def worker():
+        for _ in range(200):
+            taken.append(allocator.next_id(db, "orders"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(taken) == len(set(taken)) == 1600
+
+
+def test_next_ids_reserves_a_contiguous_range(db):
+    allocator = ids.IdAllocator()
+    assert allocator.next_ids(db, "products", 0) == []
+    assert allocator.next_ids(db, "products", 3) == [1, 2, 3]
+    assert allocator.next_id(db, "products") == 4
+
+
+def test_forked_worker_drops_leased_blocks(db):
+    allocator = ids.IdAllocator(default_block_size=100)
+    assert allocator.next_id(db, "orders") == 1
+    allocator._pid = -1
+    assert allocator.next_id(db, "orders") == 101
+
+
+def test_async_allocation_is_unique(async_db):
+    allocator = ids.IdAllocator(default_block_size=4)
+
+    async def run():
+        return await asyncio.gather(*(allocator.next_id_async(async_db, "orders") for _ in range(50)))
+
+    taken = asyncio.run(run())
+    assert sorted(taken) == list(range(1, 51))
+
+
+def test_sync_and_async_callers_share_blocks_safely(db, async_db):
+    # Routers allocate on the event loop while services run on threadpool
+    # threads, both against the module allocator.
+    allocator = ids.IdAllocator(default_block_size=3)
+    taken = []
+
+    def worker():
+        for _ in range(200):
+            taken.append(allocator.next_id(db, "orders"))
+
+    async def run():
+        for _ in range(400):
+            taken.append(await allocator.next_id_async(async_db, "orders"))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    asyncio.run(run())
+    for t in threads:
+        t.join()
+    assert len(taken) == len(set(taken)) == 1200
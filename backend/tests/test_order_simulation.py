@@ -0,0 +1,15 @@
+from backend.services import order_simulation, stock_ledger, supplier_metrics
+
+
+def test_shipped_and_delivered_orders_are_booked_into_stock(db):
+    order_simulation.seed_catalog(db, suppliers=3, products=10, seed=1)
+    before = {p["id"]: p["stock_level"] for p in db.products.find()}
+
+    order_simulation.simulate_orders(db, 500, days=10, seed=2)
+
+    booked = {}
+    for order in db.orders.find({"status": {"$in": list(supplier_metrics.STOCKED_STATUSES)}}):
+        booked[order["product_id"]] = booked.get(order["product_id"], 0) + order["quantity"]
+    assert booked
+    assert {p["id"]: p["stock_level"] - before[p["id"]] for p in db.products.find()} == {pid: booked.get(pid, 0) for pid in before}
+    assert db[stock_ledger.LEDGER_COLLECTION].count_documents({"type": "receipt"}) == db.orders.count_documents({"status": {"$in": list(supplier_metrics.STOCKED_STATUSES)}})
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend import schemas
+from backend.routers import orders
+from backend.services import analytics, dashboard_stats, forecasting, stock_ledger
+
+
+@pytest.fixture
+def catalog(db):
+    db.suppliers.insert_many([
+        {"id": 1, "name": "Fast", "reliability_score": 5.0, "lead_time_days": 2},
+        {"id": 2, "name": "Slow", "reliability_score": 1.0, "lead_time_days": 10},
+    ])
+    db.products.insert_many([
+        # Below its reorder point.
+        {"id": 1, "name": "p1", "category": "A", "price": 10.0, "stock_level": 0, "reorder_point": 20, "supplier_id": 1},
+        # Plenty of stock.
+        {"id": 2, "name": "p2", "category": "A", "price": 10.0, "stock_level": 5000, "reorder_point": 20, "supplier_id": 1},
+        # Low, with a minimum order quantity.
+        {"id": 3, "name": "p3", "category": "B", "price": 4.0, "stock_level": 1, "reorder_point": 5, "supplier_id": 2, "min_order_quantity": 1000},
+        # Unknown supplier.
+        {"id": 4, "name": "p4", "category": "B", "price": 4.0, "stock_level": 0, "reorder_point": 5, "supplier_id": 99},
+    ])
+    return db
+
+
+def test_compute_orders_up_to_target_only_below_reorder_level():
+    ones = np.ones(3)
+    result = analytics.compute_replenishment(
+        price=ones * 10, stock_level=np.array([0.0, 500.0, 30.0]), on_order=np.array([0.0, 0.0, 20.0]),
+        reorder_point=ones * 40, daily_demand=ones * 5, lead_time_days=ones * 4, reliability=ones,
+        demand_cv=ones * 0.0, ordering_cost=ones * 50, holding_cost_rate=ones * 0.2, min_order_quantity=ones,
+    )
+    # No variability: the reorder level is max(reorder_point, d * LT) = 40.
+    assert result["reorder_level"].tolist() == [40, 40, 40]
+    eoq = np.sqrt(2 * 5 * 365 * 50 / 2)
+    assert result["order_up_to"][0] == 40 + np.ceil(eoq)
+    # Stock plus on order is above the reorder level for the last two.
+    assert result["quantity"].tolist() == [40 + np.ceil(eoq), 0, 0]
+    assert result["days_of_cover"].tolist() == [0, 100, 10]
+
+
+def test_unreliable_suppliers_need_more_safety_stock():
+    args = {f: np.ones(2) for f in ("price", "stock_level", "on_order", "reorder_point", "ordering_cost", "holding_cost_rate", "min_order_quantity")}
+    result = analytics.compute_replenishment(
+        daily_demand=np.full(2, 10.0), lead_time_days=np.full(2, 10.0), reliability=np.array([1.0, 0.2]), demand_cv=np.full(2, 0.3), **args,
+    )
+    assert result["safety_stock"][1] > result["safety_stock"][0] > 0
+
+
+def test_plan_groups_lines_per_supplier(catalog):
+    catalog[forecasting.FORECASTS_COLLECTION].insert_one({"product_id": 1, "forecast": [30.0, 30.0, 30.0]})
+    plan, total = analytics.replenishment_plan(catalog)
+
+    assert total == 2 and plan["suppliers"] == 2 and plan["lines"] == 2
+    assert plan["unassigned"] == 1
+    lines = {line["product_id"]: (group["supplier_id"], line) for group in plan["orders"] for line in group["lines"]}
+    assert set(lines) == {1, 3}
+    assert lines[1][0] == 1 and lines[1][1]["demand_source"] == "forecast" and lines[1][1]["daily_demand"] == 30
+    assert lines[3][0] == 2 and lines[3][1]["quantity"] == 1000
+    # The supplier's promised lead time applies without observed receipts.
+    assert lines[3][1]["lead_time_days"] == 10
+    assert plan["total_value"] == pytest.approx(sum(line["value"] for _, line in lines.values()))
+
+    page, _ = analytics.replenishment_plan(catalog, skip=1, limit=1)
+    assert len(page["orders"]) == 1
+    only, _ = analytics.replenishment_plan(catalog, supplier_id=2)
+    assert [g["supplier_id"] for g in only["orders"]] == [2]
+
+
+def test_placed_orders_count_as_on_order(catalog):
+    placed = analytics.create_replenishment_orders(catalog)
+    assert placed["orders"] == 2 and placed["first_id"] == 1 and placed["last_id"] == 2
+    orders = list(catalog.orders.find({}, {"_id": 0}))
+    assert {o["status"] for o in orders} == {"Pending"}
+    assert {o["product_id"]: o["supplier_name"] for o in orders} == {1: "Fast", 3: "Slow"}
+
+    plan, total = analytics.replenishment_plan(catalog)
+    assert plan["lines"] == 0 and total == 0
+    assert analytics.create_replenishment_orders(catalog)["orders"] == 0
+
+
+def test_delivered_orders_are_booked_into_stock(catalog, async_db):
+    placed = analytics.create_replenishment_orders(catalog)
+    ordered = {o["product_id"]: o for o in catalog.orders.find({}, {"_id": 0})}
+    update = schemas.OrderStatusUpdate(status="Shipped")
+
+    async def deliver():
+        for order in ordered.values():
+            await orders.update_order_status(order["id"], update, db=async_db, current_user=None)
+        # Shipped orders are already in stock.
+        await orders.update_order_status(ordered[1]["id"], schemas.OrderStatusUpdate(status="Delivered"), db=async_db, current_user=None)
+
+    asyncio.run(deliver())
+    stock = {p["id"]: p["stock_level"] for p in catalog.products.find()}
+    assert stock[1] == ordered[1]["quantity"] and stock[3] == 1 + ordered[3]["quantity"]
+    receipts = catalog[stock_ledger.LEDGER_COLLECTION].find({"type": "receipt"}, {"_id": 0, "order_id": 1})
+    assert sorted(r["order_id"] for r in receipts) == list(range(placed["first_id"], placed["last_id"] + 1))
+
+    # Nothing is on order any more, and nothing needs ordering again.
+    plan, total = analytics.replenishment_plan(catalog)
+    assert plan["lines"] == 0 and total == 0
+    assert analytics.create_replenishment_orders(catalog)["orders"] == 0
+
+
+def test_only_one_run_places_orders_at_a_time(catalog):
+    analytics._lock_replenishment(catalog)
+    with pytest.raises(analytics.ReplenishmentInProgress):
+        analytics.create_replenishment_orders(catalog)
+    assert catalog.orders.count_documents({}) == 0
+
+    # An expired lease no longer blocks, and a finished run releases its own.
+    lock = {"_id": analytics.REPLENISHMENT_LOCK_ID}
+    catalog[dashboard_stats.STATS_COLLECTION].update_one(lock, {"$set": {"until": datetime.utcnow() - timedelta(seconds=1)}})
+    assert analytics.create_replenishment_orders(catalog)["orders"] == 2
+    assert catalog[dashboard_stats.STATS_COLLECTION].find_one(lock) is None
+
+
+def _between_batches(monkeypatch, change_lease):
+    monkeypatch.setattr(analytics, "REPLENISHMENT_BATCH", 1)
+    record_orders = analytics.forecast_cache.record_orders
+
+    def after_batch(db, product_ids):
+        record_orders(db, product_ids)
+        change_lease(db[dashboard_stats.STATS_COLLECTION], {"_id": analytics.REPLENISHMENT_LOCK_ID})
+
+    monkeypatch.setattr(analytics.forecast_cache, "record_orders", after_batch)
+
+
+def test_a_slow_run_keeps_its_lease(catalog, monkeypatch):
+    # The first batch outlasts the lease; the run renews it for the next.
+    _between_batches(monkeypatch, lambda stats, lock: stats.update_one(lock, {"$set": {"until": datetime.utcnow() - timedelta(seconds=1)}}))
+
+    assert analytics.create_replenishment_orders(catalog)["orders"] == 2
+
+
+def test_a_run_whose_lease_was_taken_over_stops(catalog, monkeypatch):
+    _between_batches(monkeypatch, lambda stats, lock: stats.update_one(lock, {"$set": {"owner": "other"}}))
+
+    with pytest.raises(analytics.ReplenishmentInProgress):
+        analytics.create_replenishment_orders(catalog)
+    placed = list(catalog.orders.find())
+    assert len(placed) == 1
+    stats = catalog[dashboard_stats.STATS_COLLECTION].find_one({"_id": dashboard_stats.DASHBOARD_ID})
+    assert stats["total_revenue"] == placed[0]["quantity"] * placed[0]["unit_price"]
+    # The other run's lease is left alone.
+    assert catalog[dashboard_stats.STATS_COLLECTION].find_one({"_id": analytics.REPLENISHMENT_LOCK_ID})["owner"] == "other"
@@ -0,0 +1,115 @@
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from backend.services import dashboard_stats, report_datasets, report_jobs
+
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_jobs, "ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(report_jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(report_jobs, "_active", {})
+    return tmp_path
+
+
+def _job(key: str, dataset: str = "orders", format: str = "csv", compress: bool = False) -> dict:
+    return {"id": key[:8], "key": key, "dataset": dataset, "format": format, "compress": compress, "status": "completed"}
+
+
+def _write(path: str, age: float, now: float):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+    os.utime(path, (now - age, now - age))
+
+
+def test_artifacts_are_grouped_by_dataset_and_format(artifact_dir):
+    assert report_jobs.artifact_path(_job("a" * 64)) == str(artifact_dir / "orders.csv" / f"{'a' * 64}.csv")
+    assert report_jobs.artifact_path(_job("b" * 64, compress=True)).startswith(str(artifact_dir / "orders.csv.gz"))
+
+
+def test_prune_keeps_the_newest_artifact_per_group(artifact_dir):
+    now = time.time()
+    old, older, newest = ("1" * 64, "2" * 64, "3" * 64)
+    _write(report_jobs.artifact_path(_job(older)), report_jobs.ARTIFACT_MAX_AGE + 20, now)
+    _write(report_jobs.artifact_path(_job(old)), report_jobs.ARTIFACT_MAX_AGE + 10, now)
+    _write(report_jobs.artifact_path(_job(newest)), report_jobs.ARTIFACT_MAX_AGE + 5, now)
+    # Superseded, but recent enough to still be downloaded.
+    recent = report_jobs.artifact_path(_job("4" * 64, format="pdf"))
+    _write(recent, 10, now)
+    _write(report_jobs.artifact_path(_job("5" * 64, format="pdf")), 5, now)
+    # Only artifact of its group, however old.
+    alone = report_jobs.artifact_path(_job("6" * 64, dataset="inventory"))
+    _write(alone, report_jobs.ARTIFACT_MAX_AGE * 10, now)
+    ungrouped = str(artifact_dir / f"{'7' * 64}.csv")
+    _write(ungrouped, report_jobs.ARTIFACT_MAX_AGE + 1, now)
+
+    assert report_jobs.prune(now)["artifacts"] == 3
+    assert not os.path.exists(report_jobs.artifact_path(_job(old)))
+    assert not os.path.exists(report_jobs.artifact_path(_job(older)))
+    assert not os.path.exists(ungrouped)
+    assert os.path.exists(report_jobs.artifact_path(_job(newest)))
+    assert os.path.exists(recent) and os.path.exists(alone)
+
+
+def test_prune_expires_job_files_but_not_jobs_in_flight(artifact_dir, monkeypatch):
+    now = time.time()
+    for job_id, age in (("expired", report_jobs.JOB_TTL + 1), ("fresh", 10), ("running", report_jobs.JOB_TTL + 1)):
+        _write(report_jobs._job_path(job_id), age, now)
+    partial = report_jobs.artifact_path(_job("8" * 64)) + ".abc.part"
+    _write(partial, report_jobs.JOB_TTL + 1, now)
+    monkeypatch.setattr(report_jobs, "_active", {"key": "running"})
+
+    assert report_jobs.prune(now)["jobs"] == 1
+    assert sorted(os.listdir(report_jobs.JOBS_DIR)) == ["fresh.json", "running.json"]
+    assert not os.path.exists(partial)
+
+
+def test_cache_hits_are_served_from_the_artifact(artifact_dir, db):
+    sources = report_datasets.DATASETS["orders"](db).sources
+    version = dashboard_stats.collection_version(db, sources)
+    job = _job(report_jobs.artifact_key("orders", "csv", False, version))
+    _write(report_jobs.artifact_path(job), 0, time.time())
+
+    cached = report_jobs.submit(db, "orders", "csv")
+    assert cached["cached"] and cached["status"] == "completed"
+    assert cached["key"] == job["key"]
+
+
+class _BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool()
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class _PendingPool:
+    def __init__(self, **kwargs):
+        self.futures = []
+
+    def submit(self, *args):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_a_broken_pool_is_replaced_on_submit(artifact_dir, db, monkeypatch):
+    monkeypatch.setattr(report_jobs, "_executor", _BrokenPool())
+    monkeypatch.setattr(report_jobs, "ProcessPoolExecutor", _PendingPool)
+
+    job = report_jobs.submit(db, "orders", "csv")
+    assert job["status"] == "queued"
+    assert report_jobs._active == {job["key"]: job["id"]}
+    assert isinstance(report_jobs._executor, _PendingPool)
+
+    # The worker running it dies: the job fails and the pool is dropped.
+    report_jobs._executor.futures[0].set_exception(BrokenProcessPool())
+    assert report_jobs.get_job(job["id"])["status"] == "failed"
+    assert report_jobs._active == {} and report_jobs._executor is None
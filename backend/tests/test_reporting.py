@@ -0,0 +1,61 @@
+import io
+import re
+
+from openpyxl import load_workbook
+
+from backend.services import reporting
+
+
+def _workbook(columns, rows, **kwargs):
+    data = b"".join(reporting.stream_xlsx(columns, rows, **kwargs))
+    return load_workbook(io.BytesIO(data), read_only=True)
+
+
+def test_xlsx_stream_round_trips_through_openpyxl():
+    rows = [{"id": i, "name": f"item <{i}> & co", "price": i / 4} for i in range(2500)]
+    sheet = _workbook(["id", "name", "price"], rows, batch_rows=100).worksheets[0]
+    values = list(sheet.iter_rows(values_only=True))
+    assert values[0] == ("id", "name", "price")
+    assert len(values) == 2501
+    assert values[1235] == (1234, "item <1234> & co", 308.5)
+
+
+def test_xlsx_non_finite_numbers_are_empty_cells():
+    rows = [{"a": float("nan"), "b": float("inf"), "c": float("-inf"), "d": None, "e": 1.5}]
+    sheet = _workbook(list("abcde"), rows).worksheets[0]
+    assert list(sheet.iter_rows(min_row=2, values_only=True)) == [(None, None, None, None, 1.5)]
+
+
+def test_csv_stream():
+    rows = [{"id": 1, "name": "a,b"}, {"id": 2, "name": "c", "extra": "ignored"}]
+    data = b"".join(reporting.stream_csv(["id", "name"], rows, batch_rows=1))
+    assert data.decode().splitlines() == ["id,name", '1,"a,b"', "2,c"]
+
+
+def _pages(pdf) -> int:
+    return len(re.findall(rb"/Type /Page\b(?!s)", pdf.getvalue()))
+
+
+def test_pdf_pages_hold_every_row_once():
+    # Widths come from the first ten rows; later, longer notes are truncated.
+    rows = ([f"{i:03d}", "x" * (10 if i < 10 else 200)] for i in range(100))
+    table = reporting._PagedRows(["id", "note"], rows, [next(rows) for _ in range(10)])
+    height = reporting.PDF_HEADER_HEIGHT + 30 * reporting.PDF_ROW_HEIGHT
+    assert table.split(400, reporting.PDF_ROW_HEIGHT) == []
+    pages = []
+    while table is not None:
+        parts = table.split(400, height)
+        pages.append(parts[0])
+        table = parts[1] if len(parts) > 1 else None
+    assert [len(page._cellvalues) - 1 for page in pages] == [30, 30, 30, 10]
+    assert [row[0] for page in pages for row in page._cellvalues[1:]] == [f"{i:03d}" for i in range(100)]
+    assert pages[0]._cellvalues[1][1] == "x" * 10
+    assert pages[-1]._cellvalues[-1][1].endswith("\u2026")
+
+
+def test_pdf_renders_through_the_public_build():
+    rows = [{"id": i, "name": f"item {i}"} for i in range(200)]
+    pdf = reporting.render_pdf(["id", "name"], rows, "Orders")
+    assert pdf.getvalue().startswith(b"%PDF")
+    assert _pages(pdf) > 3
+    assert _pages(reporting.render_pdf(["id"], [], "Empty")) == 1
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.services import stock_ledger
+
+T0 = datetime(2024, 1, 1)
+
+
+def _at(hours: float) -> datetime:
+    return T0 + timedelta(hours=hours)
+
+
+@pytest.fixture
+def stocked(db):
+    db.products.insert_many([{"id": 1, "stock_level": 10}, {"id": 2, "stock_level": 0}])
+    stock_ledger.record_movements(db, [stock_ledger.movement(1, "adjustment", 10, at=_at(0), reason="initial")])
+    return db
+
+
+def test_movement_validates_its_type():
+    with pytest.raises(stock_ledger.InvalidMovement):
+        stock_ledger.movement(1, "theft", 1)
+    entry = stock_ledger.movement(1, "sale", -3, at=T0, order_id=7, reason=None)
+    assert entry == {"product_id": 1, "type": "sale", "quantity": -3, "at": T0, "order_id": 7}
+
+
+def test_apply_movements_nets_stock_per_product(stocked):
+    stock_ledger.apply_movements(stocked, [
+        stock_ledger.movement(1, "sale", -4, at=_at(1)),
+        stock_ledger.movement(1, "receipt", 6, at=_at(2)),
+        stock_ledger.movement(2, "receipt", 5, at=_at(2)),
+        stock_ledger.movement(2, "sale", -5, at=_at(3)),
+    ])
+    assert {p["id"]: p["stock_level"] for p in stocked.products.find()} == {1: 12, 2: 0}
+    assert stocked[stock_ledger.LEDGER_COLLECTION].count_documents({}) == 5
+
+
+def test_guarded_movement_never_goes_negative(stocked, async_db):
+    async def run():
+        refused = await stock_ledger.apply_guarded_movement(async_db, stock_ledger.movement(1, "sale", -11))
+        taken = await stock_ledger.apply_guarded_movement(async_db, stock_ledger.movement(1, "sale", -10))
+        missing = await stock_ledger.apply_guarded_movement(async_db, stock_ledger.movement(9, "receipt", 1))
+        return refused, taken, missing
+
+    refused, taken, missing = asyncio.run(run())
+    assert refused is None and missing is None
+    assert taken["stock_level"] == 10
+    assert stocked.products.find_one({"id": 1})["stock_level"] == 0
+    assert stocked[stock_ledger.LEDGER_COLLECTION].count_documents({"type": "sale"}) == 1
+
+
+def test_snapshots_carry_levels_forward(stocked):
+    stock_ledger.apply_movements(stocked, [stock_ledger.movement(1, "sale", -2, at=_at(1))])
+    assert stock_ledger.take_snapshots(stocked, at=_at(1.5)) == {"at": _at(1.5), "snapshots": 2}
+
+    stock_ledger.apply_movements(stocked, [stock_ledger.movement(1, "receipt", 7, at=_at(2))])
+    # Only product 1 moved since the previous run.
+    assert stock_ledger.take_snapshots(stocked, at=_at(3))["snapshots"] == 1
+    assert stock_ledger.take_snapshots(stocked, at=_at(2.5))["snapshots"] == 0
+
+    snapshots = {(s["product_id"], s["at"]): s["stock_level"] for s in stocked[stock_ledger.SNAPSHOTS_COLLECTION].find()}
+    assert snapshots == {(1, _at(1.5)): 8, (2, _at(1.5)): 0, (1, _at(3)): 15}
+
+
+def test_history_agrees_with_current_stock(stocked, async_db):
+    stock_ledger.apply_movements(stocked, [stock_ledger.movement(1, "sale", -3, at=_at(1))])
+    stock_ledger.take_snapshots(stocked, at=_at(1.5))
+    stock_ledger.apply_movements(stocked, [
+        stock_ledger.movement(1, "receipt", 5, at=_at(2)),
+        stock_ledger.movement(1, "sale", -1, at=_at(4)),
+    ])
+
+    async def run():
+        return (
+            await stock_ledger.stock_at(async_db, 1, _at(0.5)),
+            await stock_ledger.stock_at(async_db, 1, _at(3)),
+            await stock_ledger.stock_history(async_db, 1, _at(0.5), _at(5)),
+            await stock_ledger.stock_history(async_db, 1, _at(0.5), _at(5), limit=1),
+            await stock_ledger.stock_history(async_db, 9, _at(0), _at(5)),
+        )
+
+    before, during, history, truncated, unknown = asyncio.run(run())
+    assert (before, during) == (10, 12)
+    assert [m["stock_level"] for m in history["movements"]] == [7, 12, 11]
+    assert history["opening_stock"] == 10
+    assert history["closing_stock"] == stocked.products.find_one({"id": 1})["stock_level"] == 11
+    assert truncated["truncated"] and truncated["closing_stock"] == 11
+    assert unknown is None
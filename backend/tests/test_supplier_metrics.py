@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+from bson.binary import Binary
+
+from backend.services import supplier_metrics
+
+
+@pytest.fixture
+def suppliers(db, monkeypatch):
+    monkeypatch.setattr(supplier_metrics, "_model", (None, None))
+    db.suppliers.insert_many([{"id": i, "name": f"s{i}", "reliability_score": score} for i, score in enumerate([1.0, 2.0, 3.0, 4.5, 5.0], 1)])
+    return db
+
+
+def _stored(db) -> dict:
+    return db[supplier_metrics.MODELS_COLLECTION].find_one({"_id": supplier_metrics.MODEL_ID})
+
+
+def test_model_is_stored_as_training_data(suppliers, monkeypatch):
+    supplier_metrics.refresh(suppliers, retrain=True)
+    stored = _stored(suppliers)
+    assert "model" not in stored
+    assert len(stored["features"]) == 5 and len(stored["features"][0]) == len(supplier_metrics.FEATURES)
+    assert stored["labels"] == ["Risk", "Risk", "Average", "High Performance", "High Performance"]
+
+    # Another process rebuilds the same model from the stored arrays.
+    predicted = {d["id"]: d["predicted_tier"] for d in suppliers[supplier_metrics.CLASSIFICATIONS_COLLECTION].find()}
+    monkeypatch.setattr(supplier_metrics, "_model", (None, None))
+    assert supplier_metrics.refresh(suppliers)["trained_at"] == stored["trained_at"]
+    assert {d["id"]: d["predicted_tier"] for d in suppliers[supplier_metrics.CLASSIFICATIONS_COLLECTION].find()} == predicted
+
+
+def test_pickled_models_are_never_loaded(suppliers):
+    trained_at = datetime.utcnow()
+    suppliers[supplier_metrics.MODELS_COLLECTION].insert_one(
+        {"_id": supplier_metrics.MODEL_ID, "model": Binary(b"not a pickle"), "trained_at": trained_at}
+    )
+    assert supplier_metrics._load_model(suppliers) == (None, None)
+    assert supplier_metrics.refresh(suppliers)["trained_at"] > trained_at
+    assert "features" in _stored(suppliers)
@@ -18,8 +18,8 @@ const CreateOrderModal = ({ isOpen, onClose, onSave }) => {
       const fetchData = async () => {
         try {
           const [productsRes, suppliersRes] = await Promise.all([
-            api.get('/products'),
-            api.get('/suppliers')
+            api.get('/products', { params: { fields: 'name,stock_level,supplier_id' } }),
+            api.get('/suppliers', { params: { fields: 'name' } })
           ]);
           setProducts(productsRes.data);
           setSuppliers(suppliersRes.data);
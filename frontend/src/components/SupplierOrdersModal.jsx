@@ -10,9 +10,10 @@ const SupplierOrdersModal = ({ isOpen, onClose, supplier }) => {
     if (isOpen && supplier) {
       const fetchOrders = async () => {
         try {
-          const response = await api.get('/orders');
-          const supplierOrders = response.data.filter(o => o.supplier_id === supplier.id);
-          setOrders(supplierOrders);
+          const response = await api.get('/orders', {
+            params: { supplier_id: supplier.id, fields: 'quantity,order_date,status' }
+          });
+          setOrders(response.data);
         } catch (error) {
           console.error("Failed to fetch orders:", error);
         } finally {
@@ -33,6 +33,12 @@ const Dashboard = () => {
 
   useEffect(() => {
     fetchStats();
+    // Live figures from the server's event feed instead of re-fetching.
+    const token = localStorage.getItem('token');
+    if (!token) return;
+    const source = new EventSource(`${api.defaults.baseURL}/events?access_token=${encodeURIComponent(token)}`);
+    source.addEventListener('stats-updated', (event) => setStats(JSON.parse(event.data)));
+    return () => source.close();
   }, []);
 
   useEffect(() => {
@@ -41,7 +47,6 @@ const Dashboard = () => {
       interval = setInterval(async () => {
         try {
           await api.post('/simulate/generate-order');
-          await fetchStats();
         } catch (error) {
           console.error("Simulation error:", error);
         }